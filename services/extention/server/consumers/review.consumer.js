@@ -12,9 +12,13 @@ dotenv.config({
 });
 
 async function processReviews(reviews) {
+    // Only the summary is used, so skip the per-review aspects in the response.
     const response = await axios.post(process.env.MODEL_URL, {
         reviews: reviews,
     }, {
+        params: {
+            response_mode: "aggregate"
+        },
         headers: {
             "Content-Type": "application/json"
         }
@@ -0,0 +1,130 @@
+"""
+Admission-control benchmark: p99 latency of small /analyze requests, first on an idle server and
+then while another caller keeps large requests in flight. With admission control and per-caller
+fair batching the small-request p99 should stay close to the idle value, while large requests
+are deferred, or shed with 503 + Retry-After (or refused with 413 above the per-request budget).
+
+--shared-caller sends the small and large requests under one caller id, i.e. without per-caller
+fairness, as a baseline for comparison. The server is started with serve_fake_gemma.py (Gemma
+latency 0 by default, so the numbers are BERT and queueing) with the aspect and summary caches
+disabled; ADMISSION_* and MICROBATCH_* settings come from the environment.
+
+Usage (from services/ml-1):
+    python benchmarks/bench_admission.py --small-requests 200 --large-reviews 1000 --large-concurrency 2
+"""
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+
+import requests
+
+from bench_utils import synthesize_reviews
+from load_test import build_payloads, free_port, percentile, start_server
+
+
+def run_small_requests(url: str, payloads: list, caller: str) -> dict:
+    latencies_ms = []
+    statuses = collections.Counter()
+    with requests.Session() as session:
+        for payload in payloads:
+            start = time.perf_counter()
+            response = session.post(f"{url}/analyze", json=payload, headers={"X-Caller-Id": caller}, timeout=600)
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+    latencies_ms.sort()
+    return {
+        "requests": len(payloads),
+        "statuses": dict(statuses),
+        "p50_ms": round(percentile(latencies_ms, 0.50), 2) if latencies_ms else None,
+        "p99_ms": round(percentile(latencies_ms, 0.99), 2) if latencies_ms else None,
+        "max_ms": round(latencies_ms[-1], 2) if latencies_ms else None,
+    }
+
+
+def keep_large_requests_in_flight(url: str, payloads: list, caller: str, stop: threading.Event,
+                                  statuses: collections.Counter, lock: threading.Lock):
+    with requests.Session() as session:
+        i = 0
+        while not stop.is_set():
+            response = session.post(f"{url}/analyze", json=payloads[i % len(payloads)],
+                                    headers={"X-Caller-Id": caller}, timeout=600)
+            with lock:
+                statuses[response.status_code] += 1
+            if response.status_code == 503:
+                # Honor the server's Retry-After hint, but wake up early when the benchmark ends.
+                stop.wait(float(response.headers.get("Retry-After", "1")))
+            i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=None, help="test an already running server instead of starting one")
+    parser.add_argument("--small-requests", type=int, default=100)
+    parser.add_argument("--small-reviews", type=int, default=5, help="reviews per small request")
+    parser.add_argument("--large-reviews", type=int, default=1000, help="reviews per large request")
+    parser.add_argument("--large-concurrency", type=int, default=2, help="large requests kept in flight")
+    parser.add_argument("--pool-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gemma-latency", type=float, default=0.0)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--shared-caller", action="store_true",
+                        help="send all requests as one caller (no fair queueing between them) for comparison")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    pool = synthesize_reviews(args.pool_size, seed=args.seed)
+    small_payloads = build_payloads(pool, args.small_requests, args.small_reviews, args.seed)
+    large_payloads = build_payloads(pool, 8, args.large_reviews, args.seed + 1)
+    server_process = None
+    url = args.url
+    if url is None:
+        server_process, url = start_server(free_port(), args.gemma_latency,
+                                           {"ASPECT_CACHE_MAX_ENTRIES": "0", "SUMMARY_CACHE_MAX_ENTRIES": "0"},
+                                           args.startup_timeout)
+    results = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "small_reviews": args.small_reviews,
+               "large_reviews": args.large_reviews, "large_concurrency": args.large_concurrency,
+               "shared_caller": args.shared_caller}
+    small_caller = "shared" if args.shared_caller else "interactive"
+    try:
+        run_small_requests(url, small_payloads[:5], small_caller)  # warm the connection and the model
+        results["idle"] = run_small_requests(url, small_payloads, small_caller)
+
+        stop = threading.Event()
+        large_statuses = collections.Counter()
+        lock = threading.Lock()
+        threads = [threading.Thread(target=keep_large_requests_in_flight,
+                                    args=(url, large_payloads, "shared" if args.shared_caller else f"bulk-{i}", stop,
+                                          large_statuses, lock))
+                   for i in range(args.large_concurrency)]
+        for thread in threads:
+            thread.start()
+        time.sleep(1.0)  # let the large requests get admitted first
+        results["under_load"] = run_small_requests(url, small_payloads, small_caller)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        results["large_request_statuses"] = dict(large_statuses)
+        results["admission"] = requests.get(f"{url}/health", timeout=10).json().get("admission")
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait(timeout=30)
+
+    for phase in ("idle", "under_load"):
+        phase_results = results[phase]
+        print(f"{phase:>10}: p50 {phase_results['p50_ms'] or 0:.1f} ms, p99 {phase_results['p99_ms'] or 0:.1f} ms, "
+              f"statuses {phase_results['statuses']}")
+    print(f"large requests: {results['large_request_statuses']}")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of data_preprocessor.aggregate_data_for_hf (columnar PyArrow list<struct> build)
+against the previous groupby('unique_id').apply + iterrows implementation, on cleaned SemEval
+rows replicated (with fresh sentence ids) to 10k, 100k and 1M rows. Also checks that both
+produce the same Dataset features and rows.
+
+Usage (from services/ml-1):
+    python benchmarks/bench_aggregate_for_hf.py --rows 10000 100000 1000000 --legacy-max-rows 100000
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from datasets import Dataset
+
+from bench_utils import ML1_ROOT
+
+sys.path.insert(0, ML1_ROOT)
+from src.data_loader import load_and_combine_datasets  # noqa: E402
+from src.data_preprocessor import aggregate_data_for_hf, clean_and_standardize_data  # noqa: E402
+from bench_utils import DATA_DIR  # noqa: E402
+
+
+def _legacy_helper(group: pd.DataFrame) -> pd.Series:
+    aspect_list = []
+    for _, row in group.iterrows():
+        aspect_list.append({'term': row['aspect_term'], 'polarity': row['polarity'],
+                            'from': row['from'], 'to': row['to']})
+    return pd.Series({'original_id': group['id'].iloc[0], 'sentence': group['sentence'].iloc[0],
+                      'aspects': aspect_list, 'domain': group['domain'].iloc[0]})
+
+
+def legacy_aggregate_data_for_hf(df_cleaned: pd.DataFrame) -> Dataset:
+    """The previous implementation, without its logging."""
+    df_cleaned['unique_id'] = df_cleaned['domain'] + '_' + df_cleaned['id'].astype(str)
+    aggregated_df = df_cleaned.groupby('unique_id').apply(_legacy_helper).dropna().reset_index()
+    return Dataset.from_pandas(aggregated_df[['unique_id', 'sentence', 'aspects', 'domain']])
+
+
+def replicate_rows(df_cleaned: pd.DataFrame, num_rows: int) -> pd.DataFrame:
+    """Repeats the cleaned rows until there are `num_rows`, giving each copy its own sentence ids."""
+    copies = -(-num_rows // len(df_cleaned))
+    id_stride = int(df_cleaned['id'].max()) + 1
+    df = pd.concat([df_cleaned.assign(id=df_cleaned['id'] + copy * id_stride) for copy in range(copies)],
+                   ignore_index=True)
+    return df.iloc[:num_rows].copy()
+
+
+def same_features(legacy: Dataset, columnar: Dataset) -> bool:
+    # Dataset.from_pandas infers large_string for the pyarrow-backed strings of pandas >= 3
+    return str(legacy.features).replace("large_string", "string") == str(columnar.features)
+
+
+def timed(function, df: pd.DataFrame):
+    df = df.copy()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(df)
+        return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max-rows", type=int, default=100_000,
+                        help="skip the previous implementation above this many rows")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_cleaned = clean_and_standardize_data(load_and_combine_datasets(DATA_DIR))
+    df_cleaned['id'] = pd.to_numeric(df_cleaned['id'], errors='coerce').fillna(0).astype(np.int64)
+
+    print(f"{'rows':>9} {'sentences':>10} {'legacy_s':>9} {'columnar_s':>11} {'speedup':>8} {'identical':>10}")
+    for num_rows in args.rows:
+        df = replicate_rows(df_cleaned, num_rows)
+        columnar, columnar_seconds = timed(aggregate_data_for_hf, df)
+        legacy_seconds, identical = None, None
+        if num_rows <= args.legacy_max_rows:
+            legacy, legacy_seconds = timed(legacy_aggregate_data_for_hf, df)
+            identical = same_features(legacy, columnar) and legacy.to_list() == columnar.to_list()
+        print(f"{num_rows:>9} {len(columnar):>10} "
+              f"{legacy_seconds if legacy_seconds is not None else float('nan'):>9.2f} {columnar_seconds:>11.2f} "
+              f"{legacy_seconds / columnar_seconds if legacy_seconds else float('nan'):>7.1f}x {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compares the previous dict-of-dicts aspect aggregation, which put every raw term into the Gemma
+prompt and left the pro/con selection to the LLM, with aggregation.py: normalized terms counted
+the same way, and the top pros/cons selected with NumPy before the prompt is built. Aspects are the
+annotated SemEval aspect terms, grouped into reviews of 1-4 sentences. Reports aggregation and
+selection time, distinct terms and the size of the aspect data in the prompt.
+
+Usage (from services/ml-1):
+    python benchmarks/bench_aggregation.py --num-reviews 1000 10000 --repeats 10
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from bench_utils import DATA_DIR, SEMEVAL_FILES, add_service_to_path
+
+add_service_to_path()
+from aggregation import AspectSentimentAggregator  # noqa: E402
+
+TOP_N = 5
+
+
+def load_sentence_aspects() -> list:
+    """Aspect dicts (term, sentiment, score) of every annotated SemEval sentence."""
+    sentence_aspects = []
+    for file_name in SEMEVAL_FILES:
+        df = pd.read_csv(os.path.join(DATA_DIR, file_name), encoding='ISO-8859-1', on_bad_lines='skip')
+        df = df.dropna(subset=['Aspect Term'])
+        for _, group in df.groupby('id', sort=False):
+            sentence_aspects.append([{"term": term, "sentiment": polarity, "score": 0.9}
+                                     for term, polarity in zip(group['Aspect Term'], group['polarity'])])
+    return sentence_aspects
+
+
+def synthesize_review_aspects(sentence_aspects: list, num_reviews: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [[aspect for _ in range(rng.randint(1, 4)) for aspect in rng.choice(sentence_aspects)]
+            for _ in range(num_reviews)]
+
+
+def format_prompt_data(counts: dict) -> str:
+    return "\n".join(f"- Aspect: '{term}', Positive mentions: {c['positive']}, Negative mentions: {c['negative']}, "
+                     f"Neutral mentions: {c['neutral']}" for term, c in counts.items())
+
+
+def aggregate_dict(reviews: list) -> str:
+    """The previous aggregation: raw terms, every one of them in the prompt."""
+    counts = defaultdict(lambda: {"positive": 0, "negative": 0, "neutral": 0, "unknown": 0})
+    for aspects in reviews:
+        for aspect in aspects:
+            sentiment = aspect["sentiment"] if aspect["sentiment"] in ("positive", "negative", "neutral") else "unknown"
+            counts[aspect["term"]][sentiment] += 1
+    return format_prompt_data(counts), len(counts)
+
+
+def aggregate_normalized(reviews: list) -> str:
+    aggregator = AspectSentimentAggregator()
+    for aspects in reviews:
+        aggregator.add(aspects)
+    prompt_data = "\n".join([format_prompt_data(aggregator.counts_for(aggregator.top_pros(TOP_N))),
+                             format_prompt_data(aggregator.counts_for(aggregator.top_cons(TOP_N)))])
+    return prompt_data, len(aggregator.terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--num-reviews", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sentence_aspects = load_sentence_aspects()
+    print(f"{'reviews':>8} {'mode':>10} {'median_ms':>10} {'terms':>7} {'prompt_chars':>13}")
+    for num_reviews in args.num_reviews:
+        reviews = synthesize_review_aspects(sentence_aspects, num_reviews, args.seed)
+        modes = (("dict", aggregate_dict), ("normalized", aggregate_normalized))
+        timings = {mode: [] for mode, _ in modes}
+        outputs = {}
+        # Modes alternate within each repeat, so drift on a noisy host affects both alike.
+        for _ in range(args.repeats):
+            for mode, aggregate in modes:
+                start = time.perf_counter()
+                outputs[mode] = aggregate(reviews)
+                timings[mode].append((time.perf_counter() - start) * 1000)
+        for mode, _ in modes:
+            prompt_data, num_terms = outputs[mode]
+            print(f"{num_reviews:>8} {mode:>10} {statistics.median(timings[mode]):>10.2f} {num_terms:>7} "
+                  f"{len(prompt_data):>13}")
+
+
+if __name__ == "__main__":
+    main()
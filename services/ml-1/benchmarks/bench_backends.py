@@ -0,0 +1,76 @@
+"""
+Latency/throughput comparison of the PyTorch and ONNX Runtime inference backends on CPU,
+using the service's batched inference path on reviews synthesized from the SemEval data.
+
+Usage (from services/ml-1, after `python -m src.export_to_onnx`):
+    python benchmarks/bench_backends.py --onnx-dir saved_models/onnx --threads 4 --batch-sizes 1 8 32
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForTokenClassification, AutoTokenizer
+
+from bench_utils import add_service_to_path, synthesize_reviews
+
+add_service_to_path()
+from absa_inference import run_batched_inference  # noqa: E402
+from inference_backends import OnnxRuntimeBackend, TorchBackend  # noqa: E402
+from main import MAX_SEQ_LENGTH, MODEL_ID_ON_HUB  # noqa: E402
+
+
+def measure(backend, tokenizer, reviews, batch_size, repeats):
+    run_batched_inference(reviews[:batch_size], backend, tokenizer, batch_size, MAX_SEQ_LENGTH)  # warmup
+    batch_latencies = []
+    totals = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for batch_start in range(0, len(reviews), batch_size):
+            batch_start_time = time.perf_counter()
+            run_batched_inference(reviews[batch_start:batch_start + batch_size], backend, tokenizer,
+                                  batch_size, MAX_SEQ_LENGTH)
+            batch_latencies.append(time.perf_counter() - batch_start_time)
+        totals.append(time.perf_counter() - start)
+    latencies_ms = np.array(batch_latencies) * 1000
+    return {
+        "reviews_per_sec": len(reviews) / min(totals),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=MODEL_ID_ON_HUB)
+    parser.add_argument("--onnx-dir", default=os.path.join("saved_models", "onnx"))
+    parser.add_argument("--onnx-files", nargs="+", default=["model.onnx"],
+                        help="ONNX graphs inside --onnx-dir to compare (e.g. model.onnx model.int8.onnx)")
+    parser.add_argument("--num-reviews", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads for both backends (0 = default)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    backends = {"pytorch": TorchBackend(AutoModelForTokenClassification.from_pretrained(args.model).eval(),
+                                        torch.device("cpu"))}
+    id2label = AutoConfig.from_pretrained(args.onnx_dir).id2label
+    for onnx_file in args.onnx_files:
+        backends[f"onnxruntime:{onnx_file}"] = OnnxRuntimeBackend(os.path.join(args.onnx_dir, onnx_file), id2label,
+                                                                  intra_op_threads=args.threads)
+    reviews = synthesize_reviews(args.num_reviews)
+
+    print(f"{'backend':<32} {'batch':>5} {'reviews/sec':>12} {'p50 ms':>9} {'p95 ms':>9}")
+    for batch_size in args.batch_sizes:
+        for name, backend in backends.items():
+            result = measure(backend, tokenizer, reviews, batch_size, args.repeats)
+            print(f"{name:<32} {batch_size:>5} {result['reviews_per_sec']:>12.1f} "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares reviews/sec of the batched BERT inference path at several batch sizes on CPU.
+
+Usage (from services/ml-1):
+    python benchmarks/bench_batch_inference.py --num-reviews 200 --batch-sizes 1 8 32 64
+"""
+import argparse
+import time
+
+import torch
+from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+from bench_utils import add_service_to_path, synthesize_reviews
+
+add_service_to_path()
+from absa_inference import run_batched_inference  # noqa: E402
+from inference_backends import TorchBackend  # noqa: E402
+from main import MODEL_ID_ON_HUB, MAX_SEQ_LENGTH  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=MODEL_ID_ON_HUB)
+    parser.add_argument("--num-reviews", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--max-tokens-per-batch", type=int, default=None,
+                        help="padded token budget per batch (length bucketing); unlimited by default")
+    parser.add_argument("--max-padding-ratio", type=float, default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device("cpu")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForTokenClassification.from_pretrained(args.model).to(device).eval()
+    backend = TorchBackend(model, device)
+    reviews = synthesize_reviews(args.num_reviews)
+
+    # Warm up kernels so the first measured batch size is not penalized.
+    run_batched_inference(reviews[:8], backend, tokenizer, 8, MAX_SEQ_LENGTH)
+
+    print(f"{'batch_size':>10} {'best_sec':>10} {'reviews/sec':>12}")
+    reference = None
+    for batch_size in args.batch_sizes:
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            results = run_batched_inference(reviews, backend, tokenizer, batch_size, MAX_SEQ_LENGTH,
+                                            args.max_tokens_per_batch, args.max_padding_ratio)
+            timings.append(time.perf_counter() - start)
+        if reference is None:
+            reference = results
+        mismatched = sum(
+            [(e["term"], e["sentiment"]) for e in a] != [(e["term"], e["sentiment"]) for e in b]
+            for a, b in zip(reference, results)
+        )
+        best = min(timings)
+        print(f"{batch_size:>10} {best:>10.3f} {len(reviews) / best:>12.1f}"
+              + (f"  ({mismatched} reviews differ from batch size {args.batch_sizes[0]})" if mismatched else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cold-start benchmark for the ABSA service: starts serve_fake_gemma.py several times and measures,
+from process spawn, how long until /health/live and /health/ready answer, then the latency of the
+first and second /analyze requests. Runs with and without warmup so the effect of the
+WARMUP_SEQ_LENGTHS dummy batches on first-request latency is visible.
+
+Model settings come from the environment as usual; for an offline cold start point MODEL_LOCAL_DIR
+at an artifact written by `python -m src.pin_serving_model` (and set HF_HUB_OFFLINE=1 to be sure).
+
+Usage (from services/ml-1):
+    MODEL_LOCAL_DIR=saved_models/serving python benchmarks/bench_cold_start.py --runs 3 --output results/cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from bench_utils import synthesize_reviews
+from load_test import BENCHMARKS_DIR, free_port
+
+
+def measure_cold_start(extra_env: dict, payload: dict, timeout_seconds: float) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    spawn_time = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, "serve_fake_gemma.py"), "--port", str(port),
+         "--gemma-latency", "0"],
+        cwd=BENCHMARKS_DIR, env=dict(os.environ, **extra_env),
+    )
+    result = {"time_to_live_s": None, "time_to_ready_s": None}
+    try:
+        deadline = spawn_time + timeout_seconds
+        while time.perf_counter() < deadline and result["time_to_ready_s"] is None:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited during startup with status {process.returncode}")
+            try:
+                if result["time_to_live_s"] is None and requests.get(f"{url}/health/live", timeout=1).ok:
+                    result["time_to_live_s"] = time.perf_counter() - spawn_time
+                ready = requests.get(f"{url}/health/ready", timeout=1)
+                if ready.status_code == 200:
+                    result["time_to_ready_s"] = time.perf_counter() - spawn_time
+                    result["server_startup_seconds"] = ready.json()["startup"]["seconds"]
+                    break
+                if ready.json().get("status") == "failed":
+                    raise RuntimeError(f"Model failed to load: {ready.json().get('error')}")
+            except requests.RequestException:
+                pass
+            time.sleep(0.02)
+        if result["time_to_ready_s"] is None:
+            raise RuntimeError(f"Server was not ready after {timeout_seconds}s")
+
+        for name in ("first_request_ms", "second_request_ms"):
+            start = time.perf_counter()
+            response = requests.post(f"{url}/analyze", json=payload, timeout=120)
+            response.raise_for_status()
+            result[name] = (time.perf_counter() - start) * 1000
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per configuration")
+    parser.add_argument("--reviews", type=int, default=20, help="reviews in the measured requests")
+    parser.add_argument("--warmup-seq-lengths", default="16,32,64,128,256,512")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Caches off so the second request measures a warm model rather than a cache hit.
+    payload = {"reviews": synthesize_reviews(args.reviews, seed=7)}
+    base_env = {"ASPECT_CACHE_MAX_ENTRIES": "0", "SUMMARY_CACHE_MAX_ENTRIES": "0", "LOG_LEVEL": "WARNING"}
+    configurations = {"no_warmup": {"WARMUP_SEQ_LENGTHS": ""},
+                      "warmup": {"WARMUP_SEQ_LENGTHS": args.warmup_seq_lengths}}
+    results = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "reviews_per_request": args.reviews,
+               "model_local_dir": os.getenv("MODEL_LOCAL_DIR") or None, "configurations": {}}
+
+    print(f"{'configuration':>14} {'live_s':>8} {'ready_s':>8} {'first_ms':>9} {'second_ms':>10}")
+    for name, env in configurations.items():
+        runs = [measure_cold_start(dict(base_env, **env), payload, args.startup_timeout) for _ in range(args.runs)]
+        summary = {metric: statistics.median(run[metric] for run in runs)
+                   for metric in ("time_to_live_s", "time_to_ready_s", "first_request_ms", "second_request_ms")}
+        results["configurations"][name] = {"median": summary, "runs": runs}
+        print(f"{name:>14} {summary['time_to_live_s']:>8.2f} {summary['time_to_ready_s']:>8.2f} "
+              f"{summary['first_request_ms']:>9.1f} {summary['second_request_ms']:>10.1f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
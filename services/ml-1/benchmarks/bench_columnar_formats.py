@@ -0,0 +1,107 @@
+"""
+Load time, peak memory and file size of the review data as the two SemEval CSVs (pd.read_csv,
+as load_and_combine_datasets reads them) and as the typed columnar files of convert_to_columnar:
+Parquet (zstd) and uncompressed Arrow IPC, each with all pipeline columns and projected to the
+three columns a classifier needs. The SemEval rows are replicated (with fresh sentence ids) to
+the requested sizes; every load runs in a fresh subprocess so its peak RSS is its own.
+
+Usage (from services/ml-1):
+    python benchmarks/bench_columnar_formats.py --rows 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from bench_utils import DATA_DIR, ML1_ROOT, SEMEVAL_FILES
+
+sys.path.insert(0, ML1_ROOT)
+from src import config  # noqa: E402
+from src.convert_to_columnar import convert_to_columnar  # noqa: E402
+from src.data_loader import PIPELINE_COLUMNS, read_review_table, review_table_to_pandas  # noqa: E402
+
+CLASSIFIER_COLUMNS = ["sentence", "aspect_term", "polarity"]
+CASES = ("csv", "parquet", "parquet_projected", "arrow", "arrow_projected")
+
+
+def write_replicated_csvs(target_dir: str, num_rows: int) -> None:
+    """Writes both SemEval CSVs, repeated with fresh ids until together they hold `num_rows` rows."""
+    frames = [pd.read_csv(os.path.join(DATA_DIR, file_name), encoding='ISO-8859-1', on_bad_lines='skip')
+              for file_name in SEMEVAL_FILES]
+    total_rows = sum(len(df) for df in frames)
+    for file_name, df in zip(SEMEVAL_FILES, frames):
+        rows = round(num_rows * len(df) / total_rows)
+        copies = -(-rows // len(df))
+        id_stride = int(pd.to_numeric(df['id'], errors='coerce').max()) + 1
+        replicated = pd.concat([df.assign(id=pd.to_numeric(df['id'], errors='coerce') + copy * id_stride)
+                                for copy in range(copies)], ignore_index=True).iloc[:rows]
+        replicated.to_csv(os.path.join(target_dir, file_name), index=False, encoding='ISO-8859-1')
+
+
+def load_case(case: str, data_dir: str) -> pd.DataFrame:
+    if case == "csv":
+        frames = []
+        for file_name, domain in ((config.LAPTOP_TRAIN_FILE, 'laptop'), (config.RESTO_TRAIN_FILE, 'restaurant')):
+            df = pd.read_csv(os.path.join(data_dir, file_name), encoding='ISO-8859-1', on_bad_lines='skip')
+            frames.append(df.assign(domain=domain))
+        return pd.concat(frames, ignore_index=True)
+    file_format, _, projected = case.partition("_")
+    columns = CLASSIFIER_COLUMNS if projected else PIPELINE_COLUMNS
+    return review_table_to_pandas(read_review_table(os.path.join(data_dir, f"reviews.{file_format}"), columns))
+
+
+def run_case(case: str, data_dir: str) -> dict:
+    """Runs in the subprocess: loads once and reports the time and the process's peak RSS (same imports in every case)."""
+    start = time.perf_counter()
+    df = load_case(case, data_dir)
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"seconds": seconds, "peak_mb": peak_kb / 1024, "rows": len(df),
+            "frame_mb": df.memory_usage(deep=True).sum() / 1e6}
+
+
+def measure(case: str, data_dir: str) -> dict:
+    output = subprocess.run([sys.executable, __file__, "--case", case, "--data-dir", data_dir],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.data_dir)))
+        return
+
+    print(f"{'rows':>9} {'format':>18} {'file_mb':>8} {'load_s':>7} {'peak_rss_mb':>12} {'frame_mb':>9}")
+    for num_rows in args.rows:
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_replicated_csvs(data_dir, num_rows)
+            with contextlib.redirect_stdout(io.StringIO()):
+                for file_format in ("parquet", "arrow"):
+                    convert_to_columnar(data_dir, os.path.join(data_dir, f"reviews.{file_format}"))
+            file_mb = {
+                "csv": sum(os.path.getsize(os.path.join(data_dir, name)) for name in SEMEVAL_FILES) / 1e6,
+                "parquet": os.path.getsize(os.path.join(data_dir, "reviews.parquet")) / 1e6,
+                "arrow": os.path.getsize(os.path.join(data_dir, "reviews.arrow")) / 1e6,
+            }
+            for case in CASES:
+                result = measure(case, data_dir)
+                print(f"{result['rows']:>9} {case:>18} {file_mb[case.partition('_')[0]]:>8.1f} "
+                      f"{result['seconds']:>7.2f} {result['peak_mb']:>12.1f} {result['frame_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
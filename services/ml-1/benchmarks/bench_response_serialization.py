@@ -0,0 +1,108 @@
+"""
+Compares how /analyze responses are built and encoded:
+  pydantic   - Aspect/ReviewAspects/AnalyzeResponse models validated and JSON-encoded the way FastAPI
+               does it for a response_model (the previous /analyze path)
+  orjson     - the same full response as plain dicts encoded with orjson (current default)
+  aggregate  - response_mode=aggregate: aggregated counts + summary only, encoded with orjson
+and reports encoding time and payload size per request size.
+
+Usage (from services/ml-1):
+    python benchmarks/bench_response_serialization.py --num-reviews 200 1000 --repeats 20
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+
+import orjson
+
+from bench_utils import add_service_to_path, synthesize_reviews
+
+add_service_to_path()
+from aggregation import AspectSentimentAggregator  # noqa: E402
+from main import AnalysisMetadata, AnalyzeResponse, Aspect, FinalSummary, ReviewAspects  # noqa: E402
+
+SENTIMENTS = ("positive", "negative", "neutral")
+
+
+def synthesize_results(num_reviews: int, seed: int) -> list:
+    """Reviews with 1-4 aspects each, drawn from their own words (offsets included)."""
+    rng = random.Random(seed)
+    results = []
+    for review_text in synthesize_reviews(num_reviews, seed=seed):
+        words = [match for match in re.finditer(r"[A-Za-z]{4,}", review_text)]
+        aspects = [{"term": match.group().lower(), "sentiment": rng.choice(SENTIMENTS),
+                    "score": round(rng.uniform(0.5, 1.0), 4), "start": match.start(), "end": match.end()}
+                   for match in rng.sample(words, min(len(words), rng.randint(1, 4)))]
+        results.append((review_text, aspects))
+    return results
+
+
+def build_pydantic(results: list, final_summary: FinalSummary, metadata: AnalysisMetadata) -> bytes:
+    response = AnalyzeResponse(
+        analysis_results=[ReviewAspects(review_text=review_text, extracted_aspects=[Aspect(**a) for a in aspects])
+                          for review_text, aspects in results],
+        final_summary=final_summary, metadata=metadata,
+    )
+    # FastAPI 0.115 re-validates the returned model against response_model, dumps it to JSON-able
+    # data and renders it with json.dumps in JSONResponse.
+    validated = AnalyzeResponse.model_validate(response.model_dump())
+    return json.dumps(validated.model_dump(mode="json"), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def build_orjson(results: list, final_summary: FinalSummary, metadata: AnalysisMetadata) -> bytes:
+    return orjson.dumps({
+        "analysis_results": [{"review_text": review_text, "extracted_aspects": aspects}
+                             for review_text, aspects in results],
+        "message": "Aspects, sentiments (BERT) and summary (Gemma) extracted successfully",
+        "final_summary": final_summary.model_dump(),
+        "metadata": metadata.model_dump(),
+    })
+
+
+def build_aggregate(results: list, final_summary: FinalSummary, metadata: AnalysisMetadata) -> bytes:
+    aggregator = AspectSentimentAggregator()
+    for _, aspects in results:
+        aggregator.add(aspects)
+    return orjson.dumps({
+        "aggregated_aspects": aggregator.counts,
+        "message": "Aggregated aspect sentiments (BERT) and summary (Gemma) extracted successfully",
+        "final_summary": final_summary.model_dump(),
+        "metadata": metadata.model_dump(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--num-reviews", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    final_summary = FinalSummary(pros=["battery life", "screen"], cons=["keyboard"],
+                                 summary_paragraph="Customers praise the battery life and the screen. " * 4)
+    builders = {"pydantic": build_pydantic, "orjson": build_orjson, "aggregate": build_aggregate}
+    print(f"{'reviews':>8} {'mode':>10} {'median_ms':>10} {'bytes':>10} {'vs_pydantic':>12}")
+    for num_reviews in args.num_reviews:
+        results = synthesize_results(num_reviews, args.seed)
+        metadata = AnalysisMetadata(stage_timings_ms={"tokenize": 1.0}, total_ms=1.0, reviews_analyzed=num_reviews,
+                                    summary_based_on_reviews=num_reviews, summary_started_early=False,
+                                    sentences_total=num_reviews, sentences_unique=num_reviews,
+                                    sentence_dedup_ratio=0.0)
+        baseline_ms = None
+        for mode, build in builders.items():
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                payload = build(results, final_summary, metadata)
+                timings.append((time.perf_counter() - start) * 1000)
+            median_ms = statistics.median(timings)
+            baseline_ms = baseline_ms or median_ms
+            print(f"{num_reviews:>8} {mode:>10} {median_ms:>10.2f} {len(payload):>10} {baseline_ms / median_ms:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Exercises the Gemma summary cache against a local fake GenerativeModel: concurrent requests
+with the same aggregated aspects must share one LLM call, repeats must be served from the
+cache, and failures must not be cached.
+
+Usage (from services/ml-1):
+    python benchmarks/bench_summary_cache.py --concurrency 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from bench_utils import add_service_to_path
+from fake_gemma import FakeGenerativeModel
+
+add_service_to_path()
+import main  # noqa: E402
+from summary_cache import SummaryCache  # noqa: E402
+
+
+def sample_aggregate(variant: int = 0):
+    """Aggregated aspects of two reviews, added as run_analysis_pipeline adds them (plain dicts shaped like Aspect)."""
+    aggregator = main.new_aspect_aggregator()
+    aggregator.add([
+        {"term": "battery", "sentiment": "positive", "score": 0.98, "start": 4, "end": 11},
+        {"term": "screen", "sentiment": "negative", "score": 0.95 - variant / 100, "start": 30, "end": 36},
+    ])
+    aggregator.add([{"term": f"keyboard {variant}", "sentiment": "negative", "score": 0.9, "start": 0, "end": 8}])
+    return aggregator
+
+
+async def timed_round(label: str, concurrency: int, variant: int = 0):
+    start = time.perf_counter()
+    summaries = await asyncio.gather(*(main.summarize_aggregated_sentiments(sample_aggregate(variant))
+                                       for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:>9.1f} ms  LLM calls so far: {main.gemma_llm.calls}")
+    return summaries
+
+
+async def run(args):
+    main.gemma_llm = FakeGenerativeModel(latency_seconds=args.latency)
+    main.summary_cache = SummaryCache(ttl_seconds=args.ttl, max_entries=128)
+
+    await timed_round(f"{args.concurrency} concurrent, cold", args.concurrency)
+    await timed_round(f"{args.concurrency} concurrent, warm", args.concurrency)
+    await timed_round("new aspect distribution", args.concurrency, variant=1)
+    await asyncio.sleep(args.ttl)
+    await timed_round("after TTL expiry", args.concurrency)
+
+    main.gemma_llm = FakeGenerativeModel(latency_seconds=args.latency, fail=True)
+    summaries = await timed_round("failing LLM", 2, variant=2)
+    print(f"{'failing LLM':<32} fallback returned: {summaries[0].summary_paragraph[:40]!r}")
+    await timed_round("failing LLM (retry)", 2, variant=2)
+    print("summary cache stats:", main.summary_cache.stats())
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency in seconds")
+    parser.add_argument("--ttl", type=float, default=1.0, help="summary cache TTL in seconds")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
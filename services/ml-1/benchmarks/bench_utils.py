@@ -0,0 +1,41 @@
+"""
+Shared helpers for the benchmark scripts: import paths and sample review payloads
+synthesized from the SemEval CSVs in ../data.
+"""
+import os
+import random
+import sys
+
+import pandas as pd
+
+ML1_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVICE_DIR = os.path.join(ML1_ROOT, "src", "ml_api_service")
+DATA_DIR = os.path.join(ML1_ROOT, "data")
+SEMEVAL_FILES = ["Laptop_Train_v2.csv", "Restaurants_Train_v2.csv"]
+
+
+def add_service_to_path():
+    """Makes the ml_api_service modules importable the same way uvicorn sees them (`import main`)."""
+    if SERVICE_DIR not in sys.path:
+        sys.path.insert(0, SERVICE_DIR)
+
+
+def load_semeval_sentences(data_dir: str = DATA_DIR) -> list:
+    """Returns the unique sentences of both SemEval training files."""
+    sentences = []
+    for file_name in SEMEVAL_FILES:
+        df = pd.read_csv(os.path.join(data_dir, file_name), encoding='ISO-8859-1', on_bad_lines='skip')
+        sentences.extend(df['Sentence'].dropna().astype(str).str.strip().unique().tolist())
+    return sentences
+
+
+def synthesize_reviews(num_reviews: int, sentences_per_review=(1, 4), seed: int = 42,
+                       data_dir: str = DATA_DIR) -> list:
+    """Builds review-like texts by joining a few random SemEval sentences."""
+    rng = random.Random(seed)
+    sentences = load_semeval_sentences(data_dir)
+    reviews = []
+    for _ in range(num_reviews):
+        count = rng.randint(*sentences_per_review)
+        reviews.append(" ".join(rng.choice(sentences) for _ in range(count)))
+    return reviews
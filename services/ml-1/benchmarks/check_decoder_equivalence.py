@@ -0,0 +1,88 @@
+"""
+Checks that the vectorized BIO decoder returns the same aspects as the transformers
+token-classification pipeline with aggregation_strategy="simple" (the previous serving path):
+same term, sentiment and character span, and a score within --score-tolerance. Also reports
+how long each path takes to decode. Exits with status 1 if any review differs.
+
+Usage (from services/ml-1):
+    python benchmarks/check_decoder_equivalence.py --num-reviews 500
+"""
+import argparse
+import sys
+import time
+
+import torch
+from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
+
+from bench_utils import add_service_to_path, synthesize_reviews
+
+add_service_to_path()
+from absa_inference import ASPECT_SENTIMENTS, run_batched_inference  # noqa: E402
+from inference_backends import TorchBackend  # noqa: E402
+from main import MAX_SEQ_LENGTH, MODEL_ID_ON_HUB  # noqa: E402
+
+
+def pipeline_aspects(entities):
+    """Maps pipeline entities to aspects the way the service did before the vectorized decoder."""
+    aspects = []
+    for entity in entities:
+        entity_group = entity["entity_group"]
+        if entity_group.startswith("ASP-"):
+            aspects.append({
+                "term": entity["word"].strip(),
+                "sentiment": ASPECT_SENTIMENTS.get(entity_group.split("-", 1)[1], "unknown"),
+                "score": float(entity["score"]),
+                "start": entity["start"],
+                "end": entity["end"],
+            })
+    return aspects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=MODEL_ID_ON_HUB)
+    parser.add_argument("--num-reviews", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--score-tolerance", type=float, default=1e-3,
+                        help="padding changes logits slightly, so scores are compared with a tolerance")
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForTokenClassification.from_pretrained(args.model).to(device).eval()
+    ner_pipeline = pipeline("token-classification", model=model, tokenizer=tokenizer,
+                            aggregation_strategy="simple", device=-1)
+    backend = TorchBackend(model, device)
+    reviews = synthesize_reviews(args.num_reviews)
+
+    start = time.perf_counter()
+    expected = [pipeline_aspects(entities) for entities in ner_pipeline(reviews, batch_size=args.batch_size)]
+    pipeline_seconds = time.perf_counter() - start
+    timings = {}
+    actual = run_batched_inference(reviews, backend, tokenizer, args.batch_size, MAX_SEQ_LENGTH, timings=timings)
+
+    mismatched = 0
+    max_score_diff = 0.0
+    for review, want, got in zip(reviews, expected, actual):
+        same_spans = [(a["term"], a["sentiment"], a["start"], a["end"]) for a in want] == \
+                     [(a["term"], a["sentiment"], a["start"], a["end"]) for a in got]
+        score_diff = max((abs(a["score"] - b["score"]) for a, b in zip(want, got)), default=0.0)
+        max_score_diff = max(max_score_diff, score_diff)
+        if not same_spans or score_diff > args.score_tolerance:
+            mismatched += 1
+            if mismatched <= 5:
+                print(f"MISMATCH: {review!r}\n  pipeline: {want}\n  decoder:  {got}")
+
+    print(f"Reviews checked:       {len(reviews)}")
+    print(f"Aspects (pipeline):    {sum(len(a) for a in expected)}")
+    print(f"Max |score diff|:      {max_score_diff:.6f}")
+    print(f"Pipeline total:        {pipeline_seconds:.3f}s")
+    print(f"Decoder total:         {sum(timings.values()):.3f}s (decode stage {timings['decode'] * 1000:.1f} ms)")
+    if mismatched:
+        print(f"FAILED: {mismatched} reviews differ")
+        sys.exit(1)
+    print("OK: decoder output matches the pipeline.")
+
+
+if __name__ == "__main__":
+    main()
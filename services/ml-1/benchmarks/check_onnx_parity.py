@@ -0,0 +1,71 @@
+"""
+Checks that the ONNX export predicts the same labels as the PyTorch model: runs every
+unique SemEval sentence in ../data through both backends and compares the argmax label
+of each real (non-padding) token. Exits with status 1 if the mismatch rate is above --max-mismatch-rate.
+
+Usage (from services/ml-1, after `python -m src.export_to_onnx`):
+    python benchmarks/check_onnx_parity.py --onnx-dir saved_models/onnx
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForTokenClassification, AutoTokenizer
+
+from bench_utils import add_service_to_path, load_semeval_sentences
+
+add_service_to_path()
+from absa_inference import collate_input_ids, encode_reviews  # noqa: E402
+from inference_backends import OnnxRuntimeBackend, TorchBackend  # noqa: E402
+from main import MAX_SEQ_LENGTH, MODEL_ID_ON_HUB  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=MODEL_ID_ON_HUB, help="PyTorch model (local dir or Hub id)")
+    parser.add_argument("--onnx-dir", default=os.path.join("saved_models", "onnx"))
+    parser.add_argument("--onnx-file", default="model.onnx")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-mismatch-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    torch_backend = TorchBackend(AutoModelForTokenClassification.from_pretrained(args.model).eval(),
+                                 torch.device("cpu"))
+    onnx_backend = OnnxRuntimeBackend(os.path.join(args.onnx_dir, args.onnx_file),
+                                      AutoConfig.from_pretrained(args.onnx_dir).id2label)
+
+    sentences = load_semeval_sentences()
+    encodings = encode_reviews(sentences, tokenizer, MAX_SEQ_LENGTH)
+    total_tokens = 0
+    mismatched_tokens = 0
+    mismatched_sentences = 0
+    max_abs_logit_diff = 0.0
+    for start in range(0, len(sentences), args.batch_size):
+        input_ids, attention_mask = collate_input_ids(encodings["input_ids"][start:start + args.batch_size],
+                                                      tokenizer.pad_token_id)
+        torch_logits = torch_backend.forward_logits(input_ids, attention_mask)
+        onnx_logits = onnx_backend.forward_logits(input_ids, attention_mask)
+        real_tokens = attention_mask.astype(bool)
+        differs = (torch_logits.argmax(-1) != onnx_logits.argmax(-1)) & real_tokens
+        total_tokens += int(real_tokens.sum())
+        mismatched_tokens += int(differs.sum())
+        mismatched_sentences += int(differs.any(axis=1).sum())
+        max_abs_logit_diff = max(max_abs_logit_diff, float(np.abs(torch_logits - onnx_logits)[real_tokens].max()))
+
+    mismatch_rate = mismatched_tokens / total_tokens if total_tokens else 0.0
+    print(f"Sentences checked:       {len(sentences)}")
+    print(f"Tokens checked:          {total_tokens}")
+    print(f"Label mismatches:        {mismatched_tokens} tokens in {mismatched_sentences} sentences "
+          f"(rate {mismatch_rate:.6f})")
+    print(f"Max |logit difference|:  {max_abs_logit_diff:.6f}")
+    if mismatch_rate > args.max_mismatch_rate:
+        print(f"FAILED: mismatch rate above {args.max_mismatch_rate}")
+        sys.exit(1)
+    print("OK: ONNX labels match PyTorch.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Checks that aggregation.TermNormalizer maps plural aspect terms to their singular (and aliases to
+their canonical term) for a list of known cases, including the spelling rules that are easy to get
+wrong: silent "e" before "-s" ("sizes", "caches"), sibilant "-es" ("boxes", "churches") and "-ies"
+nouns ending in "ie" ("movies"). Exits with status 1 if any term is normalized differently.
+
+Usage (from services/ml-1):
+    python benchmarks/check_term_normalization.py
+"""
+import sys
+
+from bench_utils import add_service_to_path
+
+add_service_to_path()
+from aggregation import TermNormalizer  # noqa: E402
+
+# Raw term -> expected canonical term
+EXPECTED_TERMS = {
+    # Regular "-s"
+    "screens": "screen", "keyboards": "keyboard", "prices": "price",
+    # Silent "e" before "-s": only the "s" goes
+    "size": "size", "sizes": "size", "prizes": "prize", "cases": "case", "caches": "cache",
+    "headaches": "headache", "quiches": "quiche",
+    # Sibilant endings take "-es"
+    "glasses": "glass", "boxes": "box", "buzzes": "buzz", "dishes": "dish", "churches": "church",
+    "sandwiches": "sandwich", "quizzes": "quiz",
+    # "-ies"
+    "batteries": "battery", "movies": "movie", "pies": "pie", "cookies": "cookie",
+    # Irregular and unchanged words
+    "knives": "knife", "tomatoes": "tomato", "menus": "menu", "fries": "fries", "series": "series", "os": "operating system",
+    # Determiners, punctuation and aliases
+    "The Batteries": "battery", "battery life": "battery", "my  Screen!": "screen", "Customer Service": "service",
+}
+
+
+def main():
+    normalizer = TermNormalizer()
+    mismatched = 0
+    for raw_term, expected in EXPECTED_TERMS.items():
+        got = normalizer(raw_term)
+        if got != expected:
+            mismatched += 1
+            print(f"MISMATCH: {raw_term!r} -> {got!r}, expected {expected!r}")
+
+    print(f"Terms checked: {len(EXPECTED_TERMS)}")
+    if mismatched:
+        print(f"FAILED: {mismatched} terms normalized differently")
+        sys.exit(1)
+    print("OK: every term normalizes as expected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Local stand-in for `google.generativeai.GenerativeModel` so benchmarks can run the
+service end to end without an API key or network access.
+"""
+import asyncio
+import json
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Answers every prompt with a fixed JSON summary after `latency_seconds`, and counts calls.
+
+    Args:
+        latency_seconds (float): Simulated LLM latency.
+        fail (bool): Raise instead of answering, to exercise the service's fallback path.
+    """
+
+    def __init__(self, latency_seconds: float = 0.5, fail: bool = False):
+        self.latency_seconds = latency_seconds
+        self.fail = fail
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        if self.fail:
+            raise RuntimeError("Fake Gemma failure")
+        summary = {
+            "pros": ["Stub pro (fake Gemma)."],
+            "cons": ["Stub con (fake Gemma)."],
+            "summary_paragraph": f"Stub summary for a prompt of {len(prompt)} characters.",
+        }
+        return FakeResponse("```json\n" + json.dumps(summary) + "\n```")
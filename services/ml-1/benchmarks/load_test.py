@@ -0,0 +1,269 @@
+"""
+Load test for the /analyze API: replays review payloads at several concurrency levels and request sizes.
+By default it starts the service locally with a fake Gemma (serve_fake_gemma.py). It reports
+p50/p95/p99 latency, reviews/sec and the server's peak RSS, saves the results as JSON, and
+exits with status 1 if a --baseline run is regressed beyond --max-regression.
+
+Payloads are synthesized from the SemEval CSVs in ../data, or taken from a recorded corpus
+(--corpus: a JSON list of review strings, or a text file with one review per line).
+
+Usage (from services/ml-1):
+    python benchmarks/load_test.py --concurrency 1 8 32 --reviews-per-request 10 100 --output results/load.json
+    python benchmarks/load_test.py --baseline results/load.json --max-regression 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_utils import synthesize_reviews
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [str(review) for review in json.load(f)]
+        return [line.strip() for line in f if line.strip()]
+
+
+def build_payloads(pool: list, num_requests: int, reviews_per_request: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [{"reviews": rng.sample(pool, reviews_per_request) if reviews_per_request <= len(pool)
+             else rng.choices(pool, k=reviews_per_request)}
+            for _ in range(num_requests)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, gemma_latency: float, extra_env: dict, timeout_seconds: float, workers: int = 1):
+    env = dict(os.environ, **extra_env)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, "serve_fake_gemma.py"), "--port", str(port),
+         "--gemma-latency", str(gemma_latency), "--workers", str(workers)],
+        cwd=BENCHMARKS_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout_seconds
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with status {process.returncode}")
+        try:
+            if requests.get(f"{url}/health/ready", timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Server was not ready after {timeout_seconds}s")
+
+
+def _read_proc_kb(path: str, field: str):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def read_peak_rss_mb(pid: int):
+    """Peak resident set size (VmHWM) of a process in MiB, or None where /proc is unavailable."""
+    peak_kb = _read_proc_kb(f"/proc/{pid}/status", "VmHWM:")
+    return peak_kb / 1024 if peak_kb is not None else None
+
+
+def read_process_memory(pid: int) -> dict:
+    """
+    Peak RSS and current PSS of a process in MiB. PSS divides shared pages (such as model
+    weights shared by forked workers) between the processes that map them, so the PSS of all
+    workers adds up to the real footprint while their RSS double counts the shared weights.
+    """
+    pss_kb = _read_proc_kb(f"/proc/{pid}/smaps_rollup", "Pss:")
+    return {"pid": pid, "peak_rss_mb": read_peak_rss_mb(pid),
+            "pss_mb": round(pss_kb / 1024, 1) if pss_kb is not None else None}
+
+
+def child_pids(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(url: str, endpoint: str, payloads: list, concurrency: int) -> dict:
+    """Sends all payloads with `concurrency` client threads (one HTTP session each) and times every request."""
+    thread_state = threading.local()
+    sessions = []
+
+    def send(payload):
+        session = getattr(thread_state, "session", None)
+        if session is None:
+            session = thread_state.session = requests.Session()
+            sessions.append(session)
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}{endpoint}", json=payload, timeout=600)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok, len(payload["reviews"])
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, payloads))
+    wall_seconds = time.perf_counter() - wall_start
+    for session in sessions:
+        session.close()
+
+    latencies_ms = sorted(seconds * 1000 for seconds, ok, _ in results if ok)
+    reviews_ok = sum(num_reviews for _, ok, num_reviews in results if ok)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok, _ in results if not ok),
+        "p50_ms": round(percentile(latencies_ms, 0.50), 2) if latencies_ms else None,
+        "p95_ms": round(percentile(latencies_ms, 0.95), 2) if latencies_ms else None,
+        "p99_ms": round(percentile(latencies_ms, 0.99), 2) if latencies_ms else None,
+        "mean_ms": round(statistics.fmean(latencies_ms), 2) if latencies_ms else None,
+        "wall_seconds": round(wall_seconds, 3),
+        "requests_per_sec": round(len(latencies_ms) / wall_seconds, 2),
+        "reviews_per_sec": round(reviews_ok / wall_seconds, 2),
+    }
+
+
+def check_regressions(results: dict, baseline: dict, max_regression: float) -> list:
+    """Compares scenarios with the same (concurrency, reviews_per_request) against a baseline run."""
+    failures = []
+    baseline_scenarios = {(s["concurrency"], s["reviews_per_request"]): s for s in baseline["scenarios"]}
+    for scenario in results["scenarios"]:
+        reference = baseline_scenarios.get((scenario["concurrency"], scenario["reviews_per_request"]))
+        if reference is None:
+            continue
+        name = f"concurrency={scenario['concurrency']} reviews={scenario['reviews_per_request']}"
+        if scenario["errors"] > reference["errors"]:
+            failures.append(f"{name}: {scenario['errors']} errors (baseline {reference['errors']})")
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if reference[metric] and scenario[metric] and scenario[metric] > reference[metric] * (1 + max_regression):
+                failures.append(f"{name}: {metric} {scenario[metric]} > baseline {reference[metric]}")
+        if scenario["reviews_per_sec"] < reference["reviews_per_sec"] * (1 - max_regression):
+            failures.append(f"{name}: reviews_per_sec {scenario['reviews_per_sec']} < baseline "
+                            f"{reference['reviews_per_sec']}")
+    peak, reference_peak = results.get("peak_rss_mb"), baseline.get("peak_rss_mb")
+    if peak and reference_peak and peak > reference_peak * (1 + max_regression):
+        failures.append(f"peak_rss_mb {peak:.1f} > baseline {reference_peak:.1f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=None, help="test an already running server instead of starting one")
+    parser.add_argument("--endpoint", default="/analyze")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--reviews-per-request", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--warmup-requests", type=int, default=3)
+    parser.add_argument("--corpus", default=None, help="recorded reviews (.json list or one review per line)")
+    parser.add_argument("--pool-size", type=int, default=5000, help="synthesized reviews to sample payloads from")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gemma-latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for the started server (multiworker.py when > 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="start the server with the aspect and summary caches disabled")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="allowed relative slowdown / throughput loss / RSS growth vs the baseline")
+    args = parser.parse_args()
+
+    pool = load_corpus(args.corpus) if args.corpus else synthesize_reviews(args.pool_size, seed=args.seed)
+    server_process = None
+    url = args.url
+    if url is None:
+        extra_env = {"ASPECT_CACHE_MAX_ENTRIES": "0", "SUMMARY_CACHE_MAX_ENTRIES": "0"} if args.no_cache else {}
+        server_process, url = start_server(free_port(), args.gemma_latency, extra_env, args.startup_timeout,
+                                           args.workers)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "endpoint": args.endpoint,
+        "corpus": args.corpus or f"synthesized:{args.pool_size}",
+        "gemma_latency_seconds": args.gemma_latency,
+        "caches_disabled": args.no_cache,
+        "workers": args.workers if args.url is None else None,
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "scenarios": [],
+        "peak_rss_mb": None,
+        "processes": [],
+    }
+    try:
+        run_scenario(url, args.endpoint, build_payloads(pool, args.warmup_requests, 5, args.seed), 1)
+        print(f"{'concurrency':>11} {'reviews':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} "
+              f"{'reviews/s':>10} {'errors':>7}")
+        for reviews_per_request in args.reviews_per_request:
+            for concurrency in args.concurrency:
+                payloads = build_payloads(pool, args.requests, reviews_per_request,
+                                          args.seed + concurrency * 1000 + reviews_per_request)
+                scenario = {"concurrency": concurrency, "reviews_per_request": reviews_per_request,
+                            **run_scenario(url, args.endpoint, payloads, concurrency)}
+                results["scenarios"].append(scenario)
+                print(f"{concurrency:>11} {reviews_per_request:>8} {scenario['p50_ms'] or 0:>9.1f} "
+                      f"{scenario['p95_ms'] or 0:>9.1f} {scenario['p99_ms'] or 0:>9.1f} "
+                      f"{scenario['reviews_per_sec']:>10.1f} {scenario['errors']:>7}")
+        if server_process is not None:
+            # With several workers the supervisor holds the shared model and the workers serve requests.
+            pids = [server_process.pid] + child_pids(server_process.pid)
+            results["processes"] = [read_process_memory(pid) for pid in pids]
+            peaks = [process["peak_rss_mb"] for process in results["processes"] if process["peak_rss_mb"]]
+            results["peak_rss_mb"] = max(peaks) if peaks else None
+            for process in results["processes"]:
+                print(f"pid {process['pid']}: peak RSS {process['peak_rss_mb'] or 0:.1f} MiB, "
+                      f"PSS {process['pss_mb'] or 0:.1f} MiB")
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait(timeout=30)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = check_regressions(results, json.load(f), args.max_regression)
+        if failures:
+            print(f"FAILED: regressions beyond {args.max_regression:.0%} vs {args.baseline}")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"OK: no regression beyond {args.max_regression:.0%} vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
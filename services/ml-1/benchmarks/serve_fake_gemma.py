@@ -0,0 +1,45 @@
+"""
+Runs the ABSA service (main:app) under uvicorn with Gemma replaced by FakeGenerativeModel,
+so load tests measure BERT, caching and serialization without an API key or network.
+All other settings come from the environment as usual (INFERENCE_BACKEND, BERT_BATCH_SIZE, ...).
+
+Usage (from services/ml-1):
+    python benchmarks/serve_fake_gemma.py --port 7860 --gemma-latency 0.5 [--workers 4]
+"""
+import argparse
+import os
+
+import uvicorn
+
+from bench_utils import SERVICE_DIR, add_service_to_path
+from fake_gemma import FakeGenerativeModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--gemma-latency", type=float, default=0.5, help="seconds per fake Gemma call")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="serve with multiworker.py (pre-forked workers sharing the model) when > 1")
+    args = parser.parse_args()
+
+    # A placeholder key makes startup configure Gemma (and the summary cache); the model itself is replaced below.
+    os.environ.setdefault("GEMMA_API_KEY", "fake-key-for-benchmarks")
+    os.chdir(SERVICE_DIR)  # relative paths such as ONNX_MODEL_DIR resolve as when running `python main.py`
+    add_service_to_path()
+    import main as service
+
+    @service.app.on_event("startup")
+    async def use_fake_gemma():
+        service.gemma_llm = FakeGenerativeModel(latency_seconds=args.gemma_latency)
+
+    if args.workers > 1:
+        import multiworker
+        multiworker.serve(args.host, args.port, args.workers)
+    else:
+        uvicorn.run(service.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,9 +20,18 @@ LABEL_LIST = ["O"] + \
 # --- Data Paths ---
 DEFAULT_KAGGLE_INPUT_PATH = "/kaggle/input/sem-eval-absa"
 DEFAULT_LOCAL_DATA_PATH = "./data"
+# Tokenized splits cached by a fingerprint of the data, config, tokenizer and code (see preprocessing_cache.py)
+PREPROCESSED_CACHE_DIR = "./cache/preprocessed"
 
 LAPTOP_TRAIN_FILE = "Laptop_Train_v2.csv"
 RESTO_TRAIN_FILE = "Restaurants_Train_v2.csv"
+# Optional JSON manifest in the data directory listing any number of CSV/JSONL/Parquet sources with a
+# domain tag each; when present, training streams them in chunks of STREAMING_CHUNK_ROWS rows (data_loader.py).
+DATA_MANIFEST_FILE = "manifest.json"
+# Typed columnar copies of the raw data written by `python -m src.convert_to_columnar`; the first one
+# present in the data directory is read instead of the CSVs.
+COLUMNAR_DATA_FILES = ["reviews.arrow", "reviews.parquet"]
+STREAMING_CHUNK_ROWS = 50_000
 
 # --- Training Hyperparameters ---
 TRAIN_BATCH_SIZE = 16
@@ -34,6 +43,14 @@ SAVE_STEPS_FACTOR = 1
 LOGGING_STEPS = 100
 MAX_SEQ_LENGTH = 512
 
+# --- Knowledge Distillation (python -m src.train --distill) ---
+STUDENT_MODEL_NAME = "distilbert-base-uncased"  # must share the teacher's vocabulary
+DISTILLED_RUN_SUFFIX = "-absa-distilled"
+DISTILLATION_TEMPERATURE = 2.0
+DISTILLATION_ALPHA = 0.5  # weight of the soft-target KL loss; 1 - alpha weights the hard-label cross-entropy
+STUDENT_LEARNING_RATE = 5e-5
+LATENCY_SENTENCES = 200  # test sentences timed one at a time on CPU for the distillation report
+
 # --- Tokenization Strategy ---
 LABEL_ALL_TOKENS = False
 
@@ -0,0 +1,115 @@
+"""
+Converts the raw review data (the data manifest's sources, or the two SemEval CSVs) into one typed
+columnar file: int64 id, string sentence/aspect_term, int32 from/to offsets and dictionary-encoded
+(category) polarity and domain, see data_loader.REVIEW_SCHEMA. The sources are converted chunk by
+chunk, so the corpus does not have to fit in memory.
+
+Parquet (compressed) is the compact format to store and share, e.g. with the ml-2 notebooks;
+an uncompressed Arrow IPC file can be memory-mapped and read without any copy or decoding.
+data_loader reads data/reviews.arrow or data/reviews.parquet instead of the CSVs when present.
+
+Usage (from services/ml-1):
+    python -m src.convert_to_columnar                          # data/reviews.parquet
+    python -m src.convert_to_columnar --format arrow           # data/reviews.arrow
+    python -m src.convert_to_columnar --cleaned --output data/reviews_cleaned.parquet
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import config
+from .data_loader import POLARITY_CATEGORIES, REVIEW_SCHEMA, iter_source_chunks, load_manifest
+from .data_preprocessor import standardize_chunk
+
+
+def _dictionary_array(values: pd.Series, categories: list[str]) -> pa.DictionaryArray:
+    # A fixed dictionary for every batch: Arrow IPC files cannot change dictionaries between batches.
+    codes = pd.Categorical(values, categories=categories).codes
+    return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0, type=pa.int8()),
+                                          pa.array(categories, type=pa.string()))
+
+
+def to_review_record_batch(df: pd.DataFrame, domains: list[str]) -> pa.RecordBatch:
+    """
+    Converts a chunk with snake_case columns to REVIEW_SCHEMA. Offsets and ids that are not
+    integers, and polarities outside POLARITY_CATEGORIES, become nulls.
+    """
+    return pa.RecordBatch.from_arrays([
+        pa.array(pd.to_numeric(df['id'], errors='coerce').astype('Int64'), type=pa.int64(), from_pandas=True),
+        pa.array(df['sentence'].astype('string'), type=pa.string(), from_pandas=True),
+        pa.array(df['aspect_term'].astype('string'), type=pa.string(), from_pandas=True),
+        _dictionary_array(df['polarity'], POLARITY_CATEGORIES),
+        pa.array(pd.to_numeric(df['from'], errors='coerce').astype('Int32'), type=pa.int32(), from_pandas=True),
+        pa.array(pd.to_numeric(df['to'], errors='coerce').astype('Int32'), type=pa.int32(), from_pandas=True),
+        _dictionary_array(df['domain'], domains),
+    ], schema=REVIEW_SCHEMA)
+
+
+def convert_to_columnar(data_path_base: str, output_path: str, cleaned: bool = False,
+                        chunk_rows: int = config.STREAMING_CHUNK_ROWS) -> int:
+    """
+    Writes the sources of the data manifest (or the SemEval CSVs) to `output_path`, as Parquet
+    or, for a .arrow path, as an uncompressed Arrow IPC file.
+
+    Args:
+        data_path_base (str): Data directory with the manifest or the CSVs.
+        output_path (str): Target file (.parquet or .arrow).
+        cleaned (bool): Apply the cleaning rules of data_preprocessor (conflict -> neutral,
+            rows with missing or unexpected values dropped) before writing.
+        chunk_rows (int): Rows converted at a time.
+
+    Returns:
+        int: Number of rows written.
+    """
+    sources = load_manifest(data_path_base)
+    domains = sorted({source["domain"] for source in sources if source["domain"] is not None})
+    if any(source["domain"] is None for source in sources):
+        raise ValueError("Every source needs a \"domain\" in the manifest to be converted.")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    # Written to a temporary file that replaces output_path only once complete, so a failed
+    # conversion never leaves a truncated file behind.
+    tmp_path = f"{output_path}.tmp-{os.getpid()}"
+    rows_written = 0
+    try:
+        if output_path.endswith(".arrow"):
+            writer = pa.ipc.new_file(tmp_path, REVIEW_SCHEMA)
+        else:
+            writer = pq.ParquetWriter(tmp_path, REVIEW_SCHEMA, compression="zstd")
+        with writer:
+            for source in sources:
+                print(f"Converting {source['path']} (domain={source['domain']})")
+                for chunk in iter_source_chunks(source, chunk_rows):
+                    chunk.columns = chunk.columns.str.lower().str.replace(' ', '_', regex=False)
+                    if cleaned:
+                        chunk = standardize_chunk(chunk)
+                    writer.write_batch(to_review_record_batch(chunk, domains))
+                    rows_written += len(chunk)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the raw review data to a typed Parquet or Arrow file.")
+    parser.add_argument("--data-path", default=config.DEFAULT_LOCAL_DATA_PATH)
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--output", default=None, help="output file (default: <data-path>/reviews.<format>)")
+    parser.add_argument("--cleaned", action="store_true", help="write cleaned rows instead of the raw ones")
+    parser.add_argument("--chunk-rows", type=int, default=config.STREAMING_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    output_path = args.output or os.path.join(args.data_path, f"reviews.{args.format}")
+    start = time.perf_counter()
+    rows = convert_to_columnar(args.data_path, output_path, args.cleaned, args.chunk_rows)
+    print(f"Wrote {rows} rows to {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
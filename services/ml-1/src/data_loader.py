@@ -1,14 +1,205 @@
 """
 Handles loading and combining of the raw SemEval ABSA datasets.
+Larger corpora can be listed in a manifest and streamed in chunks (load_streaming_dataset).
+The typed columnar copies written by convert_to_columnar.py (Parquet or Arrow IPC) are read
+with column projection and memory mapping (read_review_table).
 """
+import glob
+import json
+from collections.abc import Iterator
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+from datasets import Dataset, Features, Value
 from . import config
+from .data_preprocessor import iter_sentence_records
+
+SUPPORTED_FORMATS = ("csv", "jsonl", "parquet", "arrow")
+POLARITY_CATEGORIES = ["positive", "negative", "neutral", "conflict"]
+# Typed schema of the columnar review files: int offsets, dictionary-encoded (category) polarity and domain
+REVIEW_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("sentence", pa.string()),
+    ("aspect_term", pa.string()),
+    ("polarity", pa.dictionary(pa.int8(), pa.string())),
+    ("from", pa.int32()),
+    ("to", pa.int32()),
+    ("domain", pa.dictionary(pa.int8(), pa.string())),
+])
+# Columns the training pipeline reads; anything else in a columnar file is skipped
+PIPELINE_COLUMNS = ["id", "sentence", "aspect_term", "polarity", "from", "to", "domain"]
+AGGREGATED_FEATURES = Features({
+    'unique_id': Value('string'),
+    'sentence': Value('string'),
+    'aspects': [{'term': Value('string'), 'polarity': Value('string'), 'from': Value('int64'), 'to': Value('int64')}],
+    'domain': Value('string'),
+})
+
+def manifest_path_for(data_path_base: str) -> str:
+    return os.path.join(data_path_base, config.DATA_MANIFEST_FILE)
+
+def load_manifest(data_path_base: str, manifest_path: str | None = None) -> list[dict]:
+    """
+    Reads the data sources from a JSON manifest such as
+    {"sources": [{"path": "Laptop_Train_v2.csv", "domain": "laptop"},
+                 {"path": "scraped/phones-*.jsonl", "domain": "phone", "encoding": "utf-8"}]}.
+    Paths are relative to the manifest and may be glob patterns; "format" (csv, jsonl, parquet, arrow)
+    defaults to the file extension and "encoding" to ISO-8859-1 for CSV and utf-8 otherwise.
+    "domain" may be left out for files with a domain column, such as the converted columnar files.
+    Without a manifest file the two SemEval training CSVs from config are used.
+
+    Returns:
+        list[dict]: One {'path', 'domain', 'format', 'encoding'} entry per file, in manifest order.
+    """
+    manifest_path = manifest_path or manifest_path_for(data_path_base)
+    if not os.path.exists(manifest_path):
+        entries = [{"path": config.LAPTOP_TRAIN_FILE, "domain": "laptop"},
+                   {"path": config.RESTO_TRAIN_FILE, "domain": "restaurant"}]
+        base_dir = data_path_base
+    else:
+        with open(manifest_path, encoding="utf-8") as f:
+            entries = json.load(f)["sources"]
+        base_dir = os.path.dirname(manifest_path)
+
+    sources = []
+    for entry in entries:
+        pattern = os.path.join(base_dir, entry["path"])
+        paths = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not paths:
+            raise FileNotFoundError(f"No files match manifest entry {entry['path']!r}")
+        for path in paths:
+            file_format = entry.get("format") or os.path.splitext(path)[1].lstrip(".").lower()
+            file_format = {"json": "jsonl", "pq": "parquet"}.get(file_format, file_format)
+            if file_format not in SUPPORTED_FORMATS:
+                raise ValueError(f"Unsupported format {file_format!r} for {path}; expected one of {SUPPORTED_FORMATS}")
+            sources.append({"path": path, "domain": entry.get("domain"), "format": file_format,
+                            "encoding": entry.get("encoding", "ISO-8859-1" if file_format == "csv" else "utf-8")})
+    return sources
+
+def columnar_data_file(data_path_base: str) -> str | None:
+    """The first of config.COLUMNAR_DATA_FILES present in the data directory, if any."""
+    for file_name in config.COLUMNAR_DATA_FILES:
+        path = os.path.join(data_path_base, file_name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def raw_data_files(data_path_base: str) -> list[str]:
+    """Paths of the raw data files read for training (plus the manifest, if there is one)."""
+    manifest_path = manifest_path_for(data_path_base)
+    if os.path.exists(manifest_path):
+        return [manifest_path] + [source["path"] for source in load_manifest(data_path_base, manifest_path)]
+    columnar_path = columnar_data_file(data_path_base)
+    if columnar_path:
+        return [columnar_path]
+    return [os.path.join(data_path_base, config.LAPTOP_TRAIN_FILE),
+            os.path.join(data_path_base, config.RESTO_TRAIN_FILE)]
+
+def _project(column_names: list[str], columns: list[str] | None) -> list[str] | None:
+    """The file's columns whose snake_case names are in `columns` (all columns if None)."""
+    if columns is None:
+        return None
+    return [name for name in column_names if name.lower().replace(' ', '_') in columns]
+
+def read_review_table(path: str, columns: list[str] | None = None) -> pa.Table:
+    """
+    Reads a columnar review file, only the given columns. Arrow IPC files (.arrow) are memory-mapped
+    and read without copying; Parquet files are decoded from a memory-mapped file.
+    """
+    if path.endswith(".arrow"):
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        projected = _project(table.column_names, columns)
+        return table if projected is None else table.select(projected)
+    return pq.read_table(path, columns=_project(pq.read_schema(path).names, columns), memory_map=True)
+
+def review_table_to_pandas(table: pa.Table | pa.RecordBatch) -> pd.DataFrame:
+    """Strings stay Arrow-backed (no Python object per value), dictionary columns become categories."""
+    return table.to_pandas(types_mapper=lambda arrow_type: pd.StringDtype("pyarrow")
+                           if arrow_type == pa.string() else None)
+
+def iter_source_chunks(source: dict, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Reads one manifest source in DataFrames of at most `chunk_rows` rows, tagged with its domain."""
+    if source["format"] == "csv":
+        chunks = pd.read_csv(source["path"], encoding=source["encoding"], on_bad_lines='skip', chunksize=chunk_rows)
+    elif source["format"] == "jsonl":
+        chunks = pd.read_json(source["path"], lines=True, encoding=source["encoding"], chunksize=chunk_rows)
+    elif source["format"] == "parquet":
+        parquet_file = pq.ParquetFile(source["path"], memory_map=True)
+        chunks = (review_table_to_pandas(batch) for batch in parquet_file.iter_batches(
+            batch_size=chunk_rows, columns=_project(parquet_file.schema_arrow.names, PIPELINE_COLUMNS)))
+    else:
+        table = read_review_table(source["path"], PIPELINE_COLUMNS)
+        chunks = (review_table_to_pandas(batch) for batch in table.to_batches(max_chunksize=chunk_rows))
+    for chunk in chunks:
+        if source["domain"] is not None:
+            chunk['domain'] = source["domain"]
+        elif 'domain' not in chunk.columns:
+            raise ValueError(f"{source['path']} has no domain column; set its \"domain\" in the manifest")
+        yield chunk
+
+def _generate_sentence_records(sources: list[dict], chunk_rows: int, file_signatures: list) -> Iterator[dict]:
+    # file_signatures is unused here; it is part of gen_kwargs so that the datasets cache of
+    # Dataset.from_generator is invalidated when a source file changes.
+    def chunks():
+        for source in sources:
+            yield from iter_source_chunks(source, chunk_rows)
+    yield from iter_sentence_records(chunks())
+
+def load_streaming_dataset(data_path_base: str, manifest_path: str | None = None,
+                           chunk_rows: int = config.STREAMING_CHUNK_ROWS) -> Dataset | None:
+    """
+    Streams the manifest's sources chunk by chunk through cleaning and per-sentence aggregation
+    into an Arrow-backed Dataset (written to the datasets cache by Dataset.from_generator), so the
+    corpus never has to fit in memory as a DataFrame. Same schema as aggregate_data_for_hf, with
+    sentences in file order.
+
+    Args:
+        data_path_base (str): Directory of the data files (and of the default manifest).
+        manifest_path (str | None): Manifest to read instead of <data_path_base>/manifest.json.
+        chunk_rows (int): Raw rows read and cleaned at a time.
+
+    Returns:
+        Dataset | None: The aggregated dataset, or None if loading fails.
+    """
+    print("--- Steps 1-3: Streaming, cleaning and aggregating data in chunks ---")
+    try:
+        sources = load_manifest(data_path_base, manifest_path)
+        for source in sources:
+            print(f"Source: {source['path']} (domain={source['domain']}, format={source['format']})")
+        file_signatures = [(source["path"], os.path.getsize(source["path"]), os.path.getmtime(source["path"]))
+                           for source in sources]
+        hf_dataset = Dataset.from_generator(
+            _generate_sentence_records, features=AGGREGATED_FEATURES,
+            gen_kwargs={"sources": sources, "chunk_rows": chunk_rows, "file_signatures": file_signatures},
+        )
+    except Exception as e:
+        print(f"Error while streaming the data sources: {e}")
+        return None
+    print(f"Streamed {hf_dataset.num_rows} sentences:", hf_dataset)
+    return hf_dataset
+
+def load_columnar_dataset(columnar_path: str) -> pd.DataFrame | None:
+    """Loads the pipeline's columns from a typed columnar file written by convert_to_columnar."""
+    print(f"--- Step 1: Loading Data from {columnar_path} (columns: {PIPELINE_COLUMNS}) ---")
+    try:
+        df_combined_train = review_table_to_pandas(read_review_table(columnar_path, PIPELINE_COLUMNS))
+    except Exception as e:
+        print(f"An error occurred loading {columnar_path}: {e}")
+        return None
+    print(f"Loaded {len(df_combined_train)} records:")
+    print(df_combined_train['domain'].value_counts())
+    df_combined_train.info()
+    print("\n--- Dataset Loading Complete ---")
+    return df_combined_train
 
 def load_and_combine_datasets(data_path_base: str) -> pd.DataFrame | None:
     """
     Loads laptop and restaurant training CSVs, adds a domain column,
-    and concatenates them.
+    and concatenates them. If the data directory holds a typed columnar copy
+    (config.COLUMNAR_DATA_FILES), that is read instead.
 
     Args:
         data_path_base (str): The base directory containing the dataset CSV files.
@@ -17,6 +208,10 @@ def load_and_combine_datasets(data_path_base: str) -> pd.DataFrame | None:
         pd.DataFrame | None: A combined pandas DataFrame with all training instances,
                              or None if loading fails.
     """
+    columnar_path = columnar_data_file(data_path_base)
+    if columnar_path:
+        return load_columnar_dataset(columnar_path)
+
     laptop_train_path = os.path.join(data_path_base, config.LAPTOP_TRAIN_FILE)
     resto_train_path = os.path.join(data_path_base, config.RESTO_TRAIN_FILE)
 
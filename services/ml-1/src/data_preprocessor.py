@@ -1,9 +1,20 @@
 """
 Handles cleaning, standardization, and aggregation of the dataset.
 """
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from collections.abc import Iterable, Iterator
 from datasets import Dataset
 
+def _map_conflict_to_neutral(polarity: pd.Series) -> pd.Series:
+    """Maps 'conflict' to 'neutral', keeping a category dtype (as read from the columnar files) intact."""
+    if isinstance(polarity.dtype, pd.CategoricalDtype):
+        if 'neutral' not in polarity.cat.categories:
+            polarity = polarity.cat.add_categories(['neutral'])
+        return polarity.mask(polarity == 'conflict', 'neutral').cat.remove_unused_categories()
+    return polarity.replace('conflict', 'neutral')
+
 def clean_and_standardize_data(df_input: pd.DataFrame) -> pd.DataFrame | None:
     """
     Cleans the combined DataFrame: standardizes column names, handles NaNs,
@@ -65,7 +76,7 @@ def clean_and_standardize_data(df_input: pd.DataFrame) -> pd.DataFrame | None:
         print(df_cleaned['polarity'].unique())
 
         # Map 'conflict' to 'neutral'
-        df_cleaned['polarity'] = df_cleaned['polarity'].replace('conflict', 'neutral')
+        df_cleaned['polarity'] = _map_conflict_to_neutral(df_cleaned['polarity'])
         print("\nUnique polarity values after mapping 'conflict' to 'neutral':")
         print(df_cleaned['polarity'].unique())
 
@@ -86,32 +97,92 @@ def clean_and_standardize_data(df_input: pd.DataFrame) -> pd.DataFrame | None:
     print("\n--- Initial Cleaning, Standardization, and Type Conversion Complete ---")
     return df_cleaned
 
-def _aggregate_aspects_per_sentence_helper(group: pd.DataFrame) -> pd.Series | None:
-    """Helper function to aggregate aspects for a single sentence group."""
-    # No changes needed here, it already carries 'polarity'
-    required_cols = ['sentence', 'aspect_term', 'polarity', 'from', 'to', 'domain', 'id']
-    if not all(col in group.columns for col in required_cols):
-         print(f"Warning: Skipping group due to missing columns. Group keys: {group.name}")
-         return None
-
-    aspect_list = []
-    for _, row in group.iterrows():
-        aspect_list.append({
-            'term': row['aspect_term'],
-            'polarity': row['polarity'],
-            'from': row['from'],
-            'to': row['to']
-        })
-    return pd.Series({
-        'original_id': group['id'].iloc[0],
-        'sentence': group['sentence'].iloc[0],
-        'aspects': aspect_list,
-        'domain': group['domain'].iloc[0]
+def _group_rows_by_key(keys: pd.Series) -> tuple[pd.Index, np.ndarray, np.ndarray]:
+    """
+    Sorts rows by key the way groupby(key) does (sorted keys, rows in original order within a key).
+
+    Returns:
+        tuple: (sorted unique keys, row order, list offsets into the row order with one entry per key plus one)
+    """
+    codes, unique_keys = pd.factorize(keys, sort=True)
+    row_order = np.argsort(codes, kind='stable')
+    offsets = np.zeros(len(unique_keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=len(unique_keys)), out=offsets[1:])
+    return unique_keys, row_order, offsets
+
+def _group_contiguous_rows(keys: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Like _group_rows_by_key for rows whose keys are already contiguous: one group per run, in file order."""
+    values = keys.to_numpy(dtype=object)
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    return values[starts], np.arange(len(values)), np.r_[starts, len(values)].astype(np.int64)
+
+def _build_aggregated_table(df: pd.DataFrame, unique_ids, row_order: np.ndarray, offsets: np.ndarray) -> pa.Table:
+    """Builds the (unique_id, sentence, aspects, domain) table, one row per group of `row_order[offsets[i]:offsets[i+1]]`."""
+    first_rows = row_order[offsets[:-1]]
+    aspects = pa.ListArray.from_arrays(
+        pa.array(offsets, type=pa.int32()),
+        pa.StructArray.from_arrays(
+            [pa.array(df['aspect_term'].to_numpy(dtype=object)[row_order], type=pa.string()),
+             pa.array(df['polarity'].to_numpy(dtype=object)[row_order], type=pa.string()),
+             pa.array(df['from'].to_numpy(dtype=np.int64)[row_order]),
+             pa.array(df['to'].to_numpy(dtype=np.int64)[row_order])],
+            names=['term', 'polarity', 'from', 'to'],
+        ),
+    )
+    return pa.table({
+        'unique_id': pa.array(np.asarray(unique_ids, dtype=object), type=pa.string()),
+        'sentence': pa.array(df['sentence'].to_numpy(dtype=object)[first_rows], type=pa.string()),
+        'aspects': aspects,
+        'domain': pa.array(df['domain'].to_numpy(dtype=object)[first_rows], type=pa.string()),
     })
 
+def standardize_chunk(df_chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    The cleaning rules of clean_and_standardize_data, without its reporting, for streamed chunks:
+    snake_case column names, rows missing essential values dropped, int offsets, stripped text,
+    'conflict' mapped to 'neutral' and other polarities dropped.
+    """
+    df = df_chunk.copy()
+    df.columns = df.columns.str.lower().str.replace(' ', '_', regex=False)
+    df = df.dropna(subset=['aspect_term', 'polarity', 'from', 'to', 'sentence'])
+    df['from'] = pd.to_numeric(df['from'], errors='coerce').fillna(-1).astype(int)
+    df['to'] = pd.to_numeric(df['to'], errors='coerce').fillna(-1).astype(int)
+    df['sentence'] = df['sentence'].astype(str).str.strip()
+    df['aspect_term'] = df['aspect_term'].astype(str).str.strip()
+    df['polarity'] = _map_conflict_to_neutral(df['polarity'])
+    return df[df['polarity'].isin(['positive', 'negative', 'neutral'])]
+
+def iter_sentence_records(chunks: Iterable[pd.DataFrame]) -> Iterator[dict]:
+    """
+    Cleans raw row chunks (with a 'domain' column) and yields one aggregated record per sentence:
+    {'unique_id', 'sentence', 'aspects': [{'term', 'polarity', 'from', 'to'}], 'domain'}.
+    The rows of one sentence must be adjacent in their file, as in the SemEval CSVs; a sentence
+    that straddles a chunk boundary is held back and completed with the next chunk.
+    """
+    pending = None
+    for chunk in chunks:
+        df = standardize_chunk(chunk)
+        if pending is not None:
+            df = pd.concat([pending, df], ignore_index=True)
+        if df.empty:
+            pending = None
+            continue
+        df['unique_id'] = df['domain'].astype(str) + '_' + df['id'].astype(str)
+        unique_ids, row_order, offsets = _group_contiguous_rows(df['unique_id'])
+        # The last sentence may continue in the next chunk
+        pending = df.iloc[offsets[-2]:]
+        if len(unique_ids) > 1:
+            complete_rows = offsets[-2]
+            yield from _build_aggregated_table(df.iloc[:complete_rows], unique_ids[:-1], row_order[:complete_rows],
+                                               offsets[:-1]).to_pylist()
+    if pending is not None:
+        yield from _build_aggregated_table(pending, *_group_contiguous_rows(pending['unique_id'])).to_pylist()
+
 def aggregate_data_for_hf(df_cleaned: pd.DataFrame) -> Dataset | None:
     """
     Aggregates aspect data per unique sentence and converts to Hugging Face Dataset.
+    The per-sentence 'aspects' column is built in one pass as a PyArrow list<struct> array
+    (term, polarity, from, to) over the rows sorted by unique_id, without per-group Python code.
     """
     if df_cleaned is None or df_cleaned.empty:
         print("Error: Input DataFrame for aggregation is None or empty.")
@@ -120,37 +191,31 @@ def aggregate_data_for_hf(df_cleaned: pd.DataFrame) -> Dataset | None:
     print("\n--- Step 3: Aggregate Aspects per Sentence using Unique ID ---")
     if 'id' in df_cleaned.columns and 'domain' in df_cleaned.columns:
         print("\nCreating unique sentence identifier (domain_id)...")
-        df_cleaned['unique_id'] = df_cleaned['domain'] + '_' + df_cleaned['id'].astype(str)
+        df_cleaned['unique_id'] = df_cleaned['domain'].astype(str) + '_' + df_cleaned['id'].astype(str)
         print(f"Unique IDs created: {df_cleaned['unique_id'].nunique()}")
     else:
         print("Error: Cannot create unique_id. 'id' or 'domain' column missing.")
         return None
 
     print("\nGrouping by 'unique_id' and aggregating aspects...")
-    if 'unique_id' in df_cleaned.columns and df_cleaned['unique_id'].notna().all():
-        aggregated_data_series = df_cleaned.groupby('unique_id').apply(
-            lambda g: _aggregate_aspects_per_sentence_helper(g)
-        )
-        aggregated_data_series = aggregated_data_series.dropna()
-        if aggregated_data_series.empty:
-            print("Error: Aggregation resulted in an empty dataset.")
-            return None
-        aggregated_df = aggregated_data_series.reset_index()
-        print(f"Number of unique sentences after aggregation: {len(aggregated_df)}")
-    else:
-        print("Error: 'unique_id' column not found or contains NaNs. Cannot group.")
+    required_cols = ['sentence', 'aspect_term', 'polarity', 'from', 'to', 'domain']
+    missing_cols = [col for col in required_cols if col not in df_cleaned.columns]
+    if missing_cols:
+        print(f"Error: Columns missing for aggregation: {missing_cols}")
         return None
-
-    if aggregated_df.empty:
-        print("Error: Aggregated DataFrame is empty.")
+    if df_cleaned['unique_id'].isna().any():
+        print("Error: 'unique_id' column contains NaNs. Cannot group.")
         return None
 
-    print("\nConverting aggregated DataFrame to Hugging Face Dataset...")
-    columns_to_keep = ['unique_id', 'sentence', 'aspects', 'domain']
-    if not all(col in aggregated_df.columns for col in columns_to_keep):
-        print(f"Error: Not all 'columns_to_keep' are present in aggregated_df. Available: {aggregated_df.columns.tolist()}")
+    aggregated_table = _build_aggregated_table(df_cleaned, *_group_rows_by_key(df_cleaned['unique_id']))
+    print(f"Number of unique sentences after aggregation: {aggregated_table.num_rows}")
+
+    if aggregated_table.num_rows == 0:
+        print("Error: Aggregation resulted in an empty dataset.")
         return None
-    hf_dataset = Dataset.from_pandas(aggregated_df[columns_to_keep])
+
+    print("\nConverting aggregated Arrow table to Hugging Face Dataset...")
+    hf_dataset = Dataset(aggregated_table)
 
     print("\nHugging Face Dataset Info:")
     print(hf_dataset)
@@ -0,0 +1,90 @@
+"""
+Exports the fine-tuned AutoModelForTokenClassification to ONNX with dynamic batch and
+sequence axes, so the API service can serve it with ONNX Runtime on CPU.
+The tokenizer and model config are saved next to `model.onnx`.
+
+Usage (from services/ml-1):
+    python -m src.export_to_onnx [--model <local dir or Hub id>] [--output-dir <dir>]
+"""
+import argparse
+import os
+
+import torch
+from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+from . import config as project_config
+from .push_model_to_hub import HUB_MODEL_ID, LOCAL_MODEL_DIR
+
+ONNX_OUTPUT_DIR = os.path.join(project_config.OUTPUT_DIR_BASE, "onnx")
+ONNX_MODEL_FILE_NAME = "model.onnx"
+ONNX_OPSET_VERSION = 17
+
+
+def export_to_onnx(model_name_or_path: str, output_dir: str) -> str | None:
+    """
+    Exports the token-classification model to `<output_dir>/model.onnx`.
+
+    Args:
+        model_name_or_path (str): Local directory of the fine-tuned model or its Hugging Face Hub id.
+        output_dir (str): Directory for the ONNX graph, tokenizer and config.
+
+    Returns:
+        str | None: Path of the exported ONNX file, or None if the export fails.
+    """
+    print(f"Loading model and tokenizer from: {model_name_or_path}")
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(model_name_or_path)
+        model = AutoModelForTokenClassification.from_pretrained(model_name_or_path)
+        model.eval()
+    except Exception as e:
+        print(f"Error loading model/tokenizer: {e}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    onnx_path = os.path.join(output_dir, ONNX_MODEL_FILE_NAME)
+    dummy = tokenizer(["The battery life is great.", "Screen is dim."], padding=True, return_tensors="pt")
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch", 1: "sequence"},
+    }
+
+    print(f"Exporting to ONNX (opset {ONNX_OPSET_VERSION}) at: {onnx_path}")
+    try:
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                (dummy["input_ids"], dummy["attention_mask"]),
+                onnx_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET_VERSION,
+                do_constant_folding=True,
+                dynamo=False,
+            )
+        tokenizer.save_pretrained(output_dir)
+        model.config.save_pretrained(output_dir)
+    except Exception as e:
+        print(f"Error during ONNX export: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+    print("ONNX model, tokenizer and config saved successfully.")
+    return onnx_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the fine-tuned ABSA model to ONNX.")
+    parser.add_argument("--model", default=None,
+                        help=f"Local model dir or Hub id (default: {LOCAL_MODEL_DIR} if it exists, else {HUB_MODEL_ID})")
+    parser.add_argument("--output-dir", default=ONNX_OUTPUT_DIR)
+    args = parser.parse_args()
+
+    model_name_or_path = args.model or (LOCAL_MODEL_DIR if os.path.exists(LOCAL_MODEL_DIR) else HUB_MODEL_ID)
+    export_to_onnx(model_name_or_path, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
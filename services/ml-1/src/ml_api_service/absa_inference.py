@@ -0,0 +1,415 @@
+"""
+Batched BERT inference for the ABSA service.
+Tokenizes reviews together, groups them into length-bucketed padded batches,
+runs them through an inference backend (see inference_backends.py), and decodes the logits
+of each batch with NumPy into aspects, merging spans the same way the transformers
+token-classification pipeline does with aggregation_strategy="simple".
+Reviews longer than the model's max length are split into overlapping windows.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def encode_reviews(texts: List[str], tokenizer, max_length: int):
+    """
+    Tokenizes all reviews in one call, without padding.
+
+    Args:
+        texts (List[str]): The review texts to encode.
+        tokenizer: A fast Hugging Face tokenizer (offset mappings are required).
+        max_length (int): Sequences longer than this are truncated.
+
+    Returns:
+        BatchEncoding: input_ids, offset_mapping and special_tokens_mask per review.
+    """
+    return tokenizer(
+        texts,
+        truncation=True,
+        max_length=max_length,
+        return_offsets_mapping=True,
+        return_special_tokens_mask=True,
+        return_attention_mask=False,
+    )
+
+
+def collate_input_ids(input_id_lists: List[List[int]], pad_token_id: int):
+    """Pads a list of token id sequences to the longest one and builds the attention mask."""
+    max_len = max(len(ids) for ids in input_id_lists)
+    input_ids = np.full((len(input_id_lists), max_len), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(input_id_lists), max_len), dtype=np.int64)
+    for row, ids in enumerate(input_id_lists):
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+    return input_ids, attention_mask
+
+
+def plan_length_buckets(lengths: List[int], max_batch_size: int,
+                        max_tokens_per_batch: Optional[int] = None,
+                        max_padding_ratio: Optional[float] = None) -> List[List[int]]:
+    """
+    Groups sequences of similar length so that padding each batch to its longest
+    member wastes little compute.
+
+    Sequences are sorted by length and added to the current bucket while it stays
+    within `max_batch_size` sequences, `max_tokens_per_batch` padded tokens
+    (batch size * longest length) and `max_padding_ratio` (padding tokens / padded tokens).
+    A sequence longer than the token budget on its own still gets a bucket of one.
+
+    Args:
+        lengths (List[int]): Token count of each sequence.
+        max_batch_size (int): Maximum number of sequences per bucket.
+        max_tokens_per_batch (Optional[int]): Padded token budget per bucket, or None for no limit.
+        max_padding_ratio (Optional[float]): Largest allowed share of padding in a bucket, or None.
+
+    Returns:
+        List[List[int]]: Buckets of indices into `lengths`, each sorted by ascending length.
+    """
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for idx in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        length = lengths[idx]
+        if current:
+            padded_tokens = (len(current) + 1) * length
+            padding_ratio = 1.0 - (current_tokens + length) / padded_tokens
+            if (len(current) >= max_batch_size
+                    or (max_tokens_per_batch is not None and padded_tokens > max_tokens_per_batch)
+                    or (max_padding_ratio is not None and padding_ratio > max_padding_ratio)):
+                buckets.append(current)
+                current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += length
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def special_token_layout(tokenizer) -> Tuple[List[int], List[int]]:
+    """Returns the special token ids the tokenizer puts before and after a single sequence, e.g. ([CLS], [SEP])."""
+    content = tokenizer("a", add_special_tokens=False)["input_ids"]
+    with_specials = tokenizer("a")["input_ids"]
+    for prefix_length in range(len(with_specials) - len(content) + 1):
+        if with_specials[prefix_length:prefix_length + len(content)] == content:
+            return with_specials[:prefix_length], with_specials[prefix_length + len(content):]
+    raise ValueError("Could not locate the content tokens among the tokenizer's special tokens.")
+
+
+def plan_windows(num_tokens: int, window_tokens: int, stride: int) -> List[Tuple[int, int]]:
+    """
+    Splits a sequence of `num_tokens` content tokens into windows of at most `window_tokens`
+    tokens, where consecutive windows share `stride` tokens. A sequence that fits gets one window.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) token ranges, end exclusive.
+    """
+    if not 0 <= stride < window_tokens:
+        raise ValueError(f"Window stride must be in [0, {window_tokens}), got {stride}.")
+    if num_tokens <= window_tokens:
+        return [(0, num_tokens)]
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window_tokens, num_tokens)
+        windows.append((start, end))
+        if end == num_tokens:
+            return windows
+        start += window_tokens - stride
+
+
+def merge_window_logits(num_tokens: int, windows: List[Tuple[int, int]], window_logits: List[np.ndarray]) -> np.ndarray:
+    """
+    Combines the logits of overlapping windows of one review: every token keeps the logits
+    of the window that predicted it with the highest top softmax probability.
+
+    Args:
+        num_tokens (int): Content tokens in the review.
+        windows (List[Tuple[int, int]]): Token range of each window.
+        window_logits (List[np.ndarray]): [end - start, num_labels] logits of each window's content tokens.
+
+    Returns:
+        np.ndarray: [num_tokens, num_labels] merged logits.
+    """
+    merged = np.zeros((num_tokens, window_logits[0].shape[-1]), dtype=np.float32)
+    best_confidence = np.full(num_tokens, -1.0)
+    for (start, end), logits in zip(windows, window_logits):
+        confidence = 1.0 / np.exp(logits - logits.max(axis=-1, keepdims=True)).sum(axis=-1)
+        better = confidence > best_confidence[start:end]
+        merged[start:end][better] = logits[better]
+        best_confidence[start:end][better] = confidence[better]
+    return merged
+
+
+# Sentiment codes of the "ASP-<code>" tags in config.LABEL_LIST.
+ASPECT_SENTIMENTS = {"POS": "positive", "NEG": "negative", "NEU": "neutral"}
+
+
+def _get_tag(label: str):
+    """Splits a BIO label into (bi, tag); 'O' is treated as an 'I' of tag 'O', as in transformers."""
+    if label.startswith("B-"):
+        return "B", label[2:]
+    if label.startswith("I-"):
+        return "I", label[2:]
+    return "I", label
+
+
+class BioLabelScheme:
+    """
+    Lookup arrays for a BIO label set such as config.LABEL_LIST, so spans can be merged with
+    NumPy operations on label ids instead of parsing label strings per token.
+
+    Attributes:
+        is_begin (np.ndarray): [num_labels] True for "B-" labels.
+        tag_ids (np.ndarray): [num_labels] id of the label's tag ("ASP-POS" for both B-ASP-POS and I-ASP-POS).
+        tag_sentiments (List[Optional[str]]): Sentiment per tag id; None for tags that are not aspects ('O').
+    """
+
+    def __init__(self, id2label: Dict[int, str]):
+        num_labels = len(id2label)
+        self.is_begin = np.zeros(num_labels, dtype=bool)
+        self.tag_ids = np.zeros(num_labels, dtype=np.int64)
+        tags: List[str] = []
+        for label_id in range(num_labels):
+            bi, tag = _get_tag(id2label[label_id])
+            if tag not in tags:
+                tags.append(tag)
+            self.is_begin[label_id] = bi == "B"
+            self.tag_ids[label_id] = tags.index(tag)
+        self.tag_sentiments: List[Optional[str]] = [
+            ASPECT_SENTIMENTS.get(tag.split("-", 1)[1], "unknown") if tag.startswith("ASP-") else None
+            for tag in tags
+        ]
+        self.is_aspect_tag = np.array([sentiment is not None for sentiment in self.tag_sentiments])
+
+
+def decode_aspects_batch(texts: List[str], input_ids: np.ndarray, logits: np.ndarray,
+                         token_mask: np.ndarray, offsets: List, tokenizer,
+                         scheme: BioLabelScheme) -> List[List[Dict]]:
+    """
+    Decodes the logits of one padded batch into aspects with the merging rules of the
+    transformers token-classification pipeline's "simple" aggregation: consecutive tokens with
+    the same tag form one span unless a token is a "B-" label, and the span score is the mean
+    of its tokens' top softmax probabilities.
+
+    Argmax, softmax scores and span boundaries are computed once for the whole batch; only
+    the (few) aspect spans are turned into strings.
+
+    Args:
+        texts (List[str]): Review text of each row.
+        input_ids (np.ndarray): [batch, seq] padded token ids.
+        logits (np.ndarray): [batch, seq, num_labels] model output.
+        token_mask (np.ndarray): [batch, seq] True for the review tokens to decode (not special or padding tokens).
+        offsets (List): Character (start, end) offsets per position of each row.
+        tokenizer: The matching fast tokenizer, used to build the aspect terms.
+        scheme (BioLabelScheme): Label lookup arrays for the model's id2label.
+
+    Returns:
+        List[List[Dict]]: Per row, aspects with 'term', 'sentiment', 'score', 'start' and 'end'.
+    """
+    results: List[List[Dict]] = [[] for _ in texts]
+    rows, cols = np.nonzero(token_mask)
+    if rows.size == 0:
+        return results
+    token_logits = logits[rows, cols]
+    labels = token_logits.argmax(axis=-1)
+    # Top softmax probability without normalizing every label: 1 / sum(exp(logits - max)).
+    token_scores = 1.0 / np.exp(token_logits - token_logits.max(axis=-1, keepdims=True)).sum(axis=-1)
+    tags = scheme.tag_ids[labels]
+
+    starts_span = np.ones(rows.size, dtype=bool)
+    starts_span[1:] = (rows[1:] != rows[:-1]) | (tags[1:] != tags[:-1]) | scheme.is_begin[labels[1:]]
+    span_first = np.flatnonzero(starts_span)
+    span_last = np.append(span_first[1:], rows.size) - 1
+    span_scores = np.add.reduceat(token_scores, span_first) / (span_last - span_first + 1)
+    span_tags = tags[span_first]
+
+    unk_token_id = tokenizer.unk_token_id
+    for span_idx in np.flatnonzero(scheme.is_aspect_tag[span_tags]):
+        first, last = span_first[span_idx], span_last[span_idx]
+        row = int(rows[first])
+        text, row_offsets = texts[row], offsets[row]
+        span_cols = cols[first:last + 1]
+        span_ids = input_ids[row, span_cols].tolist()
+        tokens = tokenizer.convert_ids_to_tokens(span_ids)
+        for i, token_id in enumerate(span_ids):
+            if token_id == unk_token_id:
+                start, end = row_offsets[span_cols[i]]
+                tokens[i] = text[start:end]
+        results[row].append({
+            "term": tokenizer.convert_tokens_to_string(tokens).strip(),
+            "sentiment": scheme.tag_sentiments[span_tags[span_idx]],
+            "score": float(span_scores[span_idx]),
+            "start": int(row_offsets[span_cols[0]][0]),
+            "end": int(row_offsets[span_cols[-1]][1]),
+        })
+    return results
+
+
+def run_batched_inference(texts: List[str], backend, tokenizer, batch_size: int,
+                          max_length: int = 512, max_tokens_per_batch: Optional[int] = None,
+                          max_padding_ratio: Optional[float] = None, window_stride: int = 128,
+                          timings: Optional[Dict[str, float]] = None,
+                          counters: Optional[Dict[str, int]] = None,
+                          batch_shapes: Optional[List[Tuple[int, int]]] = None) -> List[List[Dict]]:
+    """
+    Extracts aspects for many reviews with one forward pass per length bucket.
+
+    Reviews longer than `max_length` tokens are split into overlapping windows (sharing
+    `window_stride` tokens) instead of being truncated. Windows are bucketed together with the
+    other reviews, and the predictions of overlapping tokens are merged by confidence before the
+    spans are decoded, so the cost grows linearly with review length.
+
+    Args:
+        texts (List[str]): Non-empty review texts.
+        backend: An inference backend with `id2label` and `forward_logits(input_ids, attention_mask)`.
+        tokenizer: The matching fast tokenizer.
+        batch_size (int): Maximum number of sequences per forward pass.
+        max_length (int): Window size in tokens, special tokens included.
+        max_tokens_per_batch (Optional[int]): Padded token budget per forward pass.
+        max_padding_ratio (Optional[float]): Largest allowed share of padding tokens per batch.
+        window_stride (int): Tokens shared by consecutive windows of a long review.
+        timings (Optional[Dict[str, float]]): If given, seconds spent in the "tokenize", "forward"
+            and "decode" stages are added to it.
+        counters (Optional[Dict[str, int]]): If given, the number of "windows" run through the model
+            and of "long_reviews" (reviews that needed more than one window) are added to it.
+        batch_shapes (Optional[List[Tuple[int, int]]]): If given, (sequences, padded length) of every
+            forward pass is appended to it.
+
+    Returns:
+        List[List[Dict]]: Aspects ('term', 'sentiment', 'score', 'start', 'end') per review,
+            in the same order as `texts`.
+    """
+    if not texts:
+        return []
+    stage_seconds = {"tokenize": 0.0, "forward": 0.0, "decode": 0.0}
+    stage_start = time.perf_counter()
+    encodings = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True,
+                          return_attention_mask=False, verbose=False)
+    content_ids = encodings["input_ids"]
+    offsets = encodings["offset_mapping"]
+    prefix_ids, suffix_ids = special_token_layout(tokenizer)
+    prefix_length = len(prefix_ids)
+    window_tokens = max_length - prefix_length - len(suffix_ids)
+
+    windows: List[Tuple[int, int, int]] = []  # (review index, start token, end token)
+    review_windows: List[List[Tuple[int, int]]] = []
+    for review_idx, ids in enumerate(content_ids):
+        spans = plan_windows(len(ids), window_tokens, window_stride)
+        review_windows.append(spans)
+        windows.extend((review_idx, start, end) for start, end in spans)
+    window_input_ids = [prefix_ids + content_ids[review_idx][start:end] + suffix_ids
+                        for review_idx, start, end in windows]
+    scheme = BioLabelScheme(backend.id2label)
+    results: List[Optional[List[Dict]]] = [None] * len(texts)
+    long_review_logits: Dict[int, List[Tuple[int, np.ndarray]]] = {}
+    buckets = plan_length_buckets([len(ids) for ids in window_input_ids], batch_size,
+                                  max_tokens_per_batch, max_padding_ratio)
+    stage_seconds["tokenize"] += time.perf_counter() - stage_start
+    for bucket in buckets:
+        stage_start = time.perf_counter()
+        input_ids, attention_mask = collate_input_ids([window_input_ids[i] for i in bucket], tokenizer.pad_token_id)
+        logits = backend.forward_logits(input_ids, attention_mask)
+        forward_end = time.perf_counter()
+        stage_seconds["forward"] += forward_end - stage_start
+        if batch_shapes is not None:
+            batch_shapes.append(input_ids.shape)
+
+        content_lengths = np.array([windows[i][2] - windows[i][1] for i in bucket])
+        content_logits = logits[:, prefix_length:]
+        single_rows = []
+        for row, window_idx in enumerate(bucket):
+            review_idx = windows[window_idx][0]
+            if len(review_windows[review_idx]) == 1:
+                single_rows.append(row)
+            else:
+                long_review_logits.setdefault(review_idx, []).append(
+                    (window_idx, content_logits[row, :content_lengths[row]]))
+        if single_rows:
+            single_reviews = [windows[bucket[row]][0] for row in single_rows]
+            token_mask = np.arange(content_logits.shape[1]) < content_lengths[single_rows, None]
+            bucket_aspects = decode_aspects_batch(
+                [texts[review_idx] for review_idx in single_reviews],
+                input_ids[single_rows, prefix_length:],
+                content_logits[single_rows],
+                token_mask,
+                [offsets[review_idx] for review_idx in single_reviews],
+                tokenizer,
+                scheme,
+            )
+            for review_idx, aspects in zip(single_reviews, bucket_aspects):
+                results[review_idx] = aspects
+        stage_seconds["decode"] += time.perf_counter() - forward_end
+
+    if long_review_logits:
+        decode_start = time.perf_counter()
+        long_reviews = sorted(long_review_logits)
+        max_tokens = max(len(content_ids[review_idx]) for review_idx in long_reviews)
+        merged_ids = np.full((len(long_reviews), max_tokens), tokenizer.pad_token_id, dtype=np.int64)
+        merged_logits = np.zeros((len(long_reviews), max_tokens, len(backend.id2label)), dtype=np.float32)
+        token_mask = np.zeros((len(long_reviews), max_tokens), dtype=bool)
+        for row, review_idx in enumerate(long_reviews):
+            num_tokens = len(content_ids[review_idx])
+            window_logits = [logits for _, logits in sorted(long_review_logits[review_idx], key=lambda item: item[0])]
+            merged_ids[row, :num_tokens] = content_ids[review_idx]
+            merged_logits[row, :num_tokens] = merge_window_logits(num_tokens, review_windows[review_idx], window_logits)
+            token_mask[row, :num_tokens] = True
+        long_aspects = decode_aspects_batch(
+            [texts[review_idx] for review_idx in long_reviews], merged_ids, merged_logits, token_mask,
+            [offsets[review_idx] for review_idx in long_reviews], tokenizer, scheme,
+        )
+        for review_idx, aspects in zip(long_reviews, long_aspects):
+            results[review_idx] = aspects
+        stage_seconds["decode"] += time.perf_counter() - decode_start
+
+    if timings is not None:
+        for stage, seconds in stage_seconds.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    if counters is not None:
+        counters["windows"] = counters.get("windows", 0) + len(windows)
+        counters["long_reviews"] = counters.get("long_reviews", 0) + len(long_review_logits)
+    return results
+
+
+WARMUP_TEXT = "The battery life is great but the screen is too dim. "
+
+
+def warmup_inference(backend, tokenizer, seq_lengths: List[int], batch_size: int, max_length: int = 512,
+                     max_tokens_per_batch: Optional[int] = None, window_stride: int = 128) -> Dict[int, float]:
+    """
+    Runs dummy batches through tokenization, the backend and decoding once per sequence length,
+    so lazy initialization (allocator growth, kernel selection, ONNX Runtime graph optimizations)
+    happens before the first real request instead of during it.
+
+    Args:
+        backend: The inference backend to warm up.
+        tokenizer: The matching fast tokenizer.
+        seq_lengths (List[int]): Sequence lengths (tokens, special tokens included) to warm up;
+            lengths above `max_length` are skipped.
+        batch_size (int): Maximum number of sequences per forward pass.
+        max_length (int): Window size in tokens.
+        max_tokens_per_batch (Optional[int]): Padded token budget; each warmup batch fills it.
+        window_stride (int): Tokens shared by consecutive windows, as served.
+
+    Returns:
+        Dict[int, float]: Seconds spent per warmed-up sequence length.
+    """
+    prefix_ids, suffix_ids = special_token_layout(tokenizer)
+    text_tokens = len(tokenizer(WARMUP_TEXT, add_special_tokens=False)["input_ids"])
+    seconds_per_length = {}
+    for seq_length in sorted(set(seq_lengths)):
+        if seq_length > max_length:
+            continue
+        content_tokens = max(1, seq_length - len(prefix_ids) - len(suffix_ids))
+        text = (WARMUP_TEXT * (content_tokens // text_tokens + 1)).strip()
+        text_ids = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        # Cut the text at the character where the token budget runs out so the window is exactly seq_length long.
+        text = text[:text_ids["offset_mapping"][content_tokens - 1][1]]
+        num_sequences = batch_size
+        if max_tokens_per_batch is not None:
+            num_sequences = max(1, min(batch_size, max_tokens_per_batch // seq_length))
+        start = time.perf_counter()
+        run_batched_inference([text] * num_sequences, backend, tokenizer, batch_size, max_length,
+                              max_tokens_per_batch, window_stride=window_stride)
+        seconds_per_length[seq_length] = time.perf_counter() - start
+    return seconds_per_length
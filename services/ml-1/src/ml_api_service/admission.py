@@ -0,0 +1,209 @@
+"""
+Token-cost admission control for the ABSA service.
+Each analyze request is priced by the number of tokens the model will run on for its distinct,
+uncached sentences. The count is estimated from their length in characters with a tokens-per-character
+ratio learned from the batches the model has run (padding included), so pricing a request does not
+tokenize it a second time on the event loop. A request above the per-request budget is refused;
+the others are admitted while the tokens in flight stay within a global budget, and otherwise
+wait in per-caller queues that are served round-robin, so one caller's large request cannot
+hold back everybody else. A request whose estimated completion time would
+exceed the latency SLO is shed with a Retry-After hint instead of joining the queue.
+"""
+import asyncio
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List
+
+
+class RequestTooLargeError(Exception):
+    """Raised when a single request costs more tokens than the per-request budget."""
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request would miss the latency SLO; `retry_after` is a suggested wait in whole seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admits requests by token cost. `record_batch` is thread-safe; the other methods must be called on the event loop.
+
+    Args:
+        max_request_tokens (int): Largest cost of a single request (0 for no limit).
+        max_inflight_tokens (int): Tokens admitted and not yet processed, over all requests (0 for no limit).
+            A request larger than this budget is still admitted when nothing else is in flight.
+        latency_slo_seconds (float): Requests estimated to take longer are rejected (0 disables shedding).
+        initial_tokens_per_second (float): Model throughput assumed until batches have been measured.
+        initial_tokens_per_char (float): Tokens per character assumed until batches have been measured.
+        smoothing (float): Weight of the newest batch in the moving averages of throughput and tokens per character.
+    """
+
+    def __init__(self, max_request_tokens: int = 0, max_inflight_tokens: int = 0, latency_slo_seconds: float = 0.0,
+                 initial_tokens_per_second: float = 2000.0, initial_tokens_per_char: float = 0.3,
+                 smoothing: float = 0.2):
+        self.max_request_tokens = max_request_tokens
+        self.max_inflight_tokens = max_inflight_tokens
+        self.latency_slo_seconds = latency_slo_seconds
+        self.smoothing = smoothing
+        self._tokens_per_second = initial_tokens_per_second
+        self._tokens_per_char = initial_tokens_per_char
+        self._estimates_lock = threading.Lock()  # batches are measured on the inference worker threads
+        self._inflight_tokens = 0
+        self._inflight_by_caller: Dict[str, int] = {}
+        self._waiting_tokens = 0
+        self._waiters: "OrderedDict[str, deque]" = OrderedDict()
+        self.admitted = 0
+        self.deferred = 0
+        self.rejected_too_large = 0
+        self.shed = 0
+
+    @property
+    def tokens_per_second(self) -> float:
+        with self._estimates_lock:
+            return self._tokens_per_second
+
+    def record_batch(self, num_chars: int, tokens: int, seconds: float) -> None:
+        """Adds a measured inference batch (input characters, tokens run, seconds) to the estimates. Thread-safe."""
+        if num_chars <= 0 or tokens <= 0 or seconds <= 0:
+            return
+        with self._estimates_lock:
+            self._tokens_per_second += self.smoothing * (tokens / seconds - self._tokens_per_second)
+            self._tokens_per_char += self.smoothing * (tokens / num_chars - self._tokens_per_char)
+
+    def estimate_tokens(self, texts: List[str]) -> int:
+        """Estimated token cost of running `texts` through the model."""
+        with self._estimates_lock:
+            tokens_per_char = self._tokens_per_char
+        return max(1, math.ceil(sum(len(text) for text in texts) * tokens_per_char))
+
+    def estimate_seconds(self, caller: str, tokens: int) -> float:
+        """
+        Estimates how long a new request of `tokens` takes to get through the model. Batches are
+        shared round-robin between callers, so it needs about its own cost once per active caller,
+        and never more than the whole backlog.
+        """
+        active_callers = {caller, *self._inflight_by_caller, *self._waiters}
+        backlog = self._inflight_tokens + self._waiting_tokens + tokens
+        return min(backlog, tokens * len(active_callers)) / self.tokens_per_second
+
+    def _fits(self, tokens: int) -> bool:
+        return (not self.max_inflight_tokens or self._inflight_tokens == 0
+                or self._inflight_tokens + tokens <= self.max_inflight_tokens)
+
+    def _admit(self, caller: str, tokens: int) -> None:
+        self._inflight_tokens += tokens
+        self._inflight_by_caller[caller] = self._inflight_by_caller.get(caller, 0) + tokens
+
+    async def acquire(self, caller: str, tokens: int) -> bool:
+        """
+        Waits until a request may run. Pair every successful call with `release(caller, tokens)`.
+
+        Args:
+            caller (str): Fairness key of the request (caller or product id).
+            tokens (int): Estimated token cost of the request.
+
+        Returns:
+            bool: True if the request had to wait for budget (deferred), False if it was admitted at once.
+
+        Raises:
+            RequestTooLargeError: If `tokens` exceeds the per-request budget.
+            AdmissionRejectedError: If the request is estimated to miss the latency SLO, immediately
+                or after waiting for budget until the SLO would be missed.
+        """
+        if self.max_request_tokens and tokens > self.max_request_tokens:
+            self.rejected_too_large += 1
+            raise RequestTooLargeError(f"Request needs about {tokens} tokens; the limit per request is "
+                                       f"{self.max_request_tokens}. Split the reviews into smaller requests.")
+        estimated_seconds = self.estimate_seconds(caller, tokens)
+        if self.latency_slo_seconds and estimated_seconds > self.latency_slo_seconds:
+            self.shed += 1
+            raise AdmissionRejectedError(
+                f"Server is busy: about {estimated_seconds:.1f}s of model work expected for this request, "
+                f"more than the {self.latency_slo_seconds:g}s target.",
+                max(1, math.ceil(estimated_seconds - self.latency_slo_seconds)))
+        if not self._waiters and self._fits(tokens):
+            self._admit(caller, tokens)
+            self.admitted += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (tokens, waiter)
+        self._waiters.setdefault(caller, deque()).append(entry)
+        self._waiting_tokens += tokens
+        self.deferred += 1
+        timeout = self.latency_slo_seconds - estimated_seconds if self.latency_slo_seconds else None
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._remove_waiter(caller, entry)
+                self.shed += 1
+                raise AdmissionRejectedError(
+                    f"Server is busy: no capacity for this request within the {self.latency_slo_seconds:g}s target.",
+                    max(1, math.ceil(self._inflight_tokens / self.tokens_per_second)))
+        except asyncio.CancelledError:
+            # The client went away: give the budget back (or the place in the queue) before propagating.
+            if waiter.done():
+                self.release(caller, tokens)
+            else:
+                self._remove_waiter(caller, entry)
+            raise
+        self.admitted += 1
+        return True
+
+    def release(self, caller: str, tokens: int) -> None:
+        """Returns the tokens of a finished request to the budget and admits waiting requests that now fit."""
+        self._inflight_tokens -= tokens
+        remaining = self._inflight_by_caller.get(caller, 0) - tokens
+        if remaining > 0:
+            self._inflight_by_caller[caller] = remaining
+        else:
+            self._inflight_by_caller.pop(caller, None)
+        self._admit_waiters()
+
+    def _remove_waiter(self, caller: str, entry: tuple) -> None:
+        queue = self._waiters.get(caller)
+        if queue is not None and entry in queue:
+            queue.remove(entry)
+            self._waiting_tokens -= entry[0]
+            if not queue:
+                del self._waiters[caller]
+            # A large request leaving the head of the queue can unblock smaller ones behind it.
+            self._admit_waiters()
+
+    def _admit_waiters(self) -> None:
+        while self._waiters:
+            caller, queue = next(iter(self._waiters.items()))
+            tokens, waiter = queue[0]
+            if not self._fits(tokens):
+                break
+            queue.popleft()
+            self._waiting_tokens -= tokens
+            # The admitted caller moves to the back of the rotation: round-robin between callers.
+            del self._waiters[caller]
+            if queue:
+                self._waiters[caller] = queue
+            self._admit(caller, tokens)
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        """Returns the current budget usage and admission counters."""
+        return {
+            "inflight_tokens": self._inflight_tokens,
+            "waiting_tokens": self._waiting_tokens,
+            "waiting_requests": sum(len(queue) for queue in self._waiters.values()),
+            "active_callers": len({*self._inflight_by_caller, *self._waiters}),
+            "tokens_per_second": round(self.tokens_per_second, 1),
+            "tokens_per_char": round(self._tokens_per_char, 4),
+            "admitted": self.admitted,
+            "deferred": self.deferred,
+            "rejected_too_large": self.rejected_too_large,
+            "shed": self.shed,
+            "max_request_tokens": self.max_request_tokens,
+            "max_inflight_tokens": self.max_inflight_tokens,
+            "latency_slo_seconds": self.latency_slo_seconds,
+        }
@@ -0,0 +1,270 @@
+"""
+Incremental aggregation of extracted aspects into per-term sentiment counts, the input
+of the Gemma summary prompt. Reviews can be added one at a time as their batches finish.
+
+Terms are normalized (case, leading determiners, plural head noun, alias table) so that
+"Battery", "the batteries" and "battery life" count as one aspect, and interned to integer ids.
+Mentions are counted in one small dict per term, which is the cheapest way to add the few
+aspects of each review; they become a NumPy array of shape [terms, sentiments] only when read.
+Partial aggregates (e.g. from several workers) can be merged, and the top pros/cons are
+selected with array operations.
+"""
+import itertools
+import json
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+SENTIMENTS = ("positive", "negative", "neutral", "unknown")
+_SENTIMENT_INDEX = {sentiment: index for index, sentiment in enumerate(SENTIMENTS)}
+_POSITIVE, _NEGATIVE = _SENTIMENT_INDEX["positive"], _SENTIMENT_INDEX["negative"]
+_KNOWN_SENTIMENTS = frozenset(("positive", "negative", "neutral"))
+
+# Normalized alias -> canonical term. Extended (or overridden) with a JSON file, see load_term_aliases.
+DEFAULT_TERM_ALIASES = {
+    "battery life": "battery",
+    "display": "screen",
+    "customer service": "service",
+    "customer support": "service",
+    "food quality": "food",
+    "wait staff": "staff",
+    "waitstaff": "staff",
+    "os": "operating system",
+}
+
+_LEADING_WORDS = {"the", "a", "an", "this", "that", "these", "those", "my", "our", "your", "its", "their", "his", "her"}
+_NON_WORD = re.compile(r"[^\w\s'-]+")
+# Words ending in "s" that are not plurals (or whose singular is the same)
+_UNCHANGED_WORDS = {"series", "species", "news", "glass", "os", "ios", "macos", "windows", "chips", "fries"}
+_IRREGULAR_PLURALS = {"lives": "life", "knives": "knife", "leaves": "leaf", "loaves": "loaf", "halves": "half",
+                      "shelves": "shelf", "menus": "menu", "mice": "mouse", "people": "person", "women": "woman",
+                      "men": "man", "quizzes": "quiz", "potatoes": "potato", "tomatoes": "tomato",
+                      "mangoes": "mango", "heroes": "hero"}
+# Nouns ending in "ie" rather than "y" ("movies" -> "movie")
+_IE_NOUNS = {"movie", "pie", "tie", "lie", "cookie", "brownie", "smoothie", "veggie", "calorie", "selfie", "hoodie",
+             "rookie", "zombie", "goalie", "freebie", "goodie"}
+# Nouns ending in a silent "e" after "ch"/"sh", which only add "-s" ("caches" -> "cache")
+_SILENT_E_NOUNS = {"cache", "ache", "headache", "niche", "quiche", "cliche", "creche", "moustache", "mustache",
+                   "avalanche", "microfiche"}
+
+
+def _singularize(word: str) -> str:
+    """Light rule-based lemmatization of a plural English noun ("batteries" -> "battery")."""
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in _UNCHANGED_WORDS or not word.endswith("s"):
+        return word
+    if word.endswith("ies"):
+        return word[:-1] if word[:-1] in _IE_NOUNS else word[:-3] + "y"
+    # Only sibilant endings take "-es" ("glasses", "boxes", "buzzes", "dishes", "churches"); "sizes" adds "-s".
+    if word.endswith(("sses", "xes", "zzes")) or (word.endswith(("ches", "shes"))
+                                                  and word[:-1] not in _SILENT_E_NOUNS):
+        return word[:-2]
+    if word.endswith(("ss", "us", "is")):
+        return word
+    return word[:-1]
+
+
+def load_term_aliases(path: Optional[str] = None) -> Dict[str, str]:
+    """Returns DEFAULT_TERM_ALIASES updated with the {alias: canonical term} JSON object at `path`, if given."""
+    aliases = dict(DEFAULT_TERM_ALIASES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            aliases.update(json.load(f))
+    return aliases
+
+
+class TermNormalizer:
+    """
+    Maps raw aspect terms to canonical keys: lowercase, punctuation and leading determiners
+    removed, whitespace collapsed, the last word singularized, then looked up in the alias table.
+    Results are memoized, since the same raw terms recur across reviews and requests.
+
+    Args:
+        aliases (Optional[Mapping[str, str]]): Alias -> canonical term; keys are normalized the same way.
+        max_cached_terms (int): Memoized raw terms before the memo is cleared.
+    """
+
+    def __init__(self, aliases: Optional[Mapping[str, str]] = None, max_cached_terms: int = 100_000):
+        self.aliases: Dict[str, str] = {}
+        for alias, canonical in (DEFAULT_TERM_ALIASES if aliases is None else aliases).items():
+            self.aliases[self._normalize(alias)] = self._normalize(canonical)
+        self.max_cached_terms = max_cached_terms
+        self._cache: Dict[str, str] = {}
+
+    @staticmethod
+    def _normalize(term: str) -> str:
+        words = _NON_WORD.sub(" ", term.lower()).split()
+        while len(words) > 1 and words[0] in _LEADING_WORDS:
+            words = words[1:]
+        if words:
+            words[-1] = _singularize(words[-1])
+        return " ".join(words)
+
+    def __call__(self, term: str) -> str:
+        canonical = self._cache.get(term)
+        if canonical is None:
+            normalized = self._normalize(term)
+            canonical = self.aliases.get(normalized, normalized)
+            if len(self._cache) >= self.max_cached_terms:
+                self._cache.clear()
+            self._cache[term] = canonical
+        return canonical
+
+
+DEFAULT_NORMALIZER = TermNormalizer()
+
+
+class AspectSentimentAggregator:
+    """
+    Counts positive/negative/neutral/unknown mentions per normalized aspect term.
+
+    Args:
+        normalizer (Optional[TermNormalizer]): Term normalization; DEFAULT_NORMALIZER if None.
+        confidence_weighted (bool): Rank pros/cons by the summed model scores of the mentions
+            instead of the number of mentions.
+    """
+
+    def __init__(self, normalizer: Optional[TermNormalizer] = None, confidence_weighted: bool = False):
+        self.normalizer = normalizer or DEFAULT_NORMALIZER
+        self.confidence_weighted = confidence_weighted
+        self.terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        # Mentions (and summed scores) per term id, one {sentiment: count} dict each, in SENTIMENTS order
+        self._mentions: List[Dict[str, int]] = []
+        self._weights: Optional[List[Dict[str, float]]] = [] if confidence_weighted else None
+        # Raw term -> the row of its normalized term (a detached row if it normalizes to nothing)
+        self._raw_term_rows: Dict[str, Dict[str, int]] = {}
+        self._raw_term_weight_rows: Dict[str, Dict[str, float]] = {}
+        self.reviews_added = 0
+        self._ranking_cache: Optional[np.ndarray] = None  # _ranking_scores until the next add/merge
+        self._last_top_terms: Optional[Tuple] = None
+        self.unchanged_top_terms_streak = 0
+
+    def _intern(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self._term_ids[term] = len(self.terms)
+            self.terms.append(term)
+            self._mentions.append(dict.fromkeys(SENTIMENTS, 0))
+            if self._weights is not None:
+                self._weights.append(dict.fromkeys(SENTIMENTS, 0.0))
+        return term_id
+
+    def _add_raw_term(self, raw_term: str) -> Dict[str, int]:
+        term = self.normalizer(raw_term)
+        term_id = self._term_ids.get(term) if term else None
+        if term and term_id is None:
+            term_id = self._intern(term)
+        if term_id is None:
+            # Terms that normalize to nothing are counted in a row that is never read.
+            row, weight_row = dict.fromkeys(SENTIMENTS, 0), dict.fromkeys(SENTIMENTS, 0.0)
+        else:
+            row = self._mentions[term_id]
+            weight_row = self._weights[term_id] if self._weights is not None else None
+        self._raw_term_rows[raw_term] = row
+        if self._weights is not None:
+            self._raw_term_weight_rows[raw_term] = weight_row
+        return row
+
+    def add(self, aspects: Iterable[Mapping]) -> None:
+        """Adds the aspects (dicts with "term", "sentiment" and, if confidence-weighted, "score") of one review."""
+        # The same per-aspect work as counting raw terms in a dict: the normalization is paid once per raw term.
+        raw_term_rows, weighted = self._raw_term_rows, self._weights is not None
+        for aspect in aspects:
+            raw_term = aspect["term"]
+            row = raw_term_rows.get(raw_term)
+            if row is None:
+                row = self._add_raw_term(raw_term)
+            sentiment = aspect["sentiment"]
+            if sentiment not in _KNOWN_SENTIMENTS:
+                sentiment = "unknown"
+            row[sentiment] += 1
+            if weighted:
+                self._raw_term_weight_rows[raw_term][sentiment] += aspect.get("score", 1.0)
+        self.reviews_added += 1
+        self._ranking_cache = None
+
+    @staticmethod
+    def _rows_to_array(rows: List[Dict], dtype) -> np.ndarray:
+        values = itertools.chain.from_iterable(row.values() for row in rows)
+        return np.fromiter(values, dtype=dtype, count=len(rows) * len(SENTIMENTS)).reshape(len(rows), len(SENTIMENTS))
+
+    @property
+    def mention_counts(self) -> np.ndarray:
+        """Mentions as an int array of shape [len(terms), len(SENTIMENTS)], rows in `terms` order."""
+        return self._rows_to_array(self._mentions, np.int64)
+
+    @property
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Mentions per term as {term: {sentiment: count}} (a new dict on every access)."""
+        return self.counts_for(range(len(self.terms)))
+
+    def counts_for(self, term_ids: Iterable[int]) -> Dict[str, Dict[str, int]]:
+        """Mentions of the given term ids as {term: {sentiment: count}}, in the given order."""
+        return {self.terms[term_id]: dict(self._mentions[term_id]) for term_id in term_ids}
+
+    def snapshot(self) -> "AspectSentimentAggregator":
+        """Returns a copy that later `add` calls do not modify."""
+        copy = AspectSentimentAggregator(self.normalizer, self.confidence_weighted)
+        copy.merge(self)
+        return copy
+
+    def merge(self, other: "AspectSentimentAggregator") -> None:
+        """Adds the counts of another (partial) aggregate, e.g. from another batch or worker."""
+        other_weights = other._weights if other._weights is not None else other._mentions
+        for term, other_mentions, other_scores in zip(other.terms, other._mentions, other_weights):
+            term_id = self._intern(term)
+            mentions = self._mentions[term_id]
+            for sentiment, count in other_mentions.items():
+                mentions[sentiment] += count
+            if self._weights is not None:
+                scores = self._weights[term_id]
+                for sentiment, score in other_scores.items():
+                    scores[sentiment] += score
+        self.reviews_added += other.reviews_added
+        self._ranking_cache = None
+
+    def _ranking_scores(self) -> np.ndarray:
+        # Built once for both top_pros and top_cons
+        if self._ranking_cache is None:
+            self._ranking_cache = (self._rows_to_array(self._weights, np.float64) if self._weights is not None
+                                   else self.mention_counts)
+        return self._ranking_cache
+
+    def _top_term_ids(self, sentiment: int, opposite: int, top_n: int) -> List[int]:
+        scores = self._ranking_scores()
+        # A pro (con) is mentioned more often positively (negatively) than the other way round.
+        candidates = np.flatnonzero((scores[:, sentiment] > 0) & (scores[:, sentiment] > scores[:, opposite]))
+        if top_n <= 0 or not len(candidates):
+            return []
+        values = scores[candidates, sentiment]
+        if len(candidates) > top_n:
+            # Keep the top_n values and everything tied with the smallest of them, then order exactly.
+            threshold = np.partition(values, len(values) - top_n)[len(values) - top_n]
+            keep = values >= threshold
+            candidates, values = candidates[keep], values[keep]
+        order = np.lexsort((np.array([self.terms[i] for i in candidates]), -values))
+        return candidates[order[:top_n]].tolist()
+
+    def top_pros(self, top_n: int) -> List[int]:
+        """Ids of the `top_n` mostly-positive terms with the most positive mentions (ties broken by term)."""
+        return self._top_term_ids(_POSITIVE, _NEGATIVE, top_n)
+
+    def top_cons(self, top_n: int) -> List[int]:
+        """Ids of the `top_n` mostly-negative terms with the most negative mentions (ties broken by term)."""
+        return self._top_term_ids(_NEGATIVE, _POSITIVE, top_n)
+
+    def update_stability(self, top_n_pros: int, top_n_cons: int) -> int:
+        """
+        Recomputes the top pro/con terms and returns for how many consecutive calls they
+        have not changed. Call once per added review to detect a stabilized aggregate.
+        """
+        top_terms = (tuple(self.top_pros(top_n_pros)), tuple(self.top_cons(top_n_cons)))
+        if top_terms == self._last_top_terms:
+            self.unchanged_top_terms_streak += 1
+        else:
+            self.unchanged_top_terms_streak = 0
+            self._last_top_terms = top_terms
+        return self.unchanged_top_terms_streak
@@ -0,0 +1,86 @@
+"""
+Pluggable inference backends for the token-classification model.
+Each backend exposes `id2label` and `forward_logits(input_ids, attention_mask)`, which takes
+padded int64 NumPy arrays and returns float32 logits of shape [batch, sequence, labels].
+The SHA-256 helpers identify the exact weights a quantization report was measured on.
+"""
+import hashlib
+import os
+from typing import Dict
+
+import numpy as np
+import torch
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_weights_sha256(model) -> str:
+    """SHA-256 over the names, dtypes, shapes and bytes of the model's state_dict (independent of the file format)."""
+    digest = hashlib.sha256()
+    for name, tensor in model.state_dict().items():
+        tensor = tensor.detach().cpu().contiguous()
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy())
+    return digest.hexdigest()
+
+
+class TorchBackend:
+    """Eager PyTorch execution of a loaded AutoModelForTokenClassification."""
+    name = "pytorch"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+        self.id2label: Dict[int, str] = model.config.id2label
+
+    def forward_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            outputs = self.model(
+                input_ids=torch.from_numpy(input_ids).to(self.device),
+                attention_mask=torch.from_numpy(attention_mask).to(self.device),
+            )
+        return outputs.logits.float().cpu().numpy()
+
+
+class OnnxRuntimeBackend:
+    """
+    ONNX Runtime CPU execution of a graph exported by `src/export_to_onnx.py`.
+
+    Args:
+        onnx_path (str): Path to model.onnx.
+        id2label (Dict[int, str]): Label names, usually from the exported config.json.
+        intra_op_threads (int): Threads used inside one operator; 0 lets ONNX Runtime decide.
+        inter_op_threads (int): Threads used to run independent operators in parallel.
+    """
+    name = "onnxruntime"
+
+    def __init__(self, onnx_path: str, id2label: Dict[int, str], intra_op_threads: int = 0,
+                 inter_op_threads: int = 1):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime is not installed; install it to use the ONNX backend.")
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"ONNX model not found at {onnx_path}")
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        session_options.intra_op_num_threads = intra_op_threads
+        session_options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=session_options,
+                                            providers=["CPUExecutionProvider"])
+        self.id2label = {int(label_id): label for label_id, label in id2label.items()}
+
+    def forward_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        (logits,) = self.session.run(["logits"], {"input_ids": input_ids, "attention_mask": attention_mask})
+        return logits.astype(np.float32, copy=False)
@@ -1,27 +1,181 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List, Literal, Optional, Union
 from dotenv import load_dotenv
 import torch
-from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
+from transformers import AutoConfig, AutoTokenizer, AutoModelForTokenClassification
 import os
 import json
+import orjson
+import logging
+import asyncio
+import copy
+import itertools
+import threading
+import time
 import google.generativeai as genai
+from absa_inference import run_batched_inference, warmup_inference
+from admission import AdmissionController, AdmissionRejectedError, RequestTooLargeError
+from aggregation import AspectSentimentAggregator, TermNormalizer, load_term_aliases
+from inference_backends import OnnxRuntimeBackend, TorchBackend, file_sha256, model_weights_sha256
+from metrics import MetricsRegistry
+from micro_batcher import MicroBatchScheduler, QueueFullError
+from result_cache import AspectCache, make_cache_key
+from sentence_splitting import split_review_sentences
+from summary_cache import SummaryCache, make_summary_cache_key
 
 # --- Configuration ---
+load_dotenv()
+# DEBUG adds per-request and per-Gemma-call lines; WARNING keeps only problems.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("absa_api")
 MODEL_ID_ON_HUB = "AbdulrahmanMahmoud007/bert-absa-reviews-analysis"
+MODEL_REVISION = os.getenv("MODEL_REVISION", "main")
+# Pinned local artifact written by `python -m src.pin_serving_model`: safetensors weights, tokenizer and config
+# loaded with local_files_only (no network). Empty downloads MODEL_ID_ON_HUB at MODEL_REVISION instead.
+MODEL_LOCAL_DIR = os.getenv("MODEL_LOCAL_DIR", "")
+if MODEL_LOCAL_DIR:
+    # The artifact's pinned Hub revision, not the directory path, identifies the model in cache keys
+    _artifact_manifest_path = os.path.join(MODEL_LOCAL_DIR, "artifact.json")
+    if os.path.exists(_artifact_manifest_path):
+        with open(_artifact_manifest_path) as f:
+            _artifact_manifest = json.load(f)
+        MODEL_ID_ON_HUB, MODEL_REVISION = _artifact_manifest["model_id"], _artifact_manifest["revision"]
+    else:
+        MODEL_ID_ON_HUB, MODEL_REVISION = os.path.abspath(MODEL_LOCAL_DIR), "local"
+# "pytorch" (eager) or "onnxruntime" (graph exported by `python -m src.export_to_onnx`, loaded from ONNX_MODEL_DIR)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "../../saved_models/onnx")
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+# "none" or "int8" (dynamic INT8 weights). The int8 mode needs a report written by `python -m src.quantize_model`
+# and refuses to start if its recorded F1 drop on the held-out split exceeds MAX_QUANTIZED_F1_DROP, or if the
+# report was measured on other weights than the ones loaded (SHA-256 of the int8 ONNX file / fp32 PyTorch weights).
+QUANTIZATION_MODE = os.getenv("QUANTIZATION_MODE", "none")
+# Each backend has its own report next to the model it quantizes (the Hub model's report under saved_models)
+_DEFAULT_QUANTIZATION_REPORT_DIR = ONNX_MODEL_DIR if INFERENCE_BACKEND == "onnxruntime" else (
+    MODEL_LOCAL_DIR or "../../saved_models")
+QUANTIZATION_REPORT_PATH = os.getenv("QUANTIZATION_REPORT_PATH",
+                                     os.path.join(_DEFAULT_QUANTIZATION_REPORT_DIR, "quantization_report.json"))
+MAX_QUANTIZED_F1_DROP = float(os.getenv("MAX_QUANTIZED_F1_DROP", "0.01"))
+MODEL_VERSION = f"{MODEL_ID_ON_HUB}@{MODEL_REVISION}+{INFERENCE_BACKEND}"
+if QUANTIZATION_MODE != "none":
+    MODEL_VERSION += f"+{QUANTIZATION_MODE}"
+MAX_SEQ_LENGTH = 512
+# Reviews longer than BERT_WINDOW_SIZE tokens are split into windows that overlap by BERT_WINDOW_STRIDE tokens
+BERT_WINDOW_SIZE = min(int(os.getenv("BERT_WINDOW_SIZE", str(MAX_SEQ_LENGTH))), MAX_SEQ_LENGTH)
+BERT_WINDOW_STRIDE = int(os.getenv("BERT_WINDOW_STRIDE", "128"))
+BERT_BATCH_SIZE = int(os.getenv("BERT_BATCH_SIZE", "64"))
+BERT_MAX_TOKENS_PER_BATCH = int(os.getenv("BERT_MAX_TOKENS_PER_BATCH", "4096"))
+BERT_MAX_PADDING_RATIO = float(os.getenv("BERT_MAX_PADDING_RATIO", "0.25"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "10"))
+MICROBATCH_MAX_REVIEWS = int(os.getenv("MICROBATCH_MAX_REVIEWS", "256"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+# Texts waiting for a worker across all callers, and per caller (so one backlog cannot fill the whole queue)
+INFERENCE_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", "2048"))
+INFERENCE_CALLER_QUEUE_DEPTH = int(os.getenv("INFERENCE_CALLER_QUEUE_DEPTH", "1024"))
+QUEUE_FULL_RETRY_AFTER_SECONDS = 1
+# Sequence lengths (tokens) run once through the model before /health/ready reports ready; empty skips warmup
+WARMUP_SEQ_LENGTHS = [int(length) for length in os.getenv("WARMUP_SEQ_LENGTHS", "16,32,64,128,256,512").split(",")
+                      if length.strip()]
+STARTUP_RETRY_AFTER_SECONDS = 5
+# Admission control by token cost (see admission.py): requests above ADMISSION_MAX_REQUEST_TOKENS get a 413,
+# requests wait while ADMISSION_MAX_INFLIGHT_TOKENS are in flight, and requests estimated to take longer than
+# ADMISSION_LATENCY_SLO_SECONDS get a 503 with Retry-After (0 disables a limit). Callers queue fairly by the
+# CALLER_ID_HEADER request header (e.g. a product id), or by client address without it.
+ADMISSION_MAX_REQUEST_TOKENS = int(os.getenv("ADMISSION_MAX_REQUEST_TOKENS", "131072"))
+ADMISSION_MAX_INFLIGHT_TOKENS = int(os.getenv("ADMISSION_MAX_INFLIGHT_TOKENS", "262144"))
+ADMISSION_LATENCY_SLO_SECONDS = float(os.getenv("ADMISSION_LATENCY_SLO_SECONDS", "30"))
+ADMISSION_INITIAL_TOKENS_PER_SECOND = float(os.getenv("ADMISSION_INITIAL_TOKENS_PER_SECOND", "2000"))
+CALLER_ID_HEADER = os.getenv("CALLER_ID_HEADER", "X-Caller-Id")
+
+# Aspect result cache (ASPECT_CACHE_MAX_ENTRIES=0 disables it; an empty disk path keeps it in memory only)
+ASPECT_CACHE_MAX_ENTRIES = int(os.getenv("ASPECT_CACHE_MAX_ENTRIES", "50000"))
+ASPECT_CACHE_MAX_BYTES = int(os.getenv("ASPECT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ASPECT_CACHE_DISK_PATH = os.getenv("ASPECT_CACHE_DISK_PATH", "")
+ASPECT_CACHE_DISK_MAX_ENTRIES = int(os.getenv("ASPECT_CACHE_DISK_MAX_ENTRIES", "1000000"))
+# Split reviews into sentences and run the model once per distinct normalized sentence of a request
+# (SENTENCE_SPLITTING=false runs it on whole reviews). Cache entries are per sentence (or review).
+SENTENCE_SPLITTING = os.getenv("SENTENCE_SPLITTING", "true").lower() == "true"
+# Cached aspects of long texts depend on the windowing, so it is part of the key
+ASPECT_CACHE_NAMESPACE = (f"{MODEL_VERSION}+window{BERT_WINDOW_SIZE}/{BERT_WINDOW_STRIDE}"
+                          f"+{'sentences' if SENTENCE_SPLITTING else 'reviews'}")
 
 # Gemma Configuration
-load_dotenv()
 GEMMA_API_KEY = os.getenv("GEMMA_API_KEY")
 GEMMA_MODEL_NAME = "gemma-3n-e4b-it"
+SUMMARY_CACHE_TTL_SECONDS = float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "3600"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1024"))
+SUMMARY_TOP_N_PROS = 5
+SUMMARY_TOP_N_CONS = 5
+# Aspect terms are normalized before counting (see aggregation.py); ASPECT_TERM_ALIASES_PATH is an optional JSON
+# object {alias: canonical term} added to the built-in aliases. With AGGREGATION_CONFIDENCE_WEIGHTED the top
+# pros/cons are ranked by the summed model scores of their mentions instead of the number of mentions.
+ASPECT_TERM_ALIASES_PATH = os.getenv("ASPECT_TERM_ALIASES_PATH", "")
+AGGREGATION_CONFIDENCE_WEIGHTED = os.getenv("AGGREGATION_CONFIDENCE_WEIGHTED", "false").lower() == "true"
+
+# Overlapped summarization: for requests with at least SUMMARY_EARLY_START_MIN_REVIEWS reviews, start the
+# Gemma call once SUMMARY_EARLY_START_FRACTION of them are analyzed, or once the top pro/con terms have not
+# changed for SUMMARY_STABILITY_WINDOW consecutive reviews (0 disables the stability check).
+SUMMARY_EARLY_START_MIN_REVIEWS = int(os.getenv("SUMMARY_EARLY_START_MIN_REVIEWS", "50"))
+SUMMARY_EARLY_START_FRACTION = float(os.getenv("SUMMARY_EARLY_START_FRACTION", "1.0"))
+SUMMARY_STABILITY_WINDOW = int(os.getenv("SUMMARY_STABILITY_WINDOW", "0"))
 
 # --- Global Variables ---
 tokenizer = None
-model = None
-absa_pipeline = None
-device = None
+inference_backend = None
+# (tokenizer, backend) loaded once by the multi-worker supervisor (multiworker.py) before it forks workers
+preloaded_inference = None
+inference_scheduler = None
+admission_controller = None
+aspect_cache = None
 gemma_llm = None
+summary_cache = None
+_worker_state = threading.local()
+_background_tasks = set()
+_batch_ids = itertools.count()
+_window_counters = {"windows": 0, "long_reviews": 0}
+_window_counters_lock = threading.Lock()
+# Cold start: seconds spent loading, warming up and until ready, plus the latency of the first served request
+_startup_state = {"started_at": None, "error": None, "seconds": {}}
+term_normalizer = TermNormalizer(load_term_aliases(ASPECT_TERM_ALIASES_PATH))
+
+# --- Metrics (exposed at /metrics) ---
+metrics = MetricsRegistry()
+REQUESTS_TOTAL = metrics.counter("absa_requests_total", "Analyze requests by endpoint and outcome.",
+                                 ("endpoint", "outcome"))
+REVIEWS_TOTAL = metrics.counter("absa_reviews_total", "Reviews received by endpoint.", ("endpoint",))
+REQUESTS_IN_FLIGHT = metrics.gauge("absa_requests_in_flight", "Analyze requests currently being served.",
+                                   ("endpoint",))
+REQUEST_LATENCY = metrics.histogram("absa_request_latency_seconds", "End-to-end analyze request latency.",
+                                    label_names=("endpoint",))
+STAGE_LATENCY = metrics.histogram("absa_stage_latency_seconds",
+                                  "Seconds per stage: tokenize/forward/decode per inference batch, "
+                                  "aggregate/llm per request.", label_names=("stage",))
+MICROBATCH_TEXTS = metrics.histogram("absa_microbatch_texts", "Texts (sentences or reviews) per combined batch.",
+                                     buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+FORWARD_BATCH_SIZE = metrics.histogram("absa_forward_batch_size", "Sequences per model forward pass.",
+                                       buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+FORWARD_SEQUENCE_LENGTH = metrics.histogram("absa_forward_sequence_length",
+                                            "Padded sequence length (tokens) per model forward pass.",
+                                            buckets=(8, 16, 32, 64, 128, 256, 384, 512))
+ASPECT_CACHE_LOOKUPS = metrics.counter("absa_aspect_cache_lookups_total", "Aspect cache lookups by result.",
+                                       ("result",))
+CACHE_HIT_RATIO = metrics.gauge("absa_cache_hit_ratio", "Hit ratio since startup, by cache.", ("cache",))
+INFERENCE_QUEUE_DEPTH_GAUGE = metrics.gauge("absa_inference_queued_texts", "Texts waiting for an inference batch.")
+ADMISSION_DECISIONS = metrics.counter("absa_admission_decisions_total",
+                                      "Admission decisions: admitted, deferred (admitted after waiting), "
+                                      "too_large or shed.", ("decision",))
+ADMISSION_TOKENS = metrics.gauge("absa_admission_tokens", "Tokens admitted and in flight or waiting for budget.",
+                                 ("state",))
+GEMMA_CALLS = metrics.counter("absa_gemma_calls_total", "Gemma generate calls sent.")
+GEMMA_ERRORS = metrics.counter("absa_gemma_errors_total", "Gemma calls or response parsing that failed.")
+STARTUP_SECONDS = metrics.gauge("absa_startup_seconds", "Cold start seconds by phase: load, warmup, ready "
+                                "(time to ready since startup) and first_request (latency of the first request).",
+                                ("phase",))
+GEMMA_FALLBACKS = metrics.counter("absa_gemma_fallbacks_total", "Summaries returned without Gemma, by reason.",
+                                  ("reason",))
 
 # --- Pydantic Models for Request and Response ---
 class ReviewRequest(BaseModel):
@@ -31,6 +185,8 @@ class Aspect(BaseModel):
     term: str
     sentiment: str
     score: float
+    start: int  # character offsets of the term in review_text
+    end: int
 
 class ReviewAspects(BaseModel):
     review_text: str
@@ -41,11 +197,35 @@ class FinalSummary(BaseModel):  # For the LLM's output
     cons: List[str]
     summary_paragraph: str
 
+class AnalysisMetadata(BaseModel):
+    # Seconds are summed over the BERT batches that served this request; batches can be shared
+    # with concurrent requests. "llm" overlaps the BERT stages when the summary starts early.
+    stage_timings_ms: Dict[str, float]
+    total_ms: float
+    reviews_analyzed: int
+    summary_based_on_reviews: int
+    summary_started_early: bool
+    # Sentences sent to the model vs. all sentences of the request (after normalization);
+    # dedup ratio = 1 - unique / total.
+    sentences_total: int
+    sentences_unique: int
+    sentence_dedup_ratio: float
+    # Estimated token cost of the request's model work and how long it waited for admission
+    admission_tokens: int = 0
+    admission_wait_ms: float = 0.0
+
 class AnalyzeResponse(BaseModel):
     analysis_results: List[ReviewAspects]  # From BERT
     final_summary: FinalSummary
+    metadata: Optional[AnalysisMetadata] = None
     message: str = "Aspects, sentiments, and summary extracted successfully"
 
+class AggregateAnalyzeResponse(BaseModel):  # response_mode=aggregate: no per-review payloads
+    aggregated_aspects: Dict[str, Dict[str, int]]  # term -> mentions per sentiment
+    final_summary: FinalSummary
+    metadata: Optional[AnalysisMetadata] = None
+    message: str = "Aggregated aspect sentiments and summary extracted successfully"
+
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="Aspect-Based Sentiment Analysis & Summarization API",
@@ -56,87 +236,242 @@ app = FastAPI(
 # --- Startup Event: Load Models and Configure API Key ---
 @app.on_event("startup")
 async def on_startup():
-    global tokenizer, model, absa_pipeline, device, gemma_llm
+    global gemma_llm, summary_cache
 
     # --- Load BERT Model ---
-    print(f"--- Loading BERT Aspect-Sentiment model ({MODEL_ID_ON_HUB}) from Hugging Face Hub ---")
-    try:
-        device_name = "cuda" if torch.cuda.is_available() else "cpu"
-        device = torch.device(device_name)
-        print(f"Using device for BERT: {device}")
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_ID_ON_HUB)
-        model = AutoModelForTokenClassification.from_pretrained(MODEL_ID_ON_HUB)
-        model.to(device)
-        model.eval()
-        pipeline_device_id = 0 if device_name == "cuda" else -1
-        absa_pipeline = pipeline(
-            "token-classification", model=model, tokenizer=tokenizer,
-            aggregation_strategy="simple", device=pipeline_device_id
-        )
-        print("--- BERT Aspect-Sentiment model, tokenizer, and pipeline loaded successfully from Hub! ---")
-    except Exception as e:
-        print(f"Error loading BERT model on startup: {e}")
-        import traceback;
-        traceback.print_exc()
-        absa_pipeline = None
+    # Loading and warmup run in the background so /health/live answers right away; analyze requests get a 503
+    # and /health/ready stays unready until the model has been warmed up.
+    _startup_state["started_at"] = time.perf_counter()
+    _track_background_task(asyncio.create_task(prepare_inference()))
 
     # --- Configure Gemma Model ---
-    print(f"--- Configuring Gemma model ({GEMMA_MODEL_NAME}) ---")
+    logger.info("Configuring Gemma model (%s)", GEMMA_MODEL_NAME)
     if not GEMMA_API_KEY:
-        print("CRITICAL ERROR: GEMMA_API_KEY environment variable not set. Summarization will be disabled.")
+        logger.critical("GEMMA_API_KEY environment variable not set. Summarization will be disabled.")
         gemma_llm = None
     else:
         try:
             genai.configure(api_key=GEMMA_API_KEY)
             gemma_llm = genai.GenerativeModel(GEMMA_MODEL_NAME)
-            print(f"--- Gemma model ({GEMMA_MODEL_NAME}) configured successfully! ---")
+            logger.info("Gemma model (%s) configured successfully", GEMMA_MODEL_NAME)
+            if SUMMARY_CACHE_MAX_ENTRIES > 0:
+                summary_cache = SummaryCache(SUMMARY_CACHE_TTL_SECONDS, SUMMARY_CACHE_MAX_ENTRIES)
+                logger.info("Summary cache enabled (%d entries, TTL %ss)", SUMMARY_CACHE_MAX_ENTRIES,
+                            SUMMARY_CACHE_TTL_SECONDS)
         except Exception as e:
-            print(f"Error configuring Gemma model: {e}")
-            import traceback;
-            traceback.print_exc()
+            logger.exception("Error configuring Gemma model: %s", e)
             gemma_llm = None
 
+# --- Load, warm up and publish the BERT model (runs in the background after startup) ---
+async def prepare_inference():
+    global tokenizer, inference_backend, inference_scheduler, admission_controller, aspect_cache
+    loop = asyncio.get_running_loop()
+    startup_seconds = _startup_state["seconds"]
+    try:
+        phase_start = time.perf_counter()
+        model_tokenizer, backend = preloaded_inference or await loop.run_in_executor(None, load_inference_backend)
+        startup_seconds["load"] = time.perf_counter() - phase_start
+        logger.info("BERT Aspect-Sentiment model and tokenizer loaded in %.2fs (%s backend, batch size %d, "
+                    "%d tokens per batch, %d-token windows with stride %d)", startup_seconds["load"], backend.name,
+                    BERT_BATCH_SIZE, BERT_MAX_TOKENS_PER_BATCH, BERT_WINDOW_SIZE, BERT_WINDOW_STRIDE)
+        if WARMUP_SEQ_LENGTHS:
+            phase_start = time.perf_counter()
+            seconds_per_length = await loop.run_in_executor(
+                None, warmup_inference, backend, model_tokenizer, WARMUP_SEQ_LENGTHS, BERT_BATCH_SIZE,
+                BERT_WINDOW_SIZE, BERT_MAX_TOKENS_PER_BATCH, BERT_WINDOW_STRIDE
+            )
+            startup_seconds["warmup"] = time.perf_counter() - phase_start
+            logger.info("Warmed up sequence lengths %s in %.2fs", sorted(seconds_per_length), startup_seconds["warmup"])
+
+        tokenizer = model_tokenizer
+        admission_controller = AdmissionController(ADMISSION_MAX_REQUEST_TOKENS, ADMISSION_MAX_INFLIGHT_TOKENS,
+                                                   ADMISSION_LATENCY_SLO_SECONDS, ADMISSION_INITIAL_TOKENS_PER_SECOND)
+        inference_scheduler = MicroBatchScheduler(
+            run_inference_batch, max_wait_ms=MICROBATCH_MAX_WAIT_MS, max_batch_size=MICROBATCH_MAX_REVIEWS,
+            num_workers=INFERENCE_WORKERS, max_queue_depth=INFERENCE_QUEUE_DEPTH,
+            max_flow_queue_depth=INFERENCE_CALLER_QUEUE_DEPTH
+        )
+        inference_scheduler.start()
+        logger.info("Micro-batching scheduler started (max wait %s ms, max %d texts, %d inference workers, "
+                    "queue depth %d, %d per caller)", MICROBATCH_MAX_WAIT_MS, MICROBATCH_MAX_REVIEWS,
+                    INFERENCE_WORKERS, INFERENCE_QUEUE_DEPTH, INFERENCE_CALLER_QUEUE_DEPTH)
+        if ASPECT_CACHE_MAX_ENTRIES > 0:
+            aspect_cache = AspectCache(ASPECT_CACHE_MAX_ENTRIES, ASPECT_CACHE_MAX_BYTES,
+                                       ASPECT_CACHE_DISK_PATH or None, ASPECT_CACHE_DISK_MAX_ENTRIES)
+            logger.info("Aspect cache enabled (%d entries, %d bytes, disk tier: %s)", ASPECT_CACHE_MAX_ENTRIES,
+                        ASPECT_CACHE_MAX_BYTES, ASPECT_CACHE_DISK_PATH or "off")
+        # Published last: requests are admitted once the backend is set
+        inference_backend = backend
+        startup_seconds["ready"] = time.perf_counter() - _startup_state["started_at"]
+        for phase, seconds in startup_seconds.items():
+            STARTUP_SECONDS.set(seconds, phase=phase)
+        logger.info("Ready to serve %.2fs after startup", startup_seconds["ready"])
+    except Exception as e:
+        logger.exception("Error loading BERT model on startup: %s", e)
+        _startup_state["error"] = str(e)
+
+# --- Load the BERT model into the configured inference backend ---
+def load_inference_backend():
+    if not 0 <= BERT_WINDOW_STRIDE < BERT_WINDOW_SIZE // 2:
+        raise ValueError(f"BERT_WINDOW_STRIDE must be in [0, BERT_WINDOW_SIZE / 2), got {BERT_WINDOW_STRIDE}.")
+    if QUANTIZATION_MODE not in ("none", "int8"):
+        raise ValueError(f"Unknown QUANTIZATION_MODE '{QUANTIZATION_MODE}' (expected 'none' or 'int8').")
+
+    if INFERENCE_BACKEND == "onnxruntime":
+        onnx_file = "model.int8.onnx" if QUANTIZATION_MODE == "int8" else "model.onnx"
+        onnx_path = os.path.join(ONNX_MODEL_DIR, onnx_file)
+        if QUANTIZATION_MODE == "int8":
+            check_quantization_report(INFERENCE_BACKEND, file_sha256(onnx_path))
+        logger.info("Loading BERT Aspect-Sentiment ONNX model %s from %s", onnx_file, ONNX_MODEL_DIR)
+        onnx_tokenizer = AutoTokenizer.from_pretrained(ONNX_MODEL_DIR)
+        onnx_config = AutoConfig.from_pretrained(ONNX_MODEL_DIR)
+        backend = OnnxRuntimeBackend(onnx_path, onnx_config.id2label,
+                                     intra_op_threads=ORT_INTRA_OP_THREADS)
+        return onnx_tokenizer, backend
+    if INFERENCE_BACKEND != "pytorch":
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{INFERENCE_BACKEND}' (expected 'pytorch' or 'onnxruntime').")
+
+    device_name = "cuda" if torch.cuda.is_available() else "cpu"
+    device = torch.device(device_name)
+    if MODEL_LOCAL_DIR:
+        logger.info("Loading BERT Aspect-Sentiment model %s@%s from local artifact %s", MODEL_ID_ON_HUB,
+                    MODEL_REVISION, MODEL_LOCAL_DIR)
+        # safetensors weights are memory-mapped instead of unpickled; local_files_only never contacts the Hub
+        hub_tokenizer = AutoTokenizer.from_pretrained(MODEL_LOCAL_DIR, local_files_only=True)
+        model = AutoModelForTokenClassification.from_pretrained(MODEL_LOCAL_DIR, local_files_only=True,
+                                                                use_safetensors=True)
+    else:
+        logger.info("Loading BERT Aspect-Sentiment model (%s) from Hugging Face Hub", MODEL_ID_ON_HUB)
+        hub_tokenizer = AutoTokenizer.from_pretrained(MODEL_ID_ON_HUB, revision=MODEL_REVISION)
+        model = AutoModelForTokenClassification.from_pretrained(MODEL_ID_ON_HUB, revision=MODEL_REVISION)
+    logger.info("Using device for BERT: %s", device)
+    model.to(device)
+    model.eval()
+    if QUANTIZATION_MODE == "int8":
+        if device.type != "cpu":
+            raise ValueError("QUANTIZATION_MODE=int8 with the pytorch backend is CPU only.")
+        check_quantization_report(INFERENCE_BACKEND, model_weights_sha256(model))
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info("Applied dynamic INT8 quantization to the BERT Linear layers")
+    return hub_tokenizer, TorchBackend(model, device)
+
+def check_quantization_report(backend_name: str, artifact_sha256: str) -> dict:
+    """
+    Refuses a quantized model without an accuracy report, with an F1 drop above MAX_QUANTIZED_F1_DROP,
+    or whose report was measured on another artifact (`artifact_sha256` is the hash of what is loaded).
+    """
+    if not os.path.exists(QUANTIZATION_REPORT_PATH):
+        raise FileNotFoundError(f"Quantization report not found at {QUANTIZATION_REPORT_PATH}; "
+                                f"run `python -m src.quantize_model --backend {backend_name}` first.")
+    with open(QUANTIZATION_REPORT_PATH) as f:
+        report = json.load(f).get(backend_name)
+    if report is None:
+        raise ValueError(f"Quantization report {QUANTIZATION_REPORT_PATH} has no entry for the {backend_name} backend.")
+    if report.get("artifact_sha256") != artifact_sha256:
+        raise ValueError(f"Quantization report {QUANTIZATION_REPORT_PATH} was measured on another model "
+                         f"({report.get('model')}, sha256 {report.get('artifact_sha256')}) than the one loaded "
+                         f"(sha256 {artifact_sha256}); rerun `python -m src.quantize_model --backend {backend_name}`.")
+    if report["f1_drop"] > MAX_QUANTIZED_F1_DROP:
+        raise ValueError(f"Quantized {backend_name} model loses {report['f1_drop']:.4f} F1 "
+                         f"(fp32 {report['f1_fp32']:.4f}, int8 {report['f1_int8']:.4f}), "
+                         f"more than MAX_QUANTIZED_F1_DROP={MAX_QUANTIZED_F1_DROP}.")
+    logger.info("INT8 quantization accepted: F1 drop %.4f <= %s, speedup %.2fx on the held-out split",
+                report["f1_drop"], MAX_QUANTIZED_F1_DROP, report.get("speedup") or 0)
+    return report
+
+# --- Inference Worker: runs on the scheduler's thread pool, never on the event loop ---
+def run_inference_batch(texts: List[str]) -> List[tuple]:
+    """
+    Runs BERT on a combined batch. Returns (aspects, batch_timings) per review, where aspects are
+    plain (cacheable) dicts and batch_timings holds the batch id and its per-stage seconds.
+    """
+    # Fast tokenizers are not safe to share between threads, so each inference worker gets its own copy.
+    worker_tokenizer = getattr(_worker_state, "tokenizer", None)
+    if worker_tokenizer is None:
+        worker_tokenizer = tokenizer if INFERENCE_WORKERS == 1 else copy.deepcopy(tokenizer)
+        _worker_state.tokenizer = worker_tokenizer
+    batch_timings = {"batch_id": next(_batch_ids)}
+    window_counters = {}
+    batch_shapes = []
+    decoded_per_review = run_batched_inference(
+        texts, inference_backend, worker_tokenizer, BERT_BATCH_SIZE, BERT_WINDOW_SIZE,
+        BERT_MAX_TOKENS_PER_BATCH, BERT_MAX_PADDING_RATIO, BERT_WINDOW_STRIDE,
+        timings=batch_timings, counters=window_counters, batch_shapes=batch_shapes
+    )
+    with _window_counters_lock:
+        for name, count in window_counters.items():
+            _window_counters[name] += count
+    MICROBATCH_TEXTS.observe(len(texts))
+    for stage in ("tokenize", "forward", "decode"):
+        STAGE_LATENCY.observe(batch_timings[stage], stage=stage)
+    for num_sequences, padded_length in batch_shapes:
+        FORWARD_BATCH_SIZE.observe(num_sequences)
+        FORWARD_SEQUENCE_LENGTH.observe(padded_length)
+    if admission_controller is not None:
+        admission_controller.record_batch(
+            sum(len(text) for text in texts),
+            sum(num_sequences * padded_length for num_sequences, padded_length in batch_shapes),
+            batch_timings["tokenize"] + batch_timings["forward"] + batch_timings["decode"])
+    aspects_per_review = [
+        [{"term": aspect["term"], "sentiment": aspect["sentiment"], "score": round(aspect["score"], 4),
+          "start": aspect["start"], "end": aspect["end"]}
+         for aspect in decoded]
+        for decoded in decoded_per_review
+    ]
+    return [(aspects, batch_timings) for aspects in aspects_per_review]
+
+# --- Shutdown Event: Stop the Inference Scheduler ---
+@app.on_event("shutdown")
+async def on_shutdown():
+    if inference_scheduler is not None:
+        await inference_scheduler.stop()
+    if aspect_cache is not None:
+        aspect_cache.close()
+
 # --- Call Gemma for Summarization ---
-async def get_summary_from_gemma(aspect_sentiment_data: List[ReviewAspects],
-                                  top_n_pros: int = 5,
-                                  top_n_cons: int = 5) -> FinalSummary:
+def new_aspect_aggregator() -> AspectSentimentAggregator:
+    return AspectSentimentAggregator(term_normalizer, confidence_weighted=AGGREGATION_CONFIDENCE_WEIGHTED)
+
+def _format_aspect_counts(title: str, counts: Dict[str, Dict[str, int]]) -> str:
+    lines = [title]
+    for term, term_counts in counts.items():
+        lines.append(
+            f"- Aspect: '{term}', Positive mentions: {term_counts['positive']}, Negative mentions: {term_counts['negative']}, Neutral mentions: {term_counts['neutral']}"
+        )
+    if not counts:
+        lines.append("- (none)")
+    return "\n".join(lines)
+
+async def summarize_aggregated_sentiments(aggregator: AspectSentimentAggregator,
+                                          top_n_pros: int = SUMMARY_TOP_N_PROS,
+                                          top_n_cons: int = SUMMARY_TOP_N_CONS) -> FinalSummary:
     global gemma_llm
     if gemma_llm is None:
+        GEMMA_FALLBACKS.inc(reason="not_configured")
         return FinalSummary(pros=[], cons=[],
                             summary_paragraph="LLM Summarizer (Gemma) not available or not configured.")
 
-    if not aspect_sentiment_data:
+    if not aggregator.reviews_added:
+        GEMMA_FALLBACKS.inc(reason="no_reviews")
         return FinalSummary(pros=[], cons=[], summary_paragraph="No aspects found to summarize.")
 
-    # 1. Aggregate aspects
-    aggregated_sentiments = {}
-    for review_data in aspect_sentiment_data:
-        for aspect in review_data.extracted_aspects:
-            term = aspect.term
-            sentiment = aspect.sentiment
-            if term not in aggregated_sentiments:
-                aggregated_sentiments[term] = {"positive": 0, "negative": 0, "neutral": 0, "unknown": 0}
-            if sentiment in aggregated_sentiments[term]:
-                aggregated_sentiments[term][sentiment] += 1
-            else:
-                aggregated_sentiments[term]["unknown"] += 1
-
-    prompt_data_lines = ["Aggregated Aspect Sentiments from customer reviews:"]
-    for term, counts in aggregated_sentiments.items():
-        prompt_data_lines.append(
-            f"- Aspect: '{term}', Positive mentions: {counts['positive']}, Negative mentions: {counts['negative']}, Neutral mentions: {counts['neutral']}"
-        )
-    prompt_data_str = "\n".join(prompt_data_lines)
+    # 1. Select the top pros/cons from the counts; only those go into the prompt
+    pro_counts = aggregator.counts_for(aggregator.top_pros(top_n_pros))
+    con_counts = aggregator.counts_for(aggregator.top_cons(top_n_cons))
+    prompt_data_str = "\n\n".join([
+        _format_aspect_counts("Most praised aspects (by positive mentions):", pro_counts),
+        _format_aspect_counts("Most criticized aspects (by negative mentions):", con_counts),
+    ])
 
     # 2. Construct Prompt for Gemma
     prompt = f"""
-Based on the following aggregated aspect sentiment data from customer reviews:
+Based on the following aggregated aspect sentiment data from {aggregator.reviews_added} customer reviews:
 
 {prompt_data_str}
 
 Please perform the following tasks:
-1. Identify and list the top {top_n_pros} most significant "Pros" (primarily positive aspects, consider frequency).
-2. Identify and list the top {top_n_cons} most significant "Cons" (primarily negative aspects, consider frequency).
+1. List one "Pro" for each of the most praised aspects, in the given order.
+2. List one "Con" for each of the most criticized aspects, in the given order.
 3. Write a concise and brief overall summary paragraph based on these pros and cons.
 
 Your response MUST be a single, valid JSON object with the following keys:
@@ -153,13 +488,31 @@ Example of desired JSON output:
 
 JSON Response:
 """
-    print(f"\n--- Sending prompt to Gemma ({GEMMA_MODEL_NAME}) ---")
-
     try:
-        generation_config = genai.types.GenerationConfig(
-            temperature=0.2,
-        )
+        if summary_cache is None:
+            return await _generate_summary_with_gemma(prompt)
+        cache_key = make_summary_cache_key({"pros": pro_counts, "cons": con_counts, "reviews": aggregator.reviews_added},
+                                           top_n_pros, top_n_cons, GEMMA_MODEL_NAME)
+        return await summary_cache.get_or_compute(cache_key, lambda: _generate_summary_with_gemma(prompt))
 
+    except Exception as e:
+        logger.exception("Error during Gemma interaction or parsing: %s", e)
+        GEMMA_FALLBACKS.inc(reason="error")
+        if hasattr(e, 'response') and hasattr(e.response, 'prompt_feedback'):
+            logger.warning("Gemma prompt feedback: %s", e.response.prompt_feedback)
+            error_detail = f"LLM generation issue: {e.response.prompt_feedback}"
+        else:
+            error_detail = str(e)
+        return FinalSummary(pros=[], cons=[], summary_paragraph=f"Error generating summary via LLM: {error_detail}")
+
+async def _generate_summary_with_gemma(prompt: str) -> FinalSummary:
+    logger.debug("Sending prompt to Gemma (%s), %d characters", GEMMA_MODEL_NAME, len(prompt))
+    GEMMA_CALLS.inc()
+    generation_config = genai.types.GenerationConfig(
+        temperature=0.2,
+    )
+
+    try:
         # Generate content
         response = await gemma_llm.generate_content_async(
             prompt,
@@ -173,76 +526,361 @@ JSON Response:
             generated_text = generated_text.strip()[:-3]
 
         parsed_summary_data = json.loads(generated_text.strip())
-        print("--- Received and parsed JSON response from Gemma ---")
+        logger.debug("Received and parsed JSON response from Gemma")
 
         return FinalSummary(**parsed_summary_data)
-
-    except Exception as e:
-        print(f"Error during Gemma interaction or parsing: {e}")
-        if hasattr(e, 'response') and hasattr(e.response, 'prompt_feedback'):
-            print(f"Gemma Prompt Feedback: {e.response.prompt_feedback}")
-            error_detail = f"LLM generation issue: {e.response.prompt_feedback}"
-        else:
-            error_detail = str(e)
-        import traceback;
-        traceback.print_exc()
-        return FinalSummary(pros=[], cons=[], summary_paragraph=f"Error generating summary via LLM: {error_detail}")
-
-# --- API Endpoint ---
-@app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_reviews(request_data: ReviewRequest):
-    global absa_pipeline
-    if absa_pipeline is None:
+    except Exception:
+        GEMMA_ERRORS.inc()
+        raise
+
+# --- BERT Aspect Extraction (cache first, then the micro-batching scheduler) ---
+async def start_aspect_extraction(reviews: List[str], caller: str):
+    """
+    Starts aspect extraction for each review. Reviews are split into normalized sentences, which
+    are deduplicated across the request and looked up in the aspect cache; only distinct cache
+    misses are sent to the model, once admission control has admitted their token cost, and their
+    results are written back to the cache once the request's misses are done.
+
+    Returns:
+        tuple: (one future per review, in order, resolving to (aspects as dicts with offsets in the
+            raw review, list of batch timings of the batches that served it),
+            {"sentences_total", "sentences_unique", "admission_tokens", "admission_wait_ms"} for the request)
+
+    Raises:
+        RequestTooLargeError: If the cache misses exceed the per-request token budget.
+        AdmissionRejectedError: If the request would miss the latency SLO.
+        QueueFullError: If the inference queue cannot take the cache misses.
+    """
+    loop = asyncio.get_running_loop()
+    review_sentences = []
+    texts_to_run = {}
+    sentences_total = 0
+    for review_text in reviews:
+        keyed_sentences = []
+        for sentence in split_review_sentences(review_text, SENTENCE_SPLITTING):
+            key = make_cache_key(ASPECT_CACHE_NAMESPACE, sentence.text)
+            keyed_sentences.append((key, sentence))
+            texts_to_run[key] = sentence.text
+        sentences_total += len(keyed_sentences)
+        review_sentences.append(keyed_sentences)
+
+    futures_by_key = {}
+    cached = aspect_cache.get_many(list(texts_to_run)) if aspect_cache is not None else {}
+    if aspect_cache is not None:
+        ASPECT_CACHE_LOOKUPS.inc(len(cached), result="hit")
+        ASPECT_CACHE_LOOKUPS.inc(len(texts_to_run) - len(cached), result="miss")
+    for key, aspects in cached.items():
+        futures_by_key[key] = loop.create_future()
+        futures_by_key[key].set_result((aspects, None))
+    miss_keys = [key for key in texts_to_run if key not in cached]
+    request_stats = {"sentences_total": sentences_total, "sentences_unique": len(texts_to_run),
+                     "admission_tokens": 0, "admission_wait_ms": 0.0}
+    if miss_keys:
+        miss_texts = [texts_to_run[key] for key in miss_keys]
+        cost = admission_controller.estimate_tokens(miss_texts)
+        admission_start = time.perf_counter()
+        try:
+            deferred = await admission_controller.acquire(caller, cost)
+        except RequestTooLargeError:
+            ADMISSION_DECISIONS.inc(decision="too_large")
+            raise
+        except AdmissionRejectedError:
+            ADMISSION_DECISIONS.inc(decision="shed")
+            raise
+        ADMISSION_DECISIONS.inc(decision="deferred" if deferred else "admitted")
+        request_stats["admission_tokens"] = cost
+        request_stats["admission_wait_ms"] = round((time.perf_counter() - admission_start) * 1000, 2)
+        try:
+            miss_futures = inference_scheduler.submit_nowait(miss_texts, flow=caller)
+        except QueueFullError:
+            admission_controller.release(caller, cost)
+            raise
+        asyncio.gather(*miss_futures, return_exceptions=True).add_done_callback(
+            lambda _: admission_controller.release(caller, cost))
+        futures_by_key.update(zip(miss_keys, miss_futures))
+        if aspect_cache is not None:
+            _track_background_task(loop.create_task(_cache_extracted_aspects(miss_keys, miss_futures)))
+
+    review_futures = [asyncio.ensure_future(_assemble_review_aspects(keyed_sentences, futures_by_key))
+                      for keyed_sentences in review_sentences]
+    return review_futures, request_stats
+
+def caller_id(request: Request) -> str:
+    """Fairness key of a request: the CALLER_ID_HEADER value, or the client address without it."""
+    return request.headers.get(CALLER_ID_HEADER) or (request.client.host if request.client else "anonymous")
+
+async def _assemble_review_aspects(keyed_sentences: list, futures_by_key: Dict[str, asyncio.Future]):
+    """Combines the sentence results of one review and maps their aspect offsets to the raw review text."""
+    results = await asyncio.gather(*(futures_by_key[key] for key, _ in keyed_sentences))
+    review_aspects = []
+    batch_timings_list = []
+    for (_, sentence), (aspects, batch_timings) in zip(keyed_sentences, results):
+        if batch_timings is not None:
+            batch_timings_list.append(batch_timings)
+        for aspect in aspects:
+            start, end = sentence.to_raw_span(aspect["start"], aspect["end"])
+            review_aspects.append({**aspect, "start": start, "end": end})
+    return review_aspects, batch_timings_list
+
+async def _cache_extracted_aspects(keys: List[str], futures: List[asyncio.Future]):
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    aspect_cache.put_many({key: result[0] for key, result in zip(keys, results)
+                           if not isinstance(result, BaseException)})
+
+def _track_background_task(task: asyncio.Task):
+    # Keep a reference so fire-and-forget tasks are not garbage-collected before they finish.
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def _start_extraction_or_reject(reviews: List[str], endpoint: str, caller: str):
+    if inference_backend is None or inference_scheduler is None:
+        REQUESTS_TOTAL.inc(endpoint=endpoint, outcome="unavailable")
+        if _startup_state["error"] is None:
+            raise HTTPException(status_code=503, detail="BERT ABSA Model is still loading.",
+                                headers={"Retry-After": str(STARTUP_RETRY_AFTER_SECONDS)})
         raise HTTPException(status_code=503, detail="BERT ABSA Model not loaded or unavailable.")
-    if not request_data.reviews:
+    if not reviews:
+        REQUESTS_TOTAL.inc(endpoint=endpoint, outcome="bad_request")
         raise HTTPException(status_code=400, detail="No reviews provided.")
+    try:
+        return await start_aspect_extraction(reviews, caller)
+    except RequestTooLargeError as e:
+        REQUESTS_TOTAL.inc(endpoint=endpoint, outcome="too_large")
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejectedError as e:
+        REQUESTS_TOTAL.inc(endpoint=endpoint, outcome="shed")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except QueueFullError as e:
+        REQUESTS_TOTAL.inc(endpoint=endpoint, outcome="rejected")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER_SECONDS)})
+
+def _observe_request_latency(seconds: float, endpoint: str):
+    REQUEST_LATENCY.observe(seconds, endpoint=endpoint)
+    if "first_request" not in _startup_state["seconds"] and inference_backend is not None:
+        _startup_state["seconds"]["first_request"] = seconds
+        STARTUP_SECONDS.set(seconds, phase="first_request")
+        logger.info("First request served in %.1f ms", seconds * 1000)
+
+# --- Overlapped BERT -> aggregation -> Gemma pipeline ---
+def _should_start_summary_early(reviews_done: int, total_reviews: int, aggregator: AspectSentimentAggregator) -> bool:
+    if total_reviews < SUMMARY_EARLY_START_MIN_REVIEWS or reviews_done >= total_reviews:
+        return False
+    if reviews_done >= SUMMARY_EARLY_START_FRACTION * total_reviews:
+        return True
+    if SUMMARY_STABILITY_WINDOW > 0:
+        return aggregator.update_stability(SUMMARY_TOP_N_PROS, SUMMARY_TOP_N_CONS) >= SUMMARY_STABILITY_WINDOW
+    return False
+
+async def run_analysis_pipeline(reviews: List[str], review_futures: List[asyncio.Future], request_stats: dict):
+    """
+    Async generator that consumes per-review results as their batches finish, aggregates aspect
+    counts incrementally and overlaps the Gemma call with the remaining BERT work when the early
+    start settings allow it.
+
+    Yields:
+        ("review", index, aspects) for each review in completion order, with the aspects as plain
+        dicts shaped like `Aspect`, then ("summary", FinalSummary, AnalysisMetadata, aggregated counts) once.
+    """
+    pipeline_start = time.perf_counter()
+    stage_seconds = {"tokenize": 0.0, "forward": 0.0, "decode": 0.0, "aggregate": 0.0, "llm": 0.0}
+    counted_batches = set()
+    aggregator = new_aspect_aggregator()
+    summary_task = None
+    summary_based_on_reviews = len(reviews)
+
+    async def timed_summary(aggregate: AspectSentimentAggregator) -> FinalSummary:
+        llm_start = time.perf_counter()
+        try:
+            return await summarize_aggregated_sentiments(aggregate)
+        finally:
+            stage_seconds["llm"] += time.perf_counter() - llm_start
+
+    async def indexed(index: int, future: asyncio.Future):
+        return index, await future
 
-    print(f"Received {len(request_data.reviews)} reviews for BERT analysis.")
-    bert_results_list: List[ReviewAspects] = []
     try:
-        for review_text in request_data.reviews:
-            if not review_text.strip():
-                bert_results_list.append(ReviewAspects(review_text=review_text, extracted_aspects=[]))
-                continue
-            pipeline_output = absa_pipeline(review_text)
-            current_review_aspects: List[Aspect] = []
-            for entity in pipeline_output:
-                entity_group = entity.get('entity_group')
-                term = entity['word'].strip()
-                score = round(entity['score'], 4)
-                sentiment_str = "unknown"
-                if entity_group and entity_group.startswith("ASP-"):
-                    sentiment_code = entity_group.split("-", 1)[1]
-                    if sentiment_code == "POS":
-                        sentiment_str = "positive"
-                    elif sentiment_code == "NEG":
-                        sentiment_str = "negative"
-                    elif sentiment_code == "NEU":
-                        sentiment_str = "neutral"
-                    current_review_aspects.append(Aspect(term=term, sentiment=sentiment_str, score=score))
-            bert_results_list.append(ReviewAspects(review_text=review_text, extracted_aspects=current_review_aspects))
-        print("BERT analysis complete.")
-
-        final_summary_obj = await get_summary_from_gemma(bert_results_list)
-
-        return AnalyzeResponse(
-            analysis_results=bert_results_list,
-            final_summary=final_summary_obj,
-            message="Aspects, sentiments (BERT) and summary (Gemma) extracted successfully"
-        )
+        for next_done in asyncio.as_completed([indexed(i, f) for i, f in enumerate(review_futures)]):
+            index, (aspects, batch_timings_list) = await next_done
+            for batch_timings in batch_timings_list:
+                if batch_timings["batch_id"] not in counted_batches:
+                    counted_batches.add(batch_timings["batch_id"])
+                    for stage in ("tokenize", "forward", "decode"):
+                        stage_seconds[stage] += batch_timings[stage]
+            aggregate_start = time.perf_counter()
+            aggregator.add(aspects)
+            start_early = summary_task is None and _should_start_summary_early(
+                aggregator.reviews_added, len(reviews), aggregator)
+            stage_seconds["aggregate"] += time.perf_counter() - aggregate_start
+            if start_early:
+                summary_based_on_reviews = aggregator.reviews_added
+                summary_task = asyncio.ensure_future(timed_summary(aggregator.snapshot()))
+            yield "review", index, aspects
+
+        if summary_task is None:
+            summary_task = asyncio.ensure_future(timed_summary(aggregator))
+        final_summary_obj = await summary_task
+    finally:
+        if summary_task is not None and not summary_task.done():
+            summary_task.cancel()
+
+    STAGE_LATENCY.observe(stage_seconds["aggregate"], stage="aggregate")
+    STAGE_LATENCY.observe(stage_seconds["llm"], stage="llm")
+    metadata = AnalysisMetadata(
+        stage_timings_ms={stage: round(seconds * 1000, 2) for stage, seconds in stage_seconds.items()},
+        total_ms=round((time.perf_counter() - pipeline_start) * 1000, 2),
+        reviews_analyzed=len(reviews),
+        summary_based_on_reviews=summary_based_on_reviews,
+        summary_started_early=summary_based_on_reviews < len(reviews),
+        sentences_total=request_stats["sentences_total"],
+        sentences_unique=request_stats["sentences_unique"],
+        sentence_dedup_ratio=(round(1 - request_stats["sentences_unique"] / request_stats["sentences_total"], 4)
+                              if request_stats["sentences_total"] else 0.0),
+        admission_tokens=request_stats["admission_tokens"],
+        admission_wait_ms=request_stats["admission_wait_ms"],
+    )
+    yield "summary", final_summary_obj, metadata, aggregator.counts
+
+# --- API Endpoint ---
+# Responses are built as plain dicts and encoded with orjson rather than validated into Pydantic models
+# (response_model only documents the schema); response_mode=aggregate omits the per-review results.
+@app.post("/analyze", response_model=Union[AnalyzeResponse, AggregateAnalyzeResponse])
+async def analyze_reviews(request_data: ReviewRequest, request: Request,
+                          response_mode: Literal["full", "aggregate"] = Query(
+                              "full", description="'aggregate' returns only the aggregated aspect counts and "
+                                                  "the summary instead of every review's aspects.")):
+    logger.debug("Received %d reviews for BERT analysis (%s response)", len(request_data.reviews), response_mode)
+    REVIEWS_TOTAL.inc(len(request_data.reviews), endpoint="analyze")
+    request_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(endpoint="analyze")
+    try:
+        review_futures, request_stats = await _start_extraction_or_reject(request_data.reviews, "analyze",
+                                                                           caller_id(request))
+        full_response = response_mode == "full"
+        bert_results_list: List[Optional[dict]] = [None] * len(review_futures) if full_response else []
+        async for event in run_analysis_pipeline(request_data.reviews, review_futures, request_stats):
+            if event[0] == "review":
+                if full_response:
+                    _, index, aspects = event
+                    bert_results_list[index] = {"review_text": request_data.reviews[index],
+                                                "extracted_aspects": aspects}
+            else:
+                _, final_summary_obj, metadata, aggregated_sentiments = event
+        logger.debug("BERT analysis and summary complete in %.1f ms", metadata.total_ms)
+        REQUESTS_TOTAL.inc(endpoint="analyze", outcome="ok")
+
+        if full_response:
+            content = {"analysis_results": bert_results_list,
+                       "message": "Aspects, sentiments (BERT) and summary (Gemma) extracted successfully"}
+        else:
+            content = {"aggregated_aspects": aggregated_sentiments,
+                       "message": "Aggregated aspect sentiments (BERT) and summary (Gemma) extracted successfully"}
+        content["final_summary"] = final_summary_obj.model_dump()
+        content["metadata"] = metadata.model_dump()
+        return Response(orjson.dumps(content), media_type="application/json")
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error during /analyze endpoint: {e}")
-        import traceback;
-        traceback.print_exc()
+        logger.exception("Error during /analyze endpoint: %s", e)
+        REQUESTS_TOTAL.inc(endpoint="analyze", outcome="error")
         raise HTTPException(status_code=500, detail=f"An error occurred during analysis: {str(e)}")
+    finally:
+        REQUESTS_IN_FLIGHT.dec(endpoint="analyze")
+        _observe_request_latency(time.perf_counter() - request_start, "analyze")
+
+# --- Streaming API Endpoint ---
+@app.post("/analyze/stream")
+async def analyze_reviews_stream(request_data: ReviewRequest, request: Request):
+    """
+    Streams newline-delimited JSON: one {"type": "review", "index", "result"} event per review as
+    soon as its batch finishes (in completion order), then one {"type": "summary", "final_summary",
+    "metadata"} event. Failures after the stream has started are reported as a final {"type": "error"} event.
+    """
+    logger.debug("Received %d reviews for streaming BERT analysis", len(request_data.reviews))
+    REVIEWS_TOTAL.inc(len(request_data.reviews), endpoint="analyze_stream")
+    review_futures, request_stats = await _start_extraction_or_reject(request_data.reviews, "analyze_stream",
+                                                                       caller_id(request))
+    request_start = time.perf_counter()
+
+    async def event_stream():
+        try:
+            # Counted here so the finally below always pairs with it, even if the body never starts streaming.
+            REQUESTS_IN_FLIGHT.inc(endpoint="analyze_stream")
+            async for event in run_analysis_pipeline(request_data.reviews, review_futures, request_stats):
+                if event[0] == "review":
+                    _, index, aspects = event
+                    yield orjson.dumps({"type": "review", "index": index,
+                                        "result": {"review_text": request_data.reviews[index],
+                                                   "extracted_aspects": aspects}}) + b"\n"
+                else:
+                    _, final_summary_obj, metadata, _ = event
+                    yield orjson.dumps({"type": "summary", "final_summary": final_summary_obj.model_dump(),
+                                        "metadata": metadata.model_dump()}) + b"\n"
+            REQUESTS_TOTAL.inc(endpoint="analyze_stream", outcome="ok")
+        except Exception as e:
+            logger.exception("Error during /analyze/stream endpoint: %s", e)
+            REQUESTS_TOTAL.inc(endpoint="analyze_stream", outcome="error")
+            yield orjson.dumps({"type": "error", "detail": f"An error occurred during analysis: {str(e)}"}) + b"\n"
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint="analyze_stream")
+            _observe_request_latency(time.perf_counter() - request_start, "analyze_stream")
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+# --- Metrics Endpoint (Prometheus text format) ---
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    if aspect_cache is not None:
+        CACHE_HIT_RATIO.set(aspect_cache.stats()["hit_rate"], cache="aspect")
+    if summary_cache is not None:
+        cache_stats = summary_cache.stats()
+        lookups = cache_stats["hits"] + cache_stats["misses"] + cache_stats["coalesced"]
+        CACHE_HIT_RATIO.set((cache_stats["hits"] + cache_stats["coalesced"]) / lookups if lookups else 0.0,
+                            cache="summary")
+    if inference_scheduler is not None:
+        INFERENCE_QUEUE_DEPTH_GAUGE.set(inference_scheduler.stats()["queued_reviews"])
+    if admission_controller is not None:
+        admission_stats = admission_controller.stats()
+        ADMISSION_TOKENS.set(admission_stats["inflight_tokens"], state="inflight")
+        ADMISSION_TOKENS.set(admission_stats["waiting_tokens"], state="waiting")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# --- Health Check Endpoints ---
+# Liveness: the process and its event loop respond (restart the container otherwise).
+@app.get("/health/live")
+async def liveness_check():
+    return {"status": "ok"}
+
+# Readiness: the model is loaded and warmed up (route traffic here only then).
+@app.get("/health/ready")
+async def readiness_check():
+    startup = {"seconds": {phase: round(seconds, 4) for phase, seconds in _startup_state["seconds"].items()},
+               "warmup_seq_lengths": WARMUP_SEQ_LENGTHS}
+    if inference_backend is not None and inference_scheduler is not None:
+        return {"status": "ready", "startup": startup}
+    if _startup_state["error"] is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": _startup_state["error"],
+                                                      "startup": startup})
+    return JSONResponse(status_code=503, content={"status": "starting", "startup": startup},
+                        headers={"Retry-After": str(STARTUP_RETRY_AFTER_SECONDS)})
 
-# --- Health Check Endpoint ---
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "bert_model_loaded": absa_pipeline is not None,
-            "gemma_model_configured": gemma_llm is not None}
+    return {"status": "ok", "bert_model_loaded": inference_backend is not None,
+            "inference_backend": inference_backend.name if inference_backend is not None else None,
+            "model_version": MODEL_VERSION,
+            "quantization_mode": QUANTIZATION_MODE,
+            "startup_seconds": _startup_state["seconds"],
+            "gemma_model_configured": gemma_llm is not None,
+            "micro_batching": inference_scheduler.stats() if inference_scheduler is not None else None,
+            "admission": admission_controller.stats() if admission_controller is not None else None,
+            "sliding_windows": {"window_size": BERT_WINDOW_SIZE, "stride": BERT_WINDOW_STRIDE,
+                                "windows_processed": _window_counters["windows"],
+                                "long_reviews": _window_counters["long_reviews"]},
+            "aspect_cache": aspect_cache.stats() if aspect_cache is not None else None,
+            "summary_cache": summary_cache.stats() if summary_cache is not None else None}
 
 if __name__ == "__main__":
     import uvicorn
-    print("Starting FastAPI server (BERT + Gemma) using Uvicorn...")
+    logger.info("Starting FastAPI server (BERT + Gemma) using Uvicorn...")
     uvicorn.run("main:app", host="0.0.0.0", port=7860, reload=True)
\ No newline at end of file
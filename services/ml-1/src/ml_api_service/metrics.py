@@ -0,0 +1,149 @@
+"""
+Minimal thread-safe counters, gauges and histograms rendered in the Prometheus text
+exposition format for the service's /metrics endpoint. Values can be updated from the
+event loop and from the inference worker threads.
+"""
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond decode steps up to multi-second Gemma calls.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(label_names: Sequence[str], label_values: Tuple[str, ...],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(label_names, label_values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels."""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        # An unlabelled metric is exported as 0 before its first update.
+        self._values: Dict[Tuple[str, ...], float] = {} if self.label_names else {(): 0}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+    metric_type = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count of observed values."""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            bucket_counts = state[0]
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    bucket_counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (bucket_counts, total, count) in self._values.items():
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, ("le", _format_value(upper_bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Creates metrics and renders all of them for a scrape."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                  label_names: Sequence[str] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, label_names))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,207 @@
+"""
+Cross-request micro-batching for the ABSA service.
+Reviews submitted by concurrent /analyze calls are collected for a short window and
+run through the model together on a bounded pool of inference worker threads owned by
+the scheduler; each result is routed back to the future of the caller that submitted it.
+Queued reviews are grouped into flows (e.g. one per caller) and batches take them from the
+flows round-robin, so a small request does not wait behind every review of a large one.
+Blocking model code never runs on the event loop.
+"""
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when accepting more reviews would exceed the scheduler's or the flow's queue depth."""
+
+
+class MicroBatchScheduler:
+    """
+    Collects reviews from concurrent requests for up to `max_wait_ms` milliseconds or
+    `max_batch_size` reviews, whichever comes first, and runs them as one combined batch.
+    Reviews are queued per flow and taken one flow at a time in round-robin order.
+
+    Args:
+        infer_fn (Callable[[List[str]], List[Any]]): Synchronous batch inference function; it must
+            return one result per input text, in order.
+        max_wait_ms (float): How long the first queued review may wait for others to join its batch.
+        max_batch_size (int): Maximum number of reviews per combined batch.
+        num_workers (int): Number of inference worker threads, i.e. batches that may run at once.
+        max_queue_depth (int): Maximum number of reviews of all flows waiting for a worker; submissions
+            beyond it raise QueueFullError instead of waiting, so a saturated replica sheds load.
+        max_flow_queue_depth (Optional[int]): Maximum number of reviews of one flow waiting for a worker,
+            so one caller's backlog cannot fill the whole queue; None uses `max_queue_depth`.
+    """
+
+    def __init__(self, infer_fn: Callable[[List[str]], List[Any]], max_wait_ms: float, max_batch_size: int,
+                 num_workers: int = 1, max_queue_depth: int = 2048, max_flow_queue_depth: Optional[int] = None):
+        self.infer_fn = infer_fn
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self.num_workers = num_workers
+        self.max_queue_depth = max_queue_depth
+        self.max_flow_queue_depth = max_queue_depth if max_flow_queue_depth is None else max_flow_queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="absa-inference")
+        self._flows: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._queued = 0
+        self._not_empty: Optional[asyncio.Event] = None
+        self._worker_slots: Optional[asyncio.Semaphore] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._batch_tasks = set()
+        self.batches_run = 0
+        self.reviews_processed = 0
+        self.last_batch_size = 0
+        self.rejected_requests = 0
+
+    def start(self):
+        """Starts the batching loop on the running event loop."""
+        if self._worker_task is None:
+            self._not_empty = asyncio.Event()
+            self._worker_slots = asyncio.Semaphore(self.num_workers)
+            self._worker_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stops the batching loop, fails any queued reviews and shuts the inference workers down."""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+        for task in list(self._batch_tasks):
+            task.cancel()
+        for flow_queue in self._flows.values():
+            for _, future in flow_queue:
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference scheduler stopped."))
+        self._flows.clear()
+        self._queued = 0
+        self._executor.shutdown(wait=False)
+
+    def submit_nowait(self, texts: List[str], flow: Hashable = None) -> List[asyncio.Future]:
+        """
+        Queues reviews and returns one future per review without waiting for the results.
+
+        Args:
+            texts (List[str]): The reviews to run.
+            flow (Hashable): Fairness key (e.g. the caller); reviews of one flow run in submission order,
+                and batches alternate between flows.
+
+        Raises:
+            QueueFullError: If all queued reviews would exceed `max_queue_depth`, or the flow's queued reviews
+                `max_flow_queue_depth`. A request larger than a depth is only accepted into an empty queue.
+        """
+        if self._not_empty is None:
+            raise RuntimeError("Inference scheduler is not running.")
+        if self._queued and self._queued + len(texts) > self.max_queue_depth:
+            self.rejected_requests += 1
+            raise QueueFullError(f"Inference queue is full ({self._queued}/{self.max_queue_depth} reviews waiting).")
+        # Also per flow, so a caller with a deep backlog does not get the other callers' requests rejected.
+        flow_queued = len(self._flows.get(flow, ()))
+        if flow_queued and flow_queued + len(texts) > self.max_flow_queue_depth:
+            self.rejected_requests += 1
+            raise QueueFullError(f"Inference queue of this caller is full "
+                                 f"({flow_queued}/{self.max_flow_queue_depth} reviews waiting).")
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        if texts:
+            flow_queue = self._flows.get(flow)
+            if flow_queue is None:
+                flow_queue = self._flows[flow] = deque()
+            flow_queue.extend(zip(texts, futures))
+            self._queued += len(texts)
+            self._not_empty.set()
+        return futures
+
+    async def submit(self, texts: List[str], flow: Hashable = None) -> List[Any]:
+        """Queues reviews and waits until all of them have been processed."""
+        return list(await asyncio.gather(*self.submit_nowait(texts, flow)))
+
+    def _take_next(self) -> tuple:
+        # The first flow gives one review and moves to the back if it has more: round-robin between flows.
+        flow, flow_queue = self._flows.popitem(last=False)
+        item = flow_queue.popleft()
+        if flow_queue:
+            self._flows[flow] = flow_queue
+        self._queued -= 1
+        if not self._queued:
+            self._not_empty.clear()
+        return item
+
+    async def _collect_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        while not self._queued:
+            await self._not_empty.wait()
+        batch = [self._take_next()]
+        deadline = loop.time() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            if self._queued:
+                batch.append(self._take_next())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._not_empty.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # Only pull a new batch once a worker is free, so reviews keep accumulating
+            # (and batches keep filling up) while all workers are busy.
+            await self._worker_slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._worker_slots.release()
+                raise
+            # Callers that gave up (e.g. disconnected clients) do not need a forward pass.
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                self._worker_slots.release()
+                continue
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self.infer_fn, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._worker_slots.release()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        self.batches_run += 1
+        self.reviews_processed += len(batch)
+        self.last_batch_size = len(batch)
+
+    def stats(self) -> dict:
+        """Returns how many batches ran and how full they were on average."""
+        avg_batch_size = self.reviews_processed / self.batches_run if self.batches_run else 0.0
+        return {
+            "batches_run": self.batches_run,
+            "reviews_processed": self.reviews_processed,
+            "avg_batch_size": round(avg_batch_size, 2),
+            "avg_batch_fill_ratio": round(avg_batch_size / self.max_batch_size, 4),
+            "last_batch_size": self.last_batch_size,
+            "queued_reviews": self._queued,
+            "queued_flows": len(self._flows),
+            "rejected_requests": self.rejected_requests,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "num_workers": self.num_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "max_flow_queue_depth": self.max_flow_queue_depth,
+        }
@@ -0,0 +1,150 @@
+"""
+Multi-process serving for the ABSA API on CPU.
+A supervisor loads the BERT weights once, moves them into shared memory, binds the listening
+socket and forks N uvicorn workers that all accept from that socket. Forked workers map the
+same weight pages instead of each holding a private copy, and each worker is pinned to its
+own set of cores with a matching number of torch intra-op threads so workers do not
+oversubscribe the CPU. Crashed workers are re-forked from the supervisor, which still holds the model.
+
+The PyTorch backend is shared this way. ONNX Runtime sessions are not fork-safe, so with
+INFERENCE_BACKEND=onnxruntime every worker builds its own session (still pinned).
+
+Usage (from services/ml-1/src/ml_api_service; all main.py settings apply):
+    python multiworker.py --workers 4 --port 7860
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+from typing import List, Optional
+
+import torch
+import uvicorn
+
+import main
+from inference_backends import TorchBackend
+
+logger = logging.getLogger("absa_api.multiworker")
+
+
+def plan_cpu_sets(cpus: List[int], num_workers: int) -> List[List[int]]:
+    """Splits the available CPUs into `num_workers` contiguous, near-equal groups (shared round-robin if too few)."""
+    if num_workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(num_workers)]
+    base, extra = divmod(len(cpus), num_workers)
+    cpu_sets = []
+    start = 0
+    for worker in range(num_workers):
+        size = base + (1 if worker < extra else 0)
+        cpu_sets.append(cpus[start:start + size])
+        start += size
+    return cpu_sets
+
+
+def preload_model() -> None:
+    """Loads the model in the supervisor so forked workers share its weights."""
+    if main.INFERENCE_BACKEND != "pytorch":
+        logger.info("%s sessions are created per worker (not fork-safe); skipping preload", main.INFERENCE_BACKEND)
+        return
+    if torch.cuda.is_available():
+        raise RuntimeError("Multi-worker serving shares CPU weights; run a single process per GPU instead.")
+    model_tokenizer, backend = main.load_inference_backend()
+    if isinstance(backend, TorchBackend):
+        # Shared-memory storages stay shared even if something writes to them after the fork.
+        backend.model.share_memory()
+    main.preloaded_inference = (model_tokenizer, backend)
+    logger.info("Model preloaded in supervisor (pid %d)", os.getpid())
+
+
+def _run_worker(worker_index: int, sock: socket.socket, cpus: Optional[List[int]], threads: int) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+    if main.ORT_INTRA_OP_THREADS == 0:
+        main.ORT_INTRA_OP_THREADS = threads
+    logger.info("Worker %d (pid %d) serving on CPUs %s with %d threads", worker_index, os.getpid(),
+                cpus or "all", threads)
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level=main.LOG_LEVEL.lower()))
+    server.run(sockets=[sock])
+
+
+def serve(host: str, port: int, num_workers: int, threads_per_worker: int = 0, pin_cpus: bool = True) -> None:
+    """
+    Preloads the model, binds host:port and supervises `num_workers` forked uvicorn workers until SIGINT/SIGTERM.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        num_workers (int): Number of worker processes.
+        threads_per_worker (int): torch/ONNX Runtime intra-op threads per worker; 0 uses the size of its CPU set.
+        pin_cpus (bool): Pin each worker to its own CPU set with sched_setaffinity.
+    """
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    preload_model()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    available_cpus = sorted(os.sched_getaffinity(0))
+    cpu_sets = plan_cpu_sets(available_cpus, num_workers)
+    children = {}
+    stopping = False
+
+    def spawn(worker_index: int) -> None:
+        cpus = cpu_sets[worker_index] if pin_cpus else None
+        threads = threads_per_worker or len(cpu_sets[worker_index])
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(worker_index, sock, cpus, threads)
+            except BaseException:
+                logger.exception("Worker %d failed", worker_index)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = worker_index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Starting %d workers on %s:%d (CPUs %s)", num_workers, host, port, available_cpus)
+    for worker_index in range(num_workers):
+        spawn(worker_index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_index = children.pop(pid, None)
+        if worker_index is not None and not stopping:
+            logger.warning("Worker %d (pid %d) exited with status %d; restarting", worker_index, pid, status)
+            spawn(worker_index)
+    sock.close()
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the ABSA API with several pre-forked workers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVING_WORKERS", "2")))
+    parser.add_argument("--threads-per-worker", type=int, default=int(os.getenv("THREADS_PER_WORKER", "0")))
+    parser.add_argument("--no-pin", action="store_true", help="do not pin workers to CPU sets")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.threads_per_worker, pin_cpus=not args.no_pin)
@@ -0,0 +1,140 @@
+"""
+Content-hash cache for per-sentence (or per-review) aspect extraction results.
+Entries are keyed by a hash of the model version and the normalized text, kept
+in an in-memory LRU bounded by entry count and bytes, and optionally persisted to a
+SQLite file so they survive restarts.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+def normalize_review_text(text: str) -> str:
+    """NFC-normalizes the text, collapses runs of whitespace and strips both ends."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_cache_key(model_version: str, normalized_text: str) -> str:
+    """Hashes (model version, normalized text) into a fixed-size cache key."""
+    return hashlib.sha256(f"{model_version}\n{normalized_text}".encode("utf-8")).hexdigest()
+
+
+class AspectCache:
+    """
+    Two-tier cache of extracted aspects (lists of plain dicts).
+
+    Args:
+        max_entries (int): Maximum number of entries in memory.
+        max_bytes (int): Maximum total size of the serialized entries in memory.
+        disk_path (Optional[str]): SQLite file for the persistent tier, or None for memory only.
+        disk_max_entries (int): Maximum number of entries on disk; the oldest are dropped first.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, disk_path: Optional[str] = None,
+                 disk_max_entries: int = 1_000_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS aspects (key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS aspects_created ON aspects (created)")
+            self._db.commit()
+
+    def _store_in_memory(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = value
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[dict]]:
+        """Returns the cached aspect lists for the keys that are present (memory first, then disk)."""
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+                    self.memory_hits += 1
+            missing = [key for key in keys if key not in found]
+            if missing and self._db is not None:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM aspects WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = value
+                    self._store_in_memory(key, value)
+                    self.disk_hits += 1
+            self.misses += len(keys) - len(found)
+        return {key: json.loads(value) for key, value in found.items()}
+
+    def put_many(self, items: Dict[str, List[dict]]):
+        """Stores aspect lists in memory and, if enabled, on disk in one transaction."""
+        if not items:
+            return
+        encoded = {key: json.dumps(value, separators=(",", ":")).encode("utf-8") for key, value in items.items()}
+        with self._lock:
+            for key, value in encoded.items():
+                self._store_in_memory(key, value)
+            if self._db is not None:
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO aspects (key, value, created) VALUES (?, ?, ?)",
+                    [(key, value, now) for key, value in encoded.items()]
+                )
+                overflow = self._db.execute("SELECT COUNT(*) FROM aspects").fetchone()[0] - self.disk_max_entries
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM aspects WHERE key IN (SELECT key FROM aspects ORDER BY created LIMIT ?)",
+                        (overflow,)
+                    )
+                    self.disk_evictions += overflow
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        """Returns hit/miss/eviction counters and the current size of each tier."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "disk_enabled": self._db is not None,
+        }
@@ -0,0 +1,106 @@
+"""
+Sentence-level preprocessing for the ABSA service.
+Reviews are split into sentences and each sentence is normalized with
+result_cache.normalize_review_text, so identical boilerplate sentences ("Great product.")
+can be deduplicated within a request and cached across requests. Every sentence remembers
+where its normalized characters came from, so aspect offsets found in the normalized
+sentence can be mapped back to the raw review text.
+"""
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+from result_cache import normalize_review_text
+
+# A sentence ends after . ! or ? followed by whitespace, or at a line break.
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\s*\n\s*")
+
+
+class ReviewSentence:
+    """
+    A normalized sentence of a review and its mapping back to the raw review text.
+
+    Attributes:
+        text (str): NFC-normalized sentence with whitespace runs collapsed to one space.
+        raw_start (int): Offset of the sentence's first character in the raw review.
+    """
+    __slots__ = ("text", "raw_start", "_start_map", "_end_map")
+
+    def __init__(self, text: str, raw_start: int, start_map: Optional[List[int]] = None,
+                 end_map: Optional[List[int]] = None):
+        self.text = text
+        self.raw_start = raw_start
+        # None when the normalized text is an exact copy of the raw slice (the common case).
+        self._start_map = start_map
+        self._end_map = end_map
+
+    def to_raw_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Maps a [start, end) character span of `text` to the raw review."""
+        if self._start_map is None:
+            return self.raw_start + start, self.raw_start + end
+        return self._start_map[start], self._end_map[end - 1]
+
+
+def _normalize_with_offsets(text: str, start: int, end: int) -> ReviewSentence:
+    raw = text[start:end]
+    if normalize_review_text(raw) == raw:
+        return ReviewSentence(raw, start)
+    # Same normalization as normalize_review_text, done character by character to keep the offset map.
+    chars: List[str] = []
+    start_map: List[int] = []
+    end_map: List[int] = []
+    space_at = None
+    i = start
+    while i < end:
+        if text[i].isspace():
+            if space_at is None:
+                space_at = i
+            i += 1
+            continue
+        # NFC is applied per base character and its combining marks so each output character maps to a raw range.
+        group_end = i + 1
+        while group_end < end and unicodedata.combining(text[group_end]):
+            group_end += 1
+        if space_at is not None and chars:
+            chars.append(" ")
+            start_map.append(space_at)
+            end_map.append(space_at + 1)
+        space_at = None
+        for char in unicodedata.normalize("NFC", text[i:group_end]):
+            chars.append(char)
+            start_map.append(i)
+            end_map.append(group_end)
+        i = group_end
+    return ReviewSentence("".join(chars), start, start_map, end_map)
+
+
+def split_review_sentences(text: str, split_sentences: bool = True) -> List[ReviewSentence]:
+    """
+    Splits a review into normalized, non-empty sentences.
+
+    Args:
+        text (str): The raw review text.
+        split_sentences (bool): If False, the whole review is returned as one normalized "sentence".
+
+    Returns:
+        List[ReviewSentence]: The sentences in review order.
+    """
+    if split_sentences:
+        bounds = []
+        start = 0
+        for match in _SENTENCE_BOUNDARY.finditer(text):
+            bounds.append((start, match.start()))
+            start = match.end()
+        bounds.append((start, len(text)))
+    else:
+        bounds = [(0, len(text))]
+
+    sentences = []
+    for start, end in bounds:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            sentences.append(_normalize_with_offsets(text, start, end))
+    return sentences
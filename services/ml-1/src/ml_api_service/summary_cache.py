@@ -0,0 +1,104 @@
+"""
+TTL cache with single-flight for LLM summaries.
+Identical aggregated aspect counts produce identical prompts, so summaries are cached
+under a canonical hash of the counts, the top-N settings and the model name, and
+concurrent requests for the same key share one in-flight LLM call.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+
+def make_summary_cache_key(aggregated_counts: Dict[str, Dict[str, int]], top_n_pros: int, top_n_cons: int,
+                           model_name: str) -> str:
+    """Hashes the aggregated counts (independent of term order) together with the summary settings."""
+    canonical = json.dumps(
+        {"counts": aggregated_counts, "top_n_pros": top_n_pros, "top_n_cons": top_n_cons, "model": model_name},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Args:
+        ttl_seconds (float): How long a cached summary stays valid.
+        max_entries (int): Maximum number of cached summaries; the least recently used are dropped first.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the cached value for `key`, joins an in-flight computation of it, or runs
+        `compute()` and caches its result. Exceptions from `compute()` are passed to every
+        waiter and are not cached.
+        """
+        value = self._lookup(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            # shield: one waiter being cancelled must not cancel the shared call.
+            return await asyncio.shield(in_flight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved even if no other request joined this call.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,79 @@
+"""
+Pins the serving model to a local artifact directory so the API service can cold-start
+without network access (MODEL_LOCAL_DIR). The Hub revision is resolved to its commit hash,
+the weights are written as safetensors (memory-mapped on load) and the tokenizer and config
+are saved next to them, with an `artifact.json` recording where the files came from.
+
+Usage (from services/ml-1):
+    python -m src.pin_serving_model [--model <Hub id or local dir>] [--revision main] [--output-dir <dir>]
+"""
+import argparse
+import json
+import os
+import time
+
+from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+from . import config as project_config
+from .push_model_to_hub import HUB_MODEL_ID
+
+SERVING_ARTIFACT_DIR = os.path.join(project_config.OUTPUT_DIR_BASE, "serving")
+ARTIFACT_MANIFEST_FILE_NAME = "artifact.json"
+
+
+def resolve_revision(model_name_or_path: str, revision: str) -> str:
+    """Returns the commit hash of `revision` for a Hub model, or `revision` unchanged for a local directory."""
+    if os.path.isdir(model_name_or_path):
+        return revision
+    from huggingface_hub import HfApi
+    return HfApi().model_info(model_name_or_path, revision=revision).sha
+
+
+def pin_serving_model(model_name_or_path: str, revision: str, output_dir: str) -> str | None:
+    """
+    Saves the tokenizer, config and safetensors weights of the model at `revision` to `output_dir`.
+
+    Args:
+        model_name_or_path (str): Hugging Face Hub id or local directory of the fine-tuned model.
+        revision (str): Branch, tag or commit hash to pin (ignored for local directories).
+        output_dir (str): Directory for the serving artifact.
+
+    Returns:
+        str | None: The pinned revision, or None if loading or saving fails.
+    """
+    try:
+        commit_hash = resolve_revision(model_name_or_path, revision)
+        print(f"Loading {model_name_or_path} at revision {commit_hash}")
+        tokenizer = AutoTokenizer.from_pretrained(model_name_or_path, revision=commit_hash)
+        model = AutoModelForTokenClassification.from_pretrained(model_name_or_path, revision=commit_hash)
+    except Exception as e:
+        print(f"Error loading model/tokenizer: {e}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        model.save_pretrained(output_dir, safe_serialization=True)
+        tokenizer.save_pretrained(output_dir)
+        manifest = {"model_id": model_name_or_path, "revision": commit_hash,
+                    "pinned_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        with open(os.path.join(output_dir, ARTIFACT_MANIFEST_FILE_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+    except Exception as e:
+        print(f"Error saving the serving artifact: {e}")
+        return None
+
+    print(f"Serving artifact saved to {output_dir}; start the API with MODEL_LOCAL_DIR={os.path.abspath(output_dir)}")
+    return commit_hash
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pin the ABSA model to a local artifact for offline serving.")
+    parser.add_argument("--model", default=HUB_MODEL_ID, help=f"Hub id or local dir (default: {HUB_MODEL_ID})")
+    parser.add_argument("--revision", default="main", help="branch, tag or commit hash to pin")
+    parser.add_argument("--output-dir", default=SERVING_ARTIFACT_DIR)
+    args = parser.parse_args()
+    pin_serving_model(args.model, args.revision, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
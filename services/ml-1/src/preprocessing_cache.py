@@ -0,0 +1,129 @@
+"""
+Content-addressed cache for the tokenized training splits.
+Steps 1-4 of the training pipeline (load, clean, aggregate, tokenize and split) are a pure
+function of the raw data files, a few config values, the tokenizer and the preprocessing code.
+Their output is saved with `DatasetDict.save_to_disk` under a SHA-256 fingerprint of all of
+these, so a repeated run (or every run of a hyperparameter sweep) memory-maps the Arrow files
+with `load_from_disk` instead of rebuilding them. Any change to an input gives a new fingerprint.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Callable, Iterable
+
+import datasets
+from datasets import DatasetDict, load_from_disk
+
+from . import config
+
+# Bump when the cached layout changes without a change to the preprocessing modules below.
+CACHE_FORMAT_VERSION = 1
+FINGERPRINT_FILE_NAME = "fingerprint.json"
+# Source files whose code determines the cached splits
+_PREPROCESSING_MODULES = ("data_loader.py", "data_preprocessor.py", "tokenization_utils.py")
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_version() -> str:
+    """Hash of the preprocessing source files, the cache format and the `datasets` version."""
+    digest = hashlib.sha256(f"{CACHE_FORMAT_VERSION}:{datasets.__version__}".encode())
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for module_file in _PREPROCESSING_MODULES:
+        digest.update(module_file.encode())
+        digest.update(_sha256_file(os.path.join(source_dir, module_file)).encode())
+    return digest.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of the tokenizer class, casing and vocabulary, so equal tokenizers from different paths share a cache."""
+    description = {
+        "class": type(tokenizer).__name__,
+        "do_lower_case": getattr(tokenizer, "do_lower_case", None),
+        "vocab": sorted(tokenizer.get_vocab().items()),
+    }
+    return hashlib.sha256(json.dumps(description, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def fingerprint_inputs(data_files: Iterable[str], tokenizer, label2id: dict) -> dict:
+    """Everything the tokenized splits depend on, as a JSON-serializable dict."""
+    return {
+        # Content only, in read order (which encodes each file's domain): same-named files cannot collide
+        "data_files": [_sha256_file(path) for path in data_files],
+        "model_name": config.MODEL_NAME,
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "max_seq_length": config.MAX_SEQ_LENGTH,
+        "label_all_tokens": config.LABEL_ALL_TOKENS,
+        "label2id": label2id,
+        "seed": config.SEED,
+        "code_version": code_version(),
+    }
+
+
+def fingerprint_key(inputs: dict) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_or_build_dataset_splits(data_files: Iterable[str], tokenizer, label2id: dict,
+                                 build: Callable[[], DatasetDict | None],
+                                 cache_dir: str = config.PREPROCESSED_CACHE_DIR,
+                                 force_rebuild: bool = False) -> DatasetDict | None:
+    """
+    Returns the tokenized splits from the cache, or builds, saves and returns them.
+
+    Args:
+        data_files (Iterable[str]): Raw data files read by `build`; their bytes are part of the fingerprint.
+        tokenizer: Tokenizer used by `build`.
+        label2id (dict): Label map used by `build`.
+        build (Callable[[], DatasetDict | None]): Runs the preprocessing; returns None on failure.
+        cache_dir (str): Directory holding one subdirectory per fingerprint.
+        force_rebuild (bool): Ignore (and replace) a cached entry.
+
+    Returns:
+        DatasetDict | None: The splits, memory-mapped from disk when cached, or None if `build` failed.
+    """
+    try:
+        inputs = fingerprint_inputs(data_files, tokenizer, label2id)
+    except OSError as e:
+        print(f"Preprocessing cache disabled, could not fingerprint the inputs: {e}")
+        return build()
+    key = fingerprint_key(inputs)
+    entry_dir = os.path.join(cache_dir, key)
+
+    if os.path.exists(os.path.join(entry_dir, FINGERPRINT_FILE_NAME)) and not force_rebuild:
+        start = time.perf_counter()
+        try:
+            dataset_splits = load_from_disk(entry_dir)
+            print(f"Loaded preprocessed splits from cache {entry_dir} in {time.perf_counter() - start:.2f}s:",
+                  dataset_splits)
+            return dataset_splits
+        except Exception as e:
+            print(f"Could not load cached splits from {entry_dir}, rebuilding: {e}")
+
+    start = time.perf_counter()
+    dataset_splits = build()
+    if dataset_splits is None:
+        return None
+    print(f"Preprocessing took {time.perf_counter() - start:.2f}s; caching the splits in {entry_dir}")
+    # Write to a temporary directory first, so an interrupted run never leaves a partial entry behind.
+    tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+    try:
+        dataset_splits.save_to_disk(tmp_dir)
+        with open(os.path.join(tmp_dir, FINGERPRINT_FILE_NAME), "w") as f:
+            json.dump(dict(inputs, created_at=time.strftime("%Y-%m-%dT%H:%M:%S")), f, indent=2)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    except OSError as e:
+        print(f"Could not write the preprocessing cache: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return dataset_splits
+    # Return the memory-mapped copy, so this run trains on the same Arrow files as later ones.
+    return load_from_disk(entry_dir)
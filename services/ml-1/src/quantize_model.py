@@ -0,0 +1,171 @@
+"""
+Dynamic INT8 quantization of the fine-tuned token-classification model, with an accuracy guardrail.
+Quantizes the Linear layers (ONNX Runtime `quantize_dynamic` on the exported graph, or PyTorch
+`quantize_dynamic`), evaluates fp32 and int8 on the held-out test split with
+`compute_absa_metrics`, and records the F1 difference and speedup in a JSON report.
+The report also records the SHA-256 of what was evaluated (the int8 ONNX file, or the fp32 PyTorch
+weights), and the API service refuses to serve a quantized model whose recorded F1 drop is too
+large or whose report was measured on a different model.
+
+Usage (from services/ml-1, after `python -m src.export_to_onnx` for the ONNX backend):
+    python -m src.quantize_model --backend onnxruntime
+    python -m src.quantize_model --backend pytorch
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForTokenClassification, AutoTokenizer
+
+from . import config as project_config
+from .evaluation_utils import compute_absa_metrics
+from .export_to_onnx import ONNX_MODEL_FILE_NAME, ONNX_OUTPUT_DIR
+from .ml_api_service.absa_inference import collate_input_ids
+from .ml_api_service.inference_backends import (OnnxRuntimeBackend, TorchBackend, file_sha256,
+                                                model_weights_sha256)
+from .push_model_to_hub import HUB_MODEL_ID
+
+QUANTIZED_ONNX_FILE_NAME = "model.int8.onnx"
+QUANTIZATION_REPORT_FILE_NAME = "quantization_report.json"
+
+
+def quantize_onnx_model(onnx_dir: str) -> str:
+    """Writes a dynamically INT8-quantized copy of `<onnx_dir>/model.onnx` and returns its path."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    fp32_path = os.path.join(onnx_dir, ONNX_MODEL_FILE_NAME)
+    int8_path = os.path.join(onnx_dir, QUANTIZED_ONNX_FILE_NAME)
+    print(f"Quantizing {fp32_path} -> {int8_path} (dynamic INT8 weights)")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def quantize_torch_model(model):
+    """Returns a copy of `model` with its Linear layers dynamically quantized to INT8 (CPU only)."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_test_split(data_base_path: str, tokenizer):
+    """Returns the held-out 'test' split of the training pipeline (from the preprocessing cache when possible)."""
+    from .train import load_dataset_splits
+
+    label2id = {label: i for i, label in enumerate(project_config.LABEL_LIST)}
+    dataset_splits = load_dataset_splits(data_base_path, tokenizer, label2id)
+    if dataset_splits is None:
+        raise RuntimeError("Could not build the dataset splits for evaluation.")
+    return dataset_splits["test"]
+
+
+def evaluate_backend(backend, test_split, pad_token_id: int, batch_size: int):
+    """
+    Runs the backend over the test split and scores it with compute_absa_metrics.
+
+    Returns:
+        tuple: (metrics dict, seconds spent in forward passes)
+    """
+    max_len = max(len(ids) for ids in test_split["input_ids"])
+    all_logits = []
+    all_labels = []
+    forward_seconds = 0.0
+    for start in range(0, len(test_split), batch_size):
+        batch = test_split[start:start + batch_size]
+        input_ids, attention_mask = collate_input_ids(batch["input_ids"], pad_token_id)
+        forward_start = time.perf_counter()
+        logits = backend.forward_logits(input_ids, attention_mask)
+        forward_seconds += time.perf_counter() - forward_start
+        padded_logits = np.zeros((len(logits), max_len, logits.shape[-1]), dtype=np.float32)
+        padded_logits[:, :logits.shape[1]] = logits
+        padded_labels = np.full((len(logits), max_len), -100, dtype=np.int64)
+        for row, labels in enumerate(batch["labels"]):
+            padded_labels[row, :len(labels)] = labels
+        all_logits.append(padded_logits)
+        all_labels.append(padded_labels)
+    metrics = compute_absa_metrics((np.concatenate(all_logits), np.concatenate(all_labels)), backend.id2label)
+    return metrics, forward_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the ABSA model to INT8 and report the accuracy cost.")
+    parser.add_argument("--backend", choices=["onnxruntime", "pytorch"], default="onnxruntime")
+    # Defaults to the model the API service serves: MODEL_LOCAL_DIR if set, else the Hub model at MODEL_REVISION
+    parser.add_argument("--model", default=os.getenv("MODEL_LOCAL_DIR") or HUB_MODEL_ID,
+                        help=f"Local model dir or Hub id for the pytorch backend (default: $MODEL_LOCAL_DIR, "
+                             f"else {HUB_MODEL_ID})")
+    parser.add_argument("--revision", default=os.getenv("MODEL_REVISION", "main"),
+                        help="Hub revision of --model (default: $MODEL_REVISION, else main)")
+    parser.add_argument("--onnx-dir", default=ONNX_OUTPUT_DIR)
+    parser.add_argument("--data-path", default=project_config.DEFAULT_LOCAL_DATA_PATH)
+    parser.add_argument("--report-path", default=None,
+                        help=f"JSON report (default: <onnx-dir>/{QUANTIZATION_REPORT_FILE_NAME} for onnxruntime; "
+                             f"<model dir, or {project_config.OUTPUT_DIR_BASE} for a Hub model>/"
+                             f"{QUANTIZATION_REPORT_FILE_NAME} for pytorch)")
+    parser.add_argument("--batch-size", type=int, default=project_config.EVAL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.backend == "onnxruntime":
+        report_path = args.report_path or os.path.join(args.onnx_dir, QUANTIZATION_REPORT_FILE_NAME)
+        model_name_or_path, revision = args.onnx_dir, None
+        tokenizer = AutoTokenizer.from_pretrained(args.onnx_dir)
+        id2label = AutoConfig.from_pretrained(args.onnx_dir).id2label
+        fp32_path = os.path.join(args.onnx_dir, ONNX_MODEL_FILE_NAME)
+        int8_path = quantize_onnx_model(args.onnx_dir)
+        fp32_backend = OnnxRuntimeBackend(fp32_path, id2label)
+        int8_backend = OnnxRuntimeBackend(int8_path, id2label)
+        artifact = QUANTIZED_ONNX_FILE_NAME
+        # The service hashes the int8 file it loads and compares it with this value
+        artifact_sha256 = file_sha256(int8_path)
+        fp32_sha256 = file_sha256(fp32_path)
+    else:
+        model_name_or_path = args.model
+        revision = None if os.path.isdir(model_name_or_path) else args.revision
+        report_path = args.report_path or os.path.join(
+            model_name_or_path if revision is None else project_config.OUTPUT_DIR_BASE, QUANTIZATION_REPORT_FILE_NAME)
+        tokenizer = AutoTokenizer.from_pretrained(model_name_or_path, revision=revision)
+        model = AutoModelForTokenClassification.from_pretrained(model_name_or_path, revision=revision).eval()
+        fp32_backend = TorchBackend(model, torch.device("cpu"))
+        int8_backend = TorchBackend(quantize_torch_model(model), torch.device("cpu"))
+        artifact = "quantize_dynamic(torch.nn.Linear, qint8) at load time"
+        # The quantization happens at load time, so the fp32 weights identify the served model
+        artifact_sha256 = fp32_sha256 = model_weights_sha256(model)
+
+    test_split = load_test_split(args.data_path, tokenizer)
+    print(f"\nEvaluating fp32 and int8 ({args.backend}) on {len(test_split)} test sentences...")
+    fp32_metrics, fp32_seconds = evaluate_backend(fp32_backend, test_split, tokenizer.pad_token_id, args.batch_size)
+    int8_metrics, int8_seconds = evaluate_backend(int8_backend, test_split, tokenizer.pad_token_id, args.batch_size)
+
+    result = {
+        "model": model_name_or_path,
+        "revision": revision,
+        "artifact": artifact,
+        "artifact_sha256": artifact_sha256,
+        "fp32_sha256": fp32_sha256,
+        "test_sentences": len(test_split),
+        "f1_fp32": fp32_metrics["f1"],
+        "f1_int8": int8_metrics["f1"],
+        "f1_drop": fp32_metrics["f1"] - int8_metrics["f1"],
+        "forward_seconds_fp32": fp32_seconds,
+        "forward_seconds_int8": int8_seconds,
+        "speedup": fp32_seconds / int8_seconds if int8_seconds else None,
+        "metrics_fp32": fp32_metrics,
+        "metrics_int8": int8_metrics,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    report = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    report[args.backend] = result
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"F1 fp32: {result['f1_fp32']:.4f}  F1 int8: {result['f1_int8']:.4f}  drop: {result['f1_drop']:.4f}")
+    print(f"Forward time fp32: {fp32_seconds:.2f}s  int8: {int8_seconds:.2f}s  speedup: {result['speedup']:.2f}x")
+    print(f"Report saved to: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
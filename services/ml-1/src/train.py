@@ -1,49 +1,84 @@
 """
 Main script to orchestrate the ABSA model fine-tuning process.
 Loads data, preprocesses, configures training, trains, evaluates, and saves the model.
+With --distill it instead trains a smaller student on the soft logits of the fine-tuned
+teacher (knowledge distillation) and reports F1 next to CPU latency for both models.
 """
+import argparse
+import copy
+import json
+import time
+
+import numpy as np
 import torch
+import torch.nn.functional as F
 from transformers import (
     AutoModelForTokenClassification,
+    AutoTokenizer,
     TrainingArguments,
     Trainer,
     DataCollatorForTokenClassification
 )
 import os
 from . import config as project_config
-from .data_loader import load_and_combine_datasets
+from .data_loader import load_and_combine_datasets, load_streaming_dataset, manifest_path_for, raw_data_files
 from .data_preprocessor import clean_and_standardize_data, aggregate_data_for_hf
 from .tokenization_utils import get_tokenizer_and_config, map_and_split_dataset
 from .evaluation_utils import compute_absa_metrics
+from .preprocessing_cache import load_or_build_dataset_splits
 
-def run_training(data_base_path: str, model_output_base_dir: str):
+def load_aggregated_dataset(data_base_path: str):
     """
-    Executes the full fine-tuning pipeline.
-
-    Args:
-        data_base_path (str): Path to the directory containing raw CSV data.
-        model_output_base_dir (str): Base directory where fine-tuned models and results
-                                     will be saved.
+    Steps 1-3: loads, cleans and aggregates the raw CSVs into a HF Dataset (None on failure).
+    With a data manifest (config.DATA_MANIFEST_FILE) its sources are streamed in chunks instead.
     """
-    print("--- Starting ABSA Model Fine-Tuning Pipeline ---")
+    if os.path.exists(manifest_path_for(data_base_path)):
+        return load_streaming_dataset(data_base_path)
 
     # --- Step 1: Load Data ---
     df_combined = load_and_combine_datasets(data_base_path)
     if df_combined is None:
         print("Halting pipeline due to data loading failure.")
-        return
+        return None
 
     # --- Step 2: Clean and Standardize Data ---
     df_cleaned = clean_and_standardize_data(df_combined)
     if df_cleaned is None:
         print("Halting pipeline due to data cleaning failure.")
-        return
+        return None
 
     # --- Step 3: Aggregate Aspects & Convert to HF Dataset ---
     hf_dataset_aggregated = aggregate_data_for_hf(df_cleaned)
     if hf_dataset_aggregated is None:
         print("Halting pipeline due to data aggregation failure.")
-        return
+        return None
+    return hf_dataset_aggregated
+
+def load_dataset_splits(data_base_path: str, tokenizer, label2id: dict, rebuild_cache: bool = False):
+    """
+    Steps 1-4: the tokenized train/validation/test splits, memory-mapped from the preprocessing
+    cache when the data, config, tokenizer and code are unchanged (None on failure).
+    """
+    def build():
+        hf_dataset_aggregated = load_aggregated_dataset(data_base_path)
+        if hf_dataset_aggregated is None:
+            return None
+        return map_and_split_dataset(hf_dataset_aggregated, tokenizer, label2id)
+
+    return load_or_build_dataset_splits(raw_data_files(data_base_path), tokenizer, label2id, build,
+                                        force_rebuild=rebuild_cache)
+
+def run_training(data_base_path: str, model_output_base_dir: str, rebuild_cache: bool = False):
+    """
+    Executes the full fine-tuning pipeline.
+
+    Args:
+        data_base_path (str): Path to the directory containing raw CSV data.
+        model_output_base_dir (str): Base directory where fine-tuned models and results
+                                     will be saved.
+        rebuild_cache (bool): Rebuild the preprocessed splits even if they are cached.
+    """
+    print("--- Starting ABSA Model Fine-Tuning Pipeline ---")
 
     # --- Step 4: Tokenization, Label Alignment, Data Splits ---
     print("\n--- Running Step 4 (from train.py) ---")
@@ -52,9 +87,9 @@ def run_training(data_base_path: str, model_output_base_dir: str):
         print("Halting pipeline due to tokenizer/config loading failure.")
         return
 
-    dataset_splits = map_and_split_dataset(hf_dataset_aggregated, tokenizer, label2id)
+    dataset_splits = load_dataset_splits(data_base_path, tokenizer, label2id, rebuild_cache)
     if dataset_splits is None:
-        print("Halting pipeline due to tokenization/splitting failure.")
+        print("Halting pipeline due to data preparation or tokenization/splitting failure.")
         return
 
     data_collator = DataCollatorForTokenClassification(tokenizer=tokenizer)
@@ -172,7 +207,220 @@ def run_training(data_base_path: str, model_output_base_dir: str):
     print("\n--- ABSA Model Fine-Tuning Pipeline Complete ---")
 
 
+class DistillationTrainer(Trainer):
+    """
+    Trainer whose loss mixes the hard-label cross-entropy of the student with the KL divergence
+    between the temperature-softened token distributions of the student and a frozen teacher:
+    alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * CE.
+    The KL term covers every non-padding token, including sub-word tokens without a hard label.
+    """
+
+    def __init__(self, *args, teacher_model=None, temperature: float = 2.0, alpha: float = 0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.teacher_model = teacher_model.to(self.args.device).eval()
+        for param in self.teacher_model.parameters():
+            param.requires_grad_(False)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, num_items_in_batch=None):
+        outputs = model(**inputs)
+        with torch.no_grad():
+            teacher_logits = self.teacher_model(input_ids=inputs["input_ids"],
+                                                attention_mask=inputs["attention_mask"]).logits
+        token_mask = inputs["attention_mask"].bool()
+        student_log_probs = F.log_softmax(outputs.logits[token_mask] / self.temperature, dim=-1)
+        teacher_log_probs = F.log_softmax(teacher_logits[token_mask] / self.temperature, dim=-1)
+        kl_loss = F.kl_div(student_log_probs, teacher_log_probs, log_target=True,
+                           reduction="batchmean") * self.temperature ** 2
+        loss = self.alpha * kl_loss + (1 - self.alpha) * outputs.loss
+        return (loss, outputs) if return_outputs else loss
+
+
+def truncate_encoder_layers(model, num_layers: int):
+    """
+    Returns a copy of a BERT-style token-classification model that keeps `num_layers` evenly spaced
+    encoder layers (first and last included), e.g. a 6-layer student initialized from a 12-layer teacher.
+    """
+    student = copy.deepcopy(model)
+    layers = student.base_model.encoder.layer
+    if not 0 < num_layers <= len(layers):
+        raise ValueError(f"num_layers must be between 1 and {len(layers)}, got {num_layers}")
+    keep = np.linspace(0, len(layers) - 1, num_layers).round().astype(int).tolist()
+    student.base_model.encoder.layer = torch.nn.ModuleList([layers[i] for i in keep])
+    student.config.num_hidden_layers = num_layers
+    return student
+
+
+def measure_cpu_latency(model, test_split, pad_token_id: int, num_sentences: int) -> dict:
+    """Times single-sentence forward passes on CPU over the first `num_sentences` test sentences."""
+    from .ml_api_service.absa_inference import collate_input_ids
+    from .ml_api_service.inference_backends import TorchBackend
+
+    backend = TorchBackend(model.to("cpu").eval(), torch.device("cpu"))
+    sentences = test_split[:num_sentences]["input_ids"]
+    backend.forward_logits(*collate_input_ids(sentences[:1], pad_token_id))  # warm up
+    latencies_ms = []
+    for input_ids in sentences:
+        batch = collate_input_ids([input_ids], pad_token_id)
+        start = time.perf_counter()
+        backend.forward_logits(*batch)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+    return {
+        "sentences": len(latencies_ms),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "mean_ms": float(np.mean(latencies_ms)),
+    }
+
+
+def evaluate_on_cpu(model, test_split, pad_token_id: int) -> dict:
+    """Test-split F1 (compute_absa_metrics) plus batched and single-sentence CPU latency of a model."""
+    from .ml_api_service.inference_backends import TorchBackend
+    from .quantize_model import evaluate_backend
+
+    backend = TorchBackend(model.to("cpu").eval(), torch.device("cpu"))
+    metrics, forward_seconds = evaluate_backend(backend, test_split, pad_token_id, project_config.EVAL_BATCH_SIZE)
+    return {
+        "parameters": sum(param.numel() for param in model.parameters()),
+        "num_hidden_layers": model.config.num_hidden_layers,
+        "f1": metrics["f1"],
+        "metrics": metrics,
+        "batched_forward_seconds": forward_seconds,
+        "latency": measure_cpu_latency(model, test_split, pad_token_id, project_config.LATENCY_SENTENCES),
+    }
+
+
+def run_distillation(data_base_path: str, model_output_base_dir: str, teacher_name_or_path: str,
+                     student_name: str = project_config.STUDENT_MODEL_NAME, student_layers: int | None = None,
+                     temperature: float = project_config.DISTILLATION_TEMPERATURE,
+                     alpha: float = project_config.DISTILLATION_ALPHA, rebuild_cache: bool = False):
+    """
+    Trains a smaller token-classification student on the soft logits of the fine-tuned teacher.
+
+    Args:
+        data_base_path (str): Path to the directory containing raw CSV data.
+        model_output_base_dir (str): Base directory for the student run.
+        teacher_name_or_path (str): Fine-tuned teacher (local directory or Hub id).
+        student_name (str): Pretrained student checkpoint; must use the teacher's vocabulary.
+        student_layers (int | None): Instead of `student_name`, initialize the student from this
+            many evenly spaced layers of the teacher.
+        temperature (float): Softmax temperature of the soft targets.
+        alpha (float): Weight of the soft-target loss against the hard-label loss.
+        rebuild_cache (bool): Rebuild the preprocessed splits even if they are cached.
+    """
+    print("--- Starting ABSA Knowledge Distillation Pipeline ---")
+
+    # --- Step 4: Teacher, student and tokenized splits (teacher tokenizer, tokenize_and_align_labels) ---
+    print(f"\n--- Step 4 (distillation): Loading teacher '{teacher_name_or_path}' ---")
+    tokenizer = AutoTokenizer.from_pretrained(teacher_name_or_path)
+    teacher = AutoModelForTokenClassification.from_pretrained(teacher_name_or_path)
+    id2label = {int(i): label for i, label in teacher.config.id2label.items()}
+    label2id = {label: i for i, label in id2label.items()}
+    if student_layers:
+        student_run_name = f"{teacher.config.model_type}-{student_layers}layer"
+        student = truncate_encoder_layers(teacher, student_layers)
+        student_tokenizer = tokenizer
+    else:
+        student_run_name = student_name.split("/")[-1]
+        student_tokenizer = AutoTokenizer.from_pretrained(student_name)
+        if student_tokenizer.get_vocab() != tokenizer.get_vocab():
+            print(f"Error: student '{student_name}' does not use the teacher's vocabulary; "
+                  "its logits cannot be matched token by token.")
+            return
+        student = AutoModelForTokenClassification.from_pretrained(
+            student_name, num_labels=len(id2label), id2label=id2label, label2id=label2id)
+    print(f"Teacher: {teacher.num_parameters():,} parameters. Student: {student.num_parameters():,} parameters.")
+
+    dataset_splits = load_dataset_splits(data_base_path, tokenizer, label2id, rebuild_cache)
+    if dataset_splits is None:
+        print("Halting pipeline due to data preparation or tokenization/splitting failure.")
+        return
+
+    # --- Steps 5-8: Distillation training ---
+    model_run_output_dir = os.path.join(model_output_base_dir, student_run_name + project_config.DISTILLED_RUN_SUFFIX)
+    os.makedirs(model_run_output_dir, exist_ok=True)
+    print(f"Student outputs will be saved to: {model_run_output_dir}")
+    training_args = TrainingArguments(
+        output_dir=model_run_output_dir,
+        num_train_epochs=project_config.NUM_EPOCHS,
+        learning_rate=project_config.STUDENT_LEARNING_RATE,
+        per_device_train_batch_size=project_config.TRAIN_BATCH_SIZE,
+        per_device_eval_batch_size=project_config.EVAL_BATCH_SIZE,
+        weight_decay=project_config.WEIGHT_DECAY,
+        report_to="none",
+        logging_steps=project_config.LOGGING_STEPS,
+        save_strategy="no",
+        seed=project_config.SEED,
+    )
+    trainer = DistillationTrainer(
+        model=student,
+        args=training_args,
+        train_dataset=dataset_splits["train"],
+        eval_dataset=dataset_splits["validation"],
+        tokenizer=student_tokenizer,
+        data_collator=DataCollatorForTokenClassification(tokenizer=tokenizer),
+        compute_metrics=lambda p: compute_absa_metrics(p, id2label),
+        teacher_model=teacher,
+        temperature=temperature,
+        alpha=alpha,
+    )
+    print(f"\n--- Distilling (temperature={temperature}, alpha={alpha}) ---")
+    train_result = trainer.train()
+    trainer.log_metrics("train", train_result.metrics)
+    trainer.save_metrics("train", train_result.metrics)
+    eval_results = trainer.evaluate()
+    trainer.log_metrics("eval_validation", eval_results)
+    trainer.save_metrics("eval_validation", eval_results)
+
+    final_save_path = os.path.join(model_run_output_dir, project_config.FINAL_MODEL_SUBDIR_NAME)
+    trainer.save_model(final_save_path)
+    student_tokenizer.save_pretrained(final_save_path)
+    print(f"Student model and tokenizer saved to: {final_save_path}")
+
+    # --- Step 9: Speed/accuracy report on the test split ---
+    print("\n--- Step 9 (distillation): Test F1 and CPU latency of teacher and student ---")
+    report = {
+        "teacher": {"model": teacher_name_or_path,
+                    **evaluate_on_cpu(teacher, dataset_splits["test"], tokenizer.pad_token_id)},
+        "student": {"model": final_save_path, "initialized_from": student_name if not student_layers
+                    else f"{student_layers} layers of the teacher",
+                    **evaluate_on_cpu(trainer.model, dataset_splits["test"], tokenizer.pad_token_id)},
+        "temperature": temperature,
+        "alpha": alpha,
+        "test_sentences": len(dataset_splits["test"]),
+        "torch_threads": torch.get_num_threads(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    report["f1_drop"] = report["teacher"]["f1"] - report["student"]["f1"]
+    report["latency_speedup"] = report["teacher"]["latency"]["p50_ms"] / report["student"]["latency"]["p50_ms"]
+    report_path = os.path.join(model_run_output_dir, "distillation_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    for role in ("teacher", "student"):
+        print(f"{role:>8}: F1 {report[role]['f1']:.4f}, {report[role]['parameters']:,} parameters, "
+              f"p50 {report[role]['latency']['p50_ms']:.1f} ms per sentence on CPU")
+    print(f"F1 drop: {report['f1_drop']:.4f}, latency speedup: {report['latency_speedup']:.2f}x")
+    print(f"Report saved to: {report_path}")
+    print("\n--- ABSA Knowledge Distillation Pipeline Complete ---")
+
+
 if __name__ == '__main__':
+    from .push_model_to_hub import HUB_MODEL_ID, LOCAL_MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="Fine-tune the ABSA model, or distill it into a smaller student.")
+    parser.add_argument("--distill", action="store_true", help="train a student on the fine-tuned teacher's logits")
+    parser.add_argument("--teacher", default=None,
+                        help=f"Teacher dir or Hub id (default: {LOCAL_MODEL_DIR} if it exists, else {HUB_MODEL_ID})")
+    parser.add_argument("--student", default=project_config.STUDENT_MODEL_NAME)
+    parser.add_argument("--student-layers", type=int, default=None,
+                        help="initialize the student from this many teacher layers instead of --student")
+    parser.add_argument("--temperature", type=float, default=project_config.DISTILLATION_TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=project_config.DISTILLATION_ALPHA)
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help=f"rebuild the preprocessed splits cached in {project_config.PREPROCESSED_CACHE_DIR}")
+    args = parser.parse_args()
+
     print("Running main training script ...")
     if not os.path.exists(project_config.DEFAULT_LOCAL_DATA_PATH):
         os.makedirs(project_config.DEFAULT_LOCAL_DATA_PATH)
@@ -184,7 +432,20 @@ if __name__ == '__main__':
         os.makedirs(output_base)
         print(f"Created directory: {output_base}")
         
-    run_training(
-        data_base_path=project_config.DEFAULT_LOCAL_DATA_PATH,
-        model_output_base_dir=output_base
-    )
\ No newline at end of file
+    if args.distill:
+        run_distillation(
+            data_base_path=project_config.DEFAULT_LOCAL_DATA_PATH,
+            model_output_base_dir=output_base,
+            teacher_name_or_path=args.teacher or (LOCAL_MODEL_DIR if os.path.exists(LOCAL_MODEL_DIR) else HUB_MODEL_ID),
+            student_name=args.student,
+            student_layers=args.student_layers,
+            temperature=args.temperature,
+            alpha=args.alpha,
+            rebuild_cache=args.rebuild_cache,
+        )
+    else:
+        run_training(
+            data_base_path=project_config.DEFAULT_LOCAL_DATA_PATH,
+            model_output_base_dir=output_base,
+            rebuild_cache=args.rebuild_cache,
+        )
\ No newline at end of file
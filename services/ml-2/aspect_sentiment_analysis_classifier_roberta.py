@@ -9,6 +9,7 @@ Original file is located at
 
 import re
 import string
+import os
 import torch
 import pandas as pd
 import numpy as np
@@ -31,13 +32,20 @@ data_path = '/content/drive/My Drive/restaurants_reviews_dataset'
 ## Loading the Data
 """
 
-df1 = pd.read_csv(data_path + '/Restaurants_Train_v2.csv')
-df1.head()
+# Typed columnar copy of both CSVs, written by `python -m src.convert_to_columnar` in services/ml-1:
+# only the needed columns are read from the memory-mapped file, the polarity as a category.
+columnar_path = data_path + '/reviews.parquet'
+if os.path.exists(columnar_path):
+  df = pd.read_parquet(columnar_path, columns=['sentence', 'aspect_term', 'polarity'], memory_map=True)
+  df = df.rename(columns={'sentence': 'Sentence', 'aspect_term': 'Aspect Term'})
+else:
+  df1 = pd.read_csv(data_path + '/Restaurants_Train_v2.csv')
+  df1.head()
 
-df2 = pd.read_csv(data_path + '/Laptop_Train_v2.csv')
-df2.head()
+  df2 = pd.read_csv(data_path + '/Laptop_Train_v2.csv')
+  df2.head()
 
-df = pd.concat([df1, df2])
+  df = pd.concat([df1, df2])
 
 df.isna().sum()
 
@@ -58,7 +66,7 @@ plt.show()
 
 """## Dropping Unimportant Columns & Rows"""
 
-df.drop(['id', 'from', 'to'], axis=1, inplace=True)
+df.drop(['id', 'from', 'to'], axis=1, errors='ignore', inplace=True)
 
 df.head()
 
@@ -10,6 +10,7 @@ Original file is located at
 import pandas as pd
 import numpy as np
 import string
+import os
 import re
 from sklearn.preprocessing import LabelEncoder
 import torch
@@ -29,15 +30,22 @@ data_path = '/content/drive/My Drive/restaurants_reviews_dataset'
 
 """
 
-df1 = pd.read_csv(data_path + '/Restaurants_Train_v2.csv')
+# Typed columnar copy of both CSVs, written by `python -m src.convert_to_columnar` in services/ml-1:
+# only the needed columns are read from the memory-mapped file, the polarity as a category.
+columnar_path = data_path + '/reviews.parquet'
+if os.path.exists(columnar_path):
+  df = pd.read_parquet(columnar_path, columns=['sentence', 'aspect_term', 'polarity'], memory_map=True)
+  df = df.rename(columns={'sentence': 'Sentence', 'aspect_term': 'Aspect Term'})
+else:
+  df1 = pd.read_csv(data_path + '/Restaurants_Train_v2.csv')
 
-df1.head()
+  df1.head()
 
-df2 = pd.read_csv(data_path + '/Laptop_Train_v2.csv')
+  df2 = pd.read_csv(data_path + '/Laptop_Train_v2.csv')
 
-df2.head()
+  df2.head()
 
-df = pd.concat([df1, df2])
+  df = pd.concat([df1, df2])
 
 df.isna().sum()
 
@@ -118,7 +126,7 @@ cleaned_df.head()
 
 cleaned_df['polarity'].dtype
 
-cleaned_df = cleaned_df.drop(['id', 'from', 'to'], axis=1)
+cleaned_df = cleaned_df.drop(['id', 'from', 'to'], axis=1, errors='ignore')
 
 cleaned_df.head()
 